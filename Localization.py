@@ -1,6 +1,16 @@
 #!/usr/bin/env python3
+import math
+import threading
 import time
-from ntcore import NetworkTableInstance, EventFlags, Topic
+from ntcore import NetworkTableInstance, EventFlags, Topic, _now
+from controlstate import fill_pose, wrap_angle
+from calibration import Calibration
+
+# QuestNav publishes the headset orientation as [x, y, z, w] (Unity, y up)
+QUATERNION_ORDER = (0, 1, 2, 3)
+YAW_RATE_TAU = 0.05         # s, low-pass on the quaternion yaw rate
+YAW_RATE_STALE = 0.25       # s without quaternions before yaw_rate reads as unknown
+MAX_YAW_RATE = 10.0         # rad/s; faster steps are relocalization jumps, not motion
 
 class Localization:
     """
@@ -8,17 +18,36 @@ class Localization:
     with all the most recent data whenever any value updates.
     """
     
-    def __init__(self, callback_func, nt4_port=5810, nt3_port=1735):
+    def __init__(self, callback_func, nt4_port=5810, nt3_port=1735, profiler=None,
+                 pose_filter=None, calibration=None, instance=None, prefix="/questnav",
+                 server=None):
         """
         Initialize the Localization server.
         
         Args:
             callback_func: Function to call when data updates. Will receive:
                 (position, quaternion, euler_angles, is_tracking, battery_percent)
+                with position and euler_angles already filtered and calibrated;
+                None if the pose is only polled (read_pose / get_latest_data)
             nt4_port: NT4 port (default: 5810)
             nt3_port: NT3 port (default: 1735, set 0 to disable)
+            profiler: optional profiling.Profiler; times NT transit, event
+                handling and the callback (None = no instrumentation at all)
+            pose_filter: optional posefilter.PoseFilter applied at ingest; the
+                callback and read_pose() then see the filtered stream, the raw
+                one stays in latest_position / latest_euler_angles
+            calibration: calibration.Calibration applied to every frame
+                (default: identity, no mounting offset)
+            instance: NetworkTableInstance to serve on (default: the process-wide
+                default instance; use NetworkTableInstance.create() for a second server)
+            prefix: topic prefix this headset publishes under
+            server: LocalizationServer to share (one robot of a fleet); the
+                server's ports and instance are used and no new server is started
         """
         self.callback_func = callback_func
+        self.profiler = profiler
+        if profiler is not None and callback_func is not None:
+            self.callback_func = profiler.wrap("location_update", callback_func)
         
         # Store the latest values
         self.latest_position = None
@@ -27,58 +56,159 @@ class Localization:
         self.latest_is_tracking = None
         self.latest_battery_percent = None
         
+        # Jump-filtered stream (same as raw when no filter is installed)
+        self.pose_filter = pose_filter
+        self.filtered_position = None
+        self.filtered_euler_angles = None
+        
+        # Calibrated robot-base pose, produced once per frame at ingest
+        self.calibration = calibration or Calibration()
+        self.calibrated_position = None
+        self.calibrated_euler_angles = None
+        self._pose_ready = threading.Event()
+        
+        # Yaw rate (rad/s, + = right turn) from consecutive quaternions, for the
+        # heading PID's derivative; nan until two quaternions have arrived
+        self.yaw_rate = math.nan
+        self._last_q_yaw = None
+        self._last_q_time = 0.0
+        self._yaw_rate_at = -math.inf
+        
         # Network prefixes to listen to
+        self.prefix = prefix
         self.PREFIXES = [
-            "/questnav/position", 
-            "/questnav/quaternion", 
-            "/questnav/eulerAngles",
-            "/questnav/device/isTracking",
-            "/questnav/device/batteryPercent",
+            f"{prefix}/position", 
+            f"{prefix}/quaternion", 
+            f"{prefix}/eulerAngles",
+            f"{prefix}/device/isTracking",
+            f"{prefix}/device/batteryPercent",
         ]
+        (self._topic_position, self._topic_quaternion, self._topic_euler,
+         self._topic_tracking, self._topic_battery) = self.PREFIXES
         
-        # Initialize NetworkTables
-        self.inst = NetworkTableInstance.getDefault()
-        self.inst.startServer(
-            persist_filename="networktables.ini",
-            listen_address="0.0.0.0",
-            port3=nt3_port,
-            port4=nt4_port,
-        )
+        # Initialize NetworkTables (or join a shared server)
+        self._owns_server = server is None
+        if server is not None:
+            self.inst = server.inst
+        else:
+            self.inst = instance if instance is not None else NetworkTableInstance.getDefault()
+            self.inst.startServer(
+                persist_filename="networktables.ini",
+                listen_address="0.0.0.0",
+                port3=nt3_port,
+                port4=nt4_port,
+            )
         
-        # Set up the listener
-        self.inst.addListener(
+        # Set up the listener (NT only calls it for this headset's topics)
+        self._listener = self.inst.addListener(
             self.PREFIXES,
             EventFlags.kValueAll | EventFlags.kImmediate,
-            self._on_event
+            self._on_event if profiler is None else self._on_event_profiled
         )
         
-        print(f"Wilson Precision Localization NT4 server listening on {nt4_port}")
+        if server is None:
+            print(f"Wilson Precision Localization NT4 server listening on {nt4_port}")
     
     def _on_event(self, ev):
         """Internal event handler that updates latest values and calls user callback."""
         topic_name = ev.data.topic.getName()
         
         # Update the appropriate latest value
-        if topic_name == "/questnav/position":
+        if topic_name == self._topic_position:
             self.latest_position = ev.data.value.getFloatArray()
-        elif topic_name == "/questnav/quaternion":
+            if self.pose_filter is None:
+                self.filtered_position = self.latest_position
+            else:
+                self.filtered_position = self.pose_filter.filter_position(
+                    ev.data.value.time() * 1e-6, self.latest_position)
+            self._apply_calibration()
+        elif topic_name == self._topic_quaternion:
             self.latest_quaternion = ev.data.value.getFloatArray()
-        elif topic_name == "/questnav/eulerAngles":
+            self._update_yaw_rate(ev.data.value.time() * 1e-6, self.latest_quaternion)
+        elif topic_name == self._topic_euler:
             self.latest_euler_angles = ev.data.value.getFloatArray()
-        elif topic_name == "/questnav/device/isTracking":
+            if self.pose_filter is None:
+                self.filtered_euler_angles = self.latest_euler_angles
+            else:
+                self.filtered_euler_angles = self.pose_filter.filter_euler(
+                    ev.data.value.time() * 1e-6, self.latest_euler_angles)
+            self._apply_calibration()
+        elif topic_name == self._topic_tracking:
             self.latest_is_tracking = ev.data.value.getBoolean()
-        elif topic_name == "/questnav/device/batteryPercent":
+        elif topic_name == self._topic_battery:
             self.latest_battery_percent = ev.data.value.getDouble()
         
-        # Call the user's callback with all the latest data
+        # Call the user's callback with all the latest (filtered, calibrated) data
+        if self.callback_func is None:
+            return
         self.callback_func(
-            position=self.latest_position,
+            position=self.calibrated_position,
             quaternion=self.latest_quaternion,
-            euler_angles=self.latest_euler_angles,
+            euler_angles=self.calibrated_euler_angles,
             is_tracking=self.latest_is_tracking,
             battery_percent=self.latest_battery_percent
         )
     
+    def _apply_calibration(self):
+        if self.filtered_position and self.filtered_euler_angles:
+            self.calibrated_position, self.calibrated_euler_angles = self.calibration.apply(
+                self.filtered_position, self.filtered_euler_angles)
+            if self.latest_is_tracking is not False:
+                self._pose_ready.set()
+    
+    def _update_yaw_rate(self, t, q):
+        """Differentiate the quaternion's yaw (about +y) and low-pass it"""
+        ix, iy, iz, iw = QUATERNION_ORDER
+        x, y, z, w = q[ix], q[iy], q[iz], q[iw]
+        yaw = math.atan2(2.0 * (w * y + x * z), 1.0 - 2.0 * (x * x + y * y))
+        last, dt = self._last_q_yaw, t - self._last_q_time
+        self._last_q_yaw, self._last_q_time = yaw, t
+        if last is None or not 0.0 < dt < YAW_RATE_STALE:
+            self.yaw_rate = math.nan
+            return
+        rate = wrap_angle(yaw - last) / dt
+        if abs(rate) > MAX_YAW_RATE:
+            return
+        if self.yaw_rate != self.yaw_rate:
+            self.yaw_rate = rate
+        else:
+            self.yaw_rate += (rate - self.yaw_rate) * dt / (YAW_RATE_TAU + dt)
+        self._yaw_rate_at = time.perf_counter()
+    
+    def wait_for_pose(self, timeout=None):
+        """
+        Block until the first tracked pose has arrived.
+        
+        Returns:
+            bool: False on timeout
+        """
+        return self._pose_ready.wait(timeout)
+    
+    def set_calibration(self, calibration):
+        """Swap in a new calibration; takes effect from the current frame on"""
+        self.calibration = calibration
+        self._apply_calibration()
+    
+    def calibrate(self):
+        """
+        Make the current robot-base pose the origin, facing +z (mounting is kept).
+        
+        Returns:
+            bool: False if no pose has arrived yet
+        """
+        if not self.filtered_position or not self.filtered_euler_angles:
+            return False
+        self.set_calibration(self.calibration.rebased(self.filtered_position,
+                                                      self.filtered_euler_angles))
+        return True
+    
+    def _on_event_profiled(self, ev):
+        """_on_event plus NT transit time (publish timestamp → now) and handling time"""
+        t0 = time.perf_counter_ns()
+        self.profiler.record_value("nt_transit", (_now() - ev.data.value.time()) * 1000)
+        self._on_event(ev)
+        self.profiler.record("nt_event", t0)
+    
     def get_latest_data(self):
         """
         Get all the latest data as a dictionary.
@@ -91,9 +221,43 @@ class Localization:
             'quaternion': self.latest_quaternion,
             'euler_angles': self.latest_euler_angles,
             'is_tracking': self.latest_is_tracking,
-            'battery_percent': self.latest_battery_percent
+            'battery_percent': self.latest_battery_percent,
+            'filtered_position': self.filtered_position,
+            'filtered_euler_angles': self.filtered_euler_angles,
+            'calibrated_position': self.calibrated_position,
+            'calibrated_euler_angles': self.calibrated_euler_angles,
+            'pose_jumps': self.pose_filter.jumps if self.pose_filter else 0,
         }
     
+    def read_pose(self, snapshot, raw=False):
+        """
+        Fill a preallocated controlstate.PoseSnapshot with the latest
+        calibrated robot-base pose. Allocation-free alternative to
+        get_latest_data() for control loops.
+        
+        Args:
+            raw: the headset pose as published - no jump filter, no calibration
+        
+        Returns:
+            bool: False if position or orientation hasn't arrived yet
+        """
+        fresh = time.perf_counter() - self._yaw_rate_at < YAW_RATE_STALE
+        snapshot.yaw_rate = self.yaw_rate if fresh else math.nan
+        if raw:
+            return fill_pose(snapshot, self.latest_position, self.latest_euler_angles,
+                             self.latest_is_tracking)
+        return fill_pose(snapshot, self.calibrated_position, self.calibrated_euler_angles,
+                         self.latest_is_tracking)
+    
+    def close(self):
+        """Remove the listener and stop the server (unless it is shared)"""
+        if self._listener is None:
+            return
+        self.inst.removeListener(self._listener)
+        self._listener = None
+        if self._owns_server:
+            self.inst.stopServer()
+    
     def run_forever(self):
         """Run the server indefinitely."""
         try:
@@ -103,6 +267,42 @@ class Localization:
             print("\nShutting down QuestNav server...")
 
 
+class LocalizationServer:
+    """
+    One NetworkTables server for several headsets. Each robot's QuestNav
+    publishes under its own prefix (/<name>/questnav/...) and gets its own
+    Localization - pose store, filter, calibration, callback - fed by its
+    own listener, so per-frame cost doesn't grow with the fleet.
+    """
+    
+    def __init__(self, nt4_port=5810, nt3_port=1735, instance=None):
+        self.inst = instance if instance is not None else NetworkTableInstance.getDefault()
+        self.inst.startServer(
+            persist_filename="networktables.ini",
+            listen_address="0.0.0.0",
+            port3=nt3_port,
+            port4=nt4_port,
+        )
+        self.robots = {}
+        print(f"Wilson Precision Localization NT4 fleet server listening on {nt4_port}")
+    
+    def add_robot(self, name, callback_func=None, **kwargs):
+        """
+        Localization for one headset publishing under /<name>/questnav
+        (kwargs: profiler, pose_filter, calibration, prefix)
+        """
+        kwargs.setdefault("prefix", f"/{name}/questnav")
+        localization = Localization(callback_func, server=self, **kwargs)
+        self.robots[name] = localization
+        return localization
+    
+    def close(self):
+        for localization in self.robots.values():
+            localization.close()
+        self.robots.clear()
+        self.inst.stopServer()
+
+
 # Example usage:
 if __name__ == "__main__":
     def my_callback(position, quaternion, euler_angles, is_tracking, battery_percent):
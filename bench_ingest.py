@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Localization ingest benchmark on loopback
+———————————————————————————————————————————————
+Starts a Localization server and a local ntcore client that publishes
+synthetic /questnav frames (position + eulerAngles, sendAll, flushed per
+frame like the headset) at stepped rates, and measures per ingest mode:
+- delivered frames, and frames dropped or coalesced on the way (a frame
+  index travels in position[1], which the filter and calibration pass through)
+- publish → end of _on_event latency (p50 / p99 / max), i.e. including the
+  filter, the calibration and the callback - a growing tail means the
+  listener thread is backing up
+- process CPU (publisher included; compare against the raw mode)
+
+Ingest modes:
+  raw       bare NT listener that only reads the value (the NT floor)
+  poll      Localization(None): what the runtime uses, pose read by read_pose
+  callback  Localization(callback) with a callback that copies the frame
+  filter    poll + PoseFilter
+  profiled  poll + Profiler (nt_transit / nt_event histograms)
+
+    python bench_ingest.py --rates 100,500,1000,2000,5000 --duration 3
+"""
+
+import json
+import math
+import resource
+import time
+
+from ntcore import NetworkTableInstance, EventFlags, PubSubOptions
+
+from Localization import Localization
+from posefilter import PoseFilter
+from profiling import Histogram, Profiler
+
+MODES = ("raw", "poll", "callback", "filter", "profiled")
+
+
+class _Probe:
+    """Records which frames arrived and when, from the listener thread"""
+
+    def __init__(self, frames):
+        self.sent_ns = [0] * frames     # filled by the publisher
+        self.latency = Histogram()
+        self.seen = 0
+        self.gaps = 0                   # frames skipped between two deliveries
+        self.last = -1
+
+    def record(self, index, now_ns):
+        if index <= self.last:
+            return
+        self.gaps += index - self.last - 1
+        self.last = index
+        self.seen += 1
+        self.latency.record(now_ns - self.sent_ns[index])
+
+
+class _ProbedLocalization(Localization):
+    """Localization that reports each new calibrated frame to a probe"""
+
+    probe = None
+
+    def _on_event(self, ev):
+        super()._on_event(ev)
+        position = self.calibrated_position
+        if position is not None and ev.data.topic.getName() == self._topic_position:
+            self.probe.record(int(position[1]), time.perf_counter_ns())
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _publish(client, rate, frames, probe):
+    """Publish `frames` frames at `rate` Hz with absolute deadlines"""
+    options = PubSubOptions(sendAll=True, keepDuplicates=True)
+    position = client.getFloatArrayTopic("/questnav/position").publish(options)
+    euler = client.getFloatArrayTopic("/questnav/eulerAngles").publish(options)
+    tracking = client.getBooleanTopic("/questnav/device/isTracking").publish()
+    tracking.set(True)
+    period = 1.0 / rate
+    deadline = time.perf_counter()
+    for i in range(frames):
+        deadline += period
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        # a slow circle, so the filter sees plausible motion
+        t = i * period
+        probe.sent_ns[i] = time.perf_counter_ns()
+        position.set([0.5 * math.sin(0.5 * t), float(i), 0.5 * math.cos(0.5 * t)])
+        euler.set([0.0, math.degrees(0.5 * t) % 360.0 - 180.0, 0.0])
+        client.flush()
+    return time.perf_counter()
+
+
+def run(mode, rate, duration, port):
+    """One benchmark run; returns a result dict"""
+    frames = int(rate * duration)
+    probe = _Probe(frames)
+    server = NetworkTableInstance.create()
+    localization = listener = None
+    if mode == "raw":
+        server.startServer(persist_filename="", port3=0, port4=port)
+
+        def raw(ev):
+            value = ev.data.value.getFloatArray()
+            probe.record(int(value[1]), time.perf_counter_ns())
+
+        listener = server.addListener(["/questnav/position"], EventFlags.kValueAll, raw)
+    else:
+        copies = []
+
+        def callback(position, quaternion, euler_angles, is_tracking, battery_percent):
+            copies[:] = (position, euler_angles, is_tracking)
+
+        localization = _ProbedLocalization(
+            callback if mode == "callback" else None, nt4_port=port, nt3_port=0,
+            pose_filter=PoseFilter() if mode == "filter" else None,
+            profiler=Profiler() if mode == "profiled" else None, instance=server)
+        localization.probe = probe
+
+    client = NetworkTableInstance.create()
+    client.setServer("127.0.0.1", port)
+    client.startClient4("bench-ingest")
+    deadline = time.monotonic() + 5.0
+    while not client.isConnected() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)                             # let the topic announcements settle
+
+    cpu0, t0 = _cpu_seconds(), time.perf_counter()
+    t_end = _publish(client, rate, frames, probe)
+    time.sleep(1.0)                             # drain
+    cpu = _cpu_seconds() - cpu0
+    wall = time.perf_counter() - t0
+
+    client.stopClient()
+    if localization is not None:
+        localization.close()
+    else:
+        server.removeListener(listener)
+        server.stopServer()
+    NetworkTableInstance.destroy(client)
+    NetworkTableInstance.destroy(server)
+
+    h = probe.latency
+    return {
+        "mode": mode, "rate": rate, "sent": frames,
+        "achieved_rate": frames / (t_end - t0),
+        "delivered": probe.seen,
+        "lost": frames - probe.seen,
+        "coalesced": probe.gaps,
+        "p50_us": h.percentile(50) / 1e3, "p99_us": h.percentile(99) / 1e3,
+        "max_us": h.max / 1e3,
+        "cpu_pct": 100.0 * cpu / wall,
+    }
+
+
+def format_row(r):
+    return (f"{r['mode']:<9}{r['rate']:>6}{r['achieved_rate']:>8.0f}{r['delivered']:>10}"
+            f"{r['lost']:>7}{r['coalesced']:>7}{r['p50_us']:>9.0f}{r['p99_us']:>9.0f}"
+            f"{r['max_us']:>9.0f}{r['cpu_pct']:>7.1f}")
+
+
+HEADER = (f"{'mode':<9}{'Hz':>6}{'sent/s':>8}{'delivered':>10}{'lost':>7}{'gaps':>7}"
+          f"{'p50 µs':>9}{'p99 µs':>9}{'max µs':>9}{'CPU %':>7}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark Localization ingest on loopback")
+    parser.add_argument("--rates", default="100,500,1000,2000,5000",
+                        help="comma-separated publish rates (Hz)")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated ingest modes")
+    parser.add_argument("--port", type=int, default=5840, help="first NT4 port (one per run)")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    port = args.port
+    print(HEADER)
+    for rate in (int(r) for r in args.rates.split(",")):
+        for mode in args.modes.split(","):
+            if mode not in MODES:
+                raise SystemExit(f"unknown mode {mode!r} (choose from {', '.join(MODES)})")
+            result = run(mode, rate, args.duration, port)
+            port += 1
+            results.append(result)
+            print(format_row(result))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.json}")
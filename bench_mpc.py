@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+MPC solve-time benchmark
+———————————————————————————————————————————————
+- closed-loop runs of mpc_step on a kinematic diff-drive from random start
+  poses: every solve's wall time goes into a log-linear Histogram, cold
+  (first solve of a move) and warm (the rest) separately
+- the same moves with the turn-then-drive, PID heading, for time to target
+- a horizon sweep, to pick the longest horizon that fits the budget
+
+The budget is 20 ms per solve on a Pi 4; run this there. Pin BLAS to one
+thread (OPENBLAS_NUM_THREADS=1) - the matrices are far too small to gain
+from threads and the hand-off costs more than the work.
+
+    python bench_mpc.py --moves 50 --horizons 10,15,20,30
+"""
+
+import math
+import random
+
+from controlstate import (ControlState, PoseSnapshot, TurnParams, DriveParams, turn_step,
+                          drive_step, DEG)
+from mpc import MPC, MPCParams, mpc_step
+from profiling import Histogram
+
+SPEED_SCALE = 0.5
+TRACK = 0.30
+
+
+def _simulate(pose, left, right, dt):
+    v = SPEED_SCALE * 0.5 * (left + right)
+    w = SPEED_SCALE * (left - right) / TRACK
+    pose.yaw += w * dt
+    pose.x += v * math.sin(pose.yaw) * dt
+    pose.z += v * math.cos(pose.yaw) * dt
+
+
+def _starts(moves, seed=1):
+    rng = random.Random(seed)
+    return [(rng.uniform(-2, 2), rng.uniform(-2, 2), rng.uniform(-180, 180) * DEG)
+            for _ in range(moves)]
+
+
+def run_mpc(starts, params, limit=60.0):
+    """(cold Histogram, warm Histogram, solves over budget, times to target, failures)"""
+    mpc = MPC(params, speed_scale=SPEED_SCALE, track_width=TRACK)
+    state, pose = ControlState(), PoseSnapshot()
+    cold, warm = Histogram(), Histogram()
+    times, failures, over = [], 0, 0
+    for x, z, yaw in starts:
+        state.reset(0.0, 0.0)
+        pose.x, pose.z, pose.yaw = x, z, yaw
+        mpc.reset()
+        t, first = 0.0, True
+        while t < limit:
+            if mpc_step(state, pose, mpc):
+                times.append(t)
+                break
+            (cold if first else warm).record(int(mpc.solve_time * 1e9))
+            over += mpc.solve_time > params.budget
+            first = False
+            _simulate(pose, state.left, state.right, params.dt)
+            t += params.dt
+        else:
+            failures += 1
+    return cold, warm, over, times, failures
+
+
+def run_turn_drive(starts, dt=0.1, limit=60.0):
+    """Times to target with controlloop's turn-then-drive laws"""
+    turn, drive = TurnParams(), DriveParams()
+    state, pose = ControlState(), PoseSnapshot()
+    times = []
+    for x, z, yaw in starts:
+        state.reset(0.0, 0.0)
+        pose.x, pose.z, pose.yaw = x, z, yaw
+        t, turning = 0.0, True
+        while t < limit:
+            if turning:
+                if turn_step(state, pose, turn, dt):
+                    turning = False
+                    state.speed = 0.0
+                    continue
+            elif drive_step(state, pose, drive, dt):
+                times.append(t)
+                break
+            _simulate(pose, state.left, state.right, dt)
+            t += dt
+    return times
+
+
+def _ms(h, pct):
+    return h.percentile(pct) / 1e6
+
+
+def _summary(times):
+    if not times:
+        return "no arrivals"
+    times = sorted(times)
+    return f"mean {sum(times) / len(times):5.1f} s, p90 {times[int(0.9 * (len(times) - 1))]:5.1f} s"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the MPC solver in closed loop")
+    parser.add_argument("--moves", type=int, default=30, help="random start poses")
+    parser.add_argument("--horizons", default="10,15,20,30", help="horizons to sweep")
+    parser.add_argument("--budget", type=float, default=0.020, help="per-solve budget (s)")
+    args = parser.parse_args()
+
+    starts = _starts(args.moves)
+    print(f"{'horizon':>7}{'solves':>8}{'cold p50':>10}{'warm p50':>10}{'p99':>8}{'max':>8}"
+          f"{'over':>6}   (solve ms)  time to target")
+    for horizon in (int(h) for h in args.horizons.split(",")):
+        params = MPCParams(horizon=horizon, budget=args.budget)
+        cold, warm, over, times, failures = run_mpc(starts, params)
+        print(f"{horizon:>7}{cold.total + warm.total:>8}{_ms(cold, 50):>10.2f}{_ms(warm, 50):>10.2f}"
+              f"{_ms(warm, 99):>8.2f}{warm.max / 1e6:>8.2f}{over:>6}               {_summary(times)}"
+              + (f", {failures} failed" if failures else ""))
+    print(f"{'turn-then-drive, PID heading':<57}   "
+          f"{_summary(run_turn_drive(starts))}")
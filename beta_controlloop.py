@@ -1,536 +1,103 @@
-from Localization import Localization
-from mdds30na import MDDS30AntiPhase
+from runtime import Runtime, create_runtime, main
+from controlengine import Reversible
+from controlstate import ReversibleParams, DEG
 import math
-import time
-import threading
 
-motor_control = MDDS30AntiPhase()
-
-# Calibration offsets
-position_offset = [0.0, 0.0, 0.0]  # x, y, z offsets
-yaw_offset = 0.0
-
-# Current calibrated position and yaw
-current_position = [0.0, 0.0, 0.0]
-current_yaw = 0.0
-
-def handle_location_update(position, quaternion, euler_angles, is_tracking, battery_percent):
-    global current_position, current_yaw
-        
-    if position and euler_angles:
-        # Apply calibration offsets
-        current_position = [
-            position[0] - position_offset[0],
-            position[1] - position_offset[1], 
-            position[2] - position_offset[2]
-        ]
-        current_yaw = euler_angles[1] - yaw_offset  # yaw is index 1 in euler_angles
-        
-        
-        
-def calibrate():
-    """Calibrate by setting current position to (0,0,0) and yaw to 0"""
-    global position_offset, yaw_offset
-        
-    if current_position and current_yaw:
-        position_offset = current_position.copy()
-        yaw_offset = current_yaw  # yaw is index 1
-        print("✓ Calibration complete! Position and yaw set to zero.")
-        print(f"Position offset: {position_offset}")
-        print(f"Yaw offset: {yaw_offset}")
-    else:
-        print("✗ Calibration failed: No position data available")
-
-def normalize_angle(angle_deg):
-    """Normalize angle to be within -180 to 180 degrees"""
-    angle_deg = angle_deg % 360
-    if angle_deg > 180:
-        angle_deg -= 360
-    elif angle_deg < -180:
-        angle_deg += 360
-    return angle_deg
-
-def motor_command_threaded(func, *args):
-    """Execute motor command in a separate thread to avoid blocking"""
-    thread = threading.Thread(target=func, args=args, daemon=True)
-    thread.start()
-
-def move_to_direct(x, z):
-    """Move to relative x,z location using turn-then-move approach"""
-    print(f"Moving to relative position: x={x}, z={z}")
-    print("Current calibrated position:", current_position)
-    print("Current calibrated yaw:", current_yaw)
-    
-    # Target position in world coordinates
-    target_x = x
-    target_z = z
-    
-    # Current position
-    current_x = current_position[0]
-    current_z = current_position[2]  # z is index 2
-    
-    # Calculate displacement
-    dx = target_x - current_x
-    dz = target_z - current_z
-    
-    # Calculate target angle (bearing to target) - using dx, dz as mentioned
-    target_angle = math.atan2(dx, dz)
-    target_angle_deg = math.degrees(target_angle)
-    
-    print(f"Target angle: {target_angle_deg:.1f}°")
-    
-    # ===== PHASE 1: TURN TO TARGET =====
-    # ===== PHASE 1: TURN TO TARGET =====
-    print("Phase 1: Turning to target...")
-    
-    angle_tolerance = 2.0  # degrees - reduced from 5.0
-    max_turn_speed = 0.5  # maximum turn speed
-    min_turn_speed = 0.2  # minimum turn speed to avoid getting stuck
-    kp = 0.01  # proportional gain - adjust this to tune responsiveness
-    
-    while True:
-        # Get fresh data
-        latest_data = localization.get_latest_data()
-        if not latest_data['euler_angles']:
-            print("No orientation data, stopping...")
-            motor_command_threaded(motor_control.stop)
-            return False
-            
-        # Update current yaw (already in degrees)
-        current_yaw_fresh = latest_data['euler_angles'][1] - yaw_offset
-        normalized_current_yaw = normalize_angle(current_yaw_fresh)
-        normalized_target_angle = normalize_angle(target_angle_deg)
-        
-        # Calculate angle error
-        angle_error = normalized_target_angle - normalized_current_yaw
-        
-        # Handle angle wrap-around
-        if angle_error > 180:
-            angle_error -= 360
-        elif angle_error < -180:
-            angle_error += 360
-            
-        print(f"Angle error: {angle_error:.1f}°")
-        
-        # Check if we're close enough
-        if abs(angle_error) < angle_tolerance:
-            print("✓ Angle reached!")
-            motor_command_threaded(motor_control.stop)
-            time.sleep(0.5)  # brief pause
-            break
-            
-        # Calculate proportional turn speed based on angle error
-        turn_speed = abs(angle_error) * kp
-        
-        # Clamp turn speed between min and max
-        turn_speed = max(min_turn_speed, min(turn_speed, max_turn_speed))
-        
-        print(f"Turn speed: {turn_speed:.3f}")
-        
-        # Turn towards target - THREADED
-        if angle_error > 0:
-            # Turn left (counter-clockwise) - SWAPPED
-            motor_command_threaded(motor_control.set, turn_speed, -turn_speed)
-        else:
-            # Turn right (clockwise) - SWAPPED
-            motor_command_threaded(motor_control.set, -turn_speed, turn_speed)
-            
-        time.sleep(0.1)  # Control loop delay
-    
-    # ===== PHASE 2: MOVE TO TARGET =====
-    print("Phase 2: Moving to target...")
-    
-    distance_tolerance = 0.25  # meters (15cm)
-    max_forward_speed = 0.6  # maximum forward speed
-    min_forward_speed = 0.15  # minimum forward speed to avoid getting stuck
-    distance_kp = 0.8  # proportional gain for distance-based speed control
-    
-    while True:
-        # Get fresh position data
-        latest_data = localization.get_latest_data()
-        if not latest_data['position']:
-            print("No position data, stopping...")
-            motor_command_threaded(motor_control.stop)
-            return False
-        
-        # Update current position
-        fresh_position = [
-            latest_data['position'][0] - position_offset[0],
-            latest_data['position'][1] - position_offset[1],
-            latest_data['position'][2] - position_offset[2]
-        ]
-        
-        # Calculate distance to target
-        distance = math.sqrt((target_x - fresh_position[0])**2 + 
-                           (target_z - fresh_position[2])**2)
-        
-        print(f"Distance to target: {distance:.2f}m")
-        
-        # Check if we've reached the target
-        if distance < distance_tolerance:
-            print("✓ Target reached!")
-            motor_command_threaded(motor_control.stop)
-            return True
-        
-        # Calculate base forward speed proportional to distance
-        base_forward_speed = distance * distance_kp
-        
-        # Clamp forward speed between min and max
-        base_forward_speed = max(min_forward_speed, min(base_forward_speed, max_forward_speed))
-        
-        print(f"Base forward speed: {base_forward_speed:.3f}")
-        
-        # Calculate displacement for angle correction
-        dx = target_x - fresh_position[0]
-        dz = target_z - fresh_position[2]
-        
-        # Calculate target angle (bearing to target)
-        target_angle = math.atan2(dx, dz)
-        target_angle_deg = math.degrees(target_angle)
-        
-        current_yaw_fresh = latest_data['euler_angles'][1] - yaw_offset
-        normalized_current_yaw = normalize_angle(current_yaw_fresh)
-        normalized_target_angle = normalize_angle(target_angle_deg)
-        
-        # Calculate angle error
-        angle_error = normalized_target_angle - normalized_current_yaw
-        
-        # Handle angle wrap-around
-        if angle_error > 180:
-            angle_error -= 360
-        elif angle_error < -180:
-            angle_error += 360
-            
-        print(f"Angle error: {angle_error:.1f}°")
-        
-        # Apply angle correction to the base forward speed
-        left_speed = base_forward_speed - angle_error * kp
-        right_speed = base_forward_speed + angle_error * kp
-        
-        print(f"Left speed: {left_speed:.3f}, Right speed: {right_speed:.3f}")
-            
-        # Move forward with proportional speed - THREADED
-        motor_command_threaded(motor_control.set, right_speed, left_speed)
-        time.sleep(0.1)  # Control loop delay
-
-def move_to_bu(x, z):
-    """Move to relative x,z location using turn-then-move approach"""
-    print(f"Moving to relative position: x={x}, z={z}")
-    print("Current calibrated position:", current_position)
-    print("Current calibrated yaw:", current_yaw)
-    
-    # Target position in world coordinates
-    target_x = x
-    target_z = z
-    
-    # Current position
-    current_x = current_position[0]
-    current_z = current_position[2]  # z is index 2
-    
-    # Calculate displacement
-    dx = target_x - current_x
-    dz = target_z - current_z
-    
-    # Calculate target angle (bearing to target) - using dx, dz as mentioned
-    target_angle = math.atan2(dx, dz)
-    target_angle_deg = math.degrees(target_angle)
-    
-    print(f"Target angle: {target_angle_deg:.1f}°")
-    
-    # ===== PHASE 1: TURN TO TARGET =====
-    # ===== PHASE 1: TURN TO TARGET =====
-    print("Phase 1: Turning to target...")
-    
-    angle_tolerance = 360.0  # degrees - reduced from 5.0
-    max_turn_speed = 0.5  # maximum turn speed
-    min_turn_speed = 0.2  # minimum turn speed to avoid getting stuck
-    kp = 0.01  # proportional gain - adjust this to tune responsiveness
-    
-    while True:
-        # Get fresh data
-        latest_data = localization.get_latest_data()
-        if not latest_data['euler_angles']:
-            print("No orientation data, stopping...")
-            motor_command_threaded(motor_control.stop)
-            return False
-            
-        # Update current yaw (already in degrees)
-        current_yaw_fresh = latest_data['euler_angles'][1] - yaw_offset
-        normalized_current_yaw = normalize_angle(current_yaw_fresh)
-        normalized_target_angle = normalize_angle(target_angle_deg)
-        
-        # Calculate angle error
-        angle_error = normalized_target_angle - normalized_current_yaw
-        
-        # Handle angle wrap-around
-        if angle_error > 180:
-            angle_error -= 360
-        elif angle_error < -180:
-            angle_error += 360
-            
-        print(f"Angle error: {angle_error:.1f}°")
-        
-        # Check if we're close enough
-        if abs(angle_error) < angle_tolerance:
-            print("✓ Angle reached!")
-            motor_command_threaded(motor_control.stop)
-            time.sleep(0.5)  # brief pause
-            break
-            
-        # Calculate proportional turn speed based on angle error
-        turn_speed = abs(angle_error) * kp
-        
-        # Clamp turn speed between min and max
-        turn_speed = max(min_turn_speed, min(turn_speed, max_turn_speed))
-        
-        print(f"Turn speed: {turn_speed:.3f}")
-        
-        # Turn towards target - THREADED
-        if angle_error > 0:
-            # Turn left (counter-clockwise) - SWAPPED
-            motor_command_threaded(motor_control.set, turn_speed, -turn_speed)
-        else:
-            # Turn right (clockwise) - SWAPPED
-            motor_command_threaded(motor_control.set, -turn_speed, turn_speed)
-            
-        time.sleep(0.1)  # Control loop delay
-    
-    # ===== PHASE 2: MOVE TO TARGET =====
-    print("Phase 2: Moving to target...")
-    
-    distance_tolerance = 0.25  # meters (15cm)
-    max_forward_speed = 0.4  # maximum forward speed
-    min_forward_speed = 0.15  # minimum forward speed to avoid getting stuck
-    distance_kp = 0.8  # proportional gain for distance-based speed control
-    
-    while True:
-        # Get fresh position data
-        latest_data = localization.get_latest_data()
-        if not latest_data['position']:
-            print("No position data, stopping...")
-            motor_command_threaded(motor_control.stop)
-            return False
-        
-        # Update current position
-        fresh_position = [
-            latest_data['position'][0] - position_offset[0],
-            latest_data['position'][1] - position_offset[1],
-            latest_data['position'][2] - position_offset[2]
-        ]
-        
-        # Calculate distance to target
-        distance = math.sqrt((target_x - fresh_position[0])**2 + 
-                           (target_z - fresh_position[2])**2)
-        
-        print(f"Distance to target: {distance:.2f}m")
-        
-        # Check if we've reached the target
-        if distance < distance_tolerance:
-            print("✓ Target reached!")
-            motor_command_threaded(motor_control.stop)
-            return True
-        
-        # Calculate base forward speed proportional to distance
-        base_forward_speed = distance * distance_kp
-        
-        # Clamp forward speed between min and max
-        base_forward_speed = max(min_forward_speed, min(base_forward_speed, max_forward_speed))
-        
-        print(f"Base forward speed: {base_forward_speed:.3f}")
-        
-        # Calculate displacement for angle correction
-        dx = target_x - fresh_position[0]
-        dz = target_z - fresh_position[2]
-        
-        # Calculate target angle (bearing to target)
-        target_angle = math.atan2(dx, dz)
-        target_angle_deg = math.degrees(target_angle)
-        
-        current_yaw_fresh = latest_data['euler_angles'][1] - yaw_offset
-        normalized_current_yaw = normalize_angle(current_yaw_fresh)
-        normalized_target_angle = normalize_angle(target_angle_deg)
-        
-        # Calculate angle error
-        angle_error = normalized_target_angle - normalized_current_yaw
-        
-        # Handle angle wrap-around
-        if angle_error > 180:
-            angle_error -= 360
-        elif angle_error < -180:
-            angle_error += 360
-            
-        print(f"Angle error: {angle_error:.1f}°")
-        
-        # Apply angle correction to the base forward speed
-        left_speed = base_forward_speed - angle_error * kp
-        right_speed = base_forward_speed + angle_error * kp
-        
-        print(f"Left speed: {left_speed:.3f}, Right speed: {right_speed:.3f}")
-            
-        # Move forward with proportional speed - THREADED
-        motor_command_threaded(motor_control.set, right_speed, left_speed)
-        time.sleep(0.1)  # Control loop delay
-
-def move_to(
-    x: float,
-    z: float,
-    *,
-    allow_reverse: bool      = True,
-    angle_threshold: float   = 90.0,   # deg: pick reverse if fwd-error > this
-    reverse_gain_mult: float = 2.0,    # steering gain multiplier in reverse
-    max_fwd_speed: float     = 0.6,    # m s⁻¹
-    max_rev_speed: float     = 0.4,    # m s⁻¹  (safer, slower)
-    min_fwd_speed: float     = 0.3,    # m s⁻¹  (avoid stall)
-    dist_kp: float           = 0.4,
-    steer_kp_fwd: float      = 0.003,
-    accel_fwd: float         = 0.8,    # m s⁻²   (linear acceleration limit)
-    accel_rev: float         = 0.6,    # m s⁻²   (reverse accel limit)
-    dist_tol: float          = 0.15,   # m
-    loop_hz: int             = 10      # control update rate
-):
-    """
-    One-phase drive to (x,z) with optional backing-up.
-    Acceleration is capped (accel_fwd/accel_rev) for jerk-free motion.
-    """
-
-    target_x, target_z = x, z
-    speed      = 0.0              # signed linear speed (+fwd, –rev)
-    last_time  = time.time()
-
-    while True:
-        now = time.time()
-        dt  = now - last_time
-        last_time = now
-
-        data = localization.get_latest_data()
-        if not data['position'] or not data['euler_angles']:
-            motor_command_threaded(motor_control.stop)
-            return False
-
-        # ── pose & distance ───────────────────────────────
-        px = data['position'][0] - position_offset[0]
-        pz = data['position'][2] - position_offset[2]
-        dx, dz = target_x - px, target_z - pz
-        dist   = math.hypot(dx, dz)
-        if dist < dist_tol:
-            motor_command_threaded(motor_control.stop)
-            return True
-
-        tgt_ang = normalize_angle(math.degrees(math.atan2(dx, dz)))
-        yaw     = normalize_angle(data['euler_angles'][1] - yaw_offset)
-        fwd_err = normalize_angle(tgt_ang - yaw)
-        rev_err = normalize_angle(tgt_ang - (yaw + 180))
-
-        driving_fwd = True
-        if allow_reverse and abs(fwd_err) > angle_threshold and abs(rev_err) < abs(fwd_err):
-            driving_fwd = False
-
-        if driving_fwd:
-            desired = max(min_fwd_speed,
-                          min(dist * dist_kp, max_fwd_speed))
-            steer_kp = steer_kp_fwd
-            ang_err  = fwd_err
-            a_max    = accel_fwd
-        else:
-            desired = -min(dist * dist_kp, max_rev_speed)
-            steer_kp = steer_kp_fwd * reverse_gain_mult
-            ang_err  = rev_err
-            a_max    = accel_rev
-
-        # ── bounded speed ramp ───────────────────────────
-        max_delta = a_max * dt
-        delta     = desired - speed
-        if abs(delta) > max_delta:
-            speed += math.copysign(max_delta, delta)
-        else:
-            speed  = desired
-
-        left  = speed - ang_err * steer_kp
-        right = speed + ang_err * steer_kp
-
-        motor_command_threaded(motor_control.set, right, left)
-
-        # keep loop at ~loop_hz
-        sleep_time = (1 / loop_hz) - (time.time() - now)
-        if sleep_time > 0:
-            time.sleep(sleep_time)
-
-def print_help():
-    """Print available commands"""
-    print("\nAvailable commands:")
-    print("  calibrate           - Set current position to (0,0,0) and yaw to 0")
-    print("  move_to <x> <z>     - Move to relative x,z position")
-    print("  status              - Show current position and tracking status")
-    print("  help                - Show this help message")
-    print("  quit                - Exit the program")
-
-def show_status():
-    """Show current robot status"""
-    latest_data = localization.get_latest_data()
-    print("\n=== Robot Status ===")
-    print(f"Raw Position: {latest_data['position']}")
-    print(f"Calibrated Position: {current_position}")
-    print(f"Raw Yaw: {latest_data['euler_angles'][1] if latest_data['euler_angles'] else 'N/A'}")
-    print(f"Calibrated Yaw: {current_yaw}")
-    print(f"Is Tracking: {latest_data['is_tracking']}")
-    print(f"Battery: {latest_data['battery_percent']}%")
-
-def command_loop():
-    """Main command loop for user interaction"""
-    print("🤖 Robot Path Following System")
-    print("Type 'help' for available commands")
-    
-    while True:
-        try:
-            command = input("\nrobot> ").strip().lower()
-            
-            if not command:
-                continue
-            
-            parts = command.split()
-            cmd = parts[0]
-            
-            if cmd == "quit" or cmd == "exit":
-                print("Goodbye!")
-                break
-            elif cmd == "help":
-                print_help()
-            elif cmd == "calibrate":
-                calibrate()
-            elif cmd == "status":
-                show_status()
-            elif cmd == "move_to":
-                if len(parts) != 3:
-                    print("Usage: move_to <x> <z>")
-                    print("Example: move_to 1.5 -2.0")
-                else:
-                    try:
-                        x = float(parts[1])
-                        z = float(parts[2])
-                        move_to(x, z)
-                    except ValueError:
-                        print("Error: x and z must be numbers")
+class BetaRobot(Runtime):
+    """One-phase reversible controller (see runtime.py for hardware, state and commands)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Gain schedule (gainschedule.py): move_to's gains looked up every cycle
+        self.gain_schedule = None
+        saved = self.state_store.get("gain_schedule")
+        if saved is not None:
+            try:
+                self.load_gain_schedule(saved, save=False)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Saved gain schedule not loaded: {e}")
+
+    def load_gain_schedule(self, path, save=True):
+        """Schedule move_to's gains from a profile (None: the fixed keyword values)"""
+        from gainschedule import GainSchedule
+        self.gain_schedule = GainSchedule.load(path) if path is not None else None
+        if self.gain_schedule is not None:
+            print(f"✓ {self.gain_schedule}")
+        if save:
+            self.state_store.update(gain_schedule=path)
+
+    def move_to(
+        self,
+        x: float,
+        z: float,
+        *,
+        allow_reverse: bool      = True,
+        angle_threshold: float   = 90.0,   # deg: pick reverse if fwd-error > this
+        reverse_gain_mult: float = 2.0,    # steering gain multiplier in reverse
+        max_fwd_speed: float     = 0.6,    # m s⁻¹
+        max_rev_speed: float     = 0.4,    # m s⁻¹  (safer, slower)
+        min_fwd_speed: float     = None,   # m s⁻¹  (avoid stall; 0.3, or 0 with compensation)
+        dist_kp: float           = 0.4,
+        steer_kp_fwd: float      = 0.003,
+        accel_fwd: float         = 0.8,    # m s⁻²   (linear acceleration limit)
+        accel_rev: float         = 0.6,    # m s⁻²   (reverse accel limit)
+        dist_tol: float          = 0.15,   # m
+        loop_hz: int             = 10,     # control update rate
+        controller: str          = None,   # "mpc" for mpc.py, None = self.controller
+        verbose: bool            = False   # print every cycle
+    ):
+        """
+        One-phase drive to (x,z) with optional backing-up.
+        Acceleration is capped (accel_fwd/accel_rev) for jerk-free motion.
+        With a gain schedule loaded, the gains it covers follow its tables and
+        the keyword values are ignored for those.
+        """
+        if (controller or self.controller) == "mpc":
+            return self.move_to_mpc(x, z, verbose)
+
+        if min_fwd_speed is None:
+            min_fwd_speed = 0.0 if self.motor.compensated else 0.3
+        params = ReversibleParams(
+            allow_reverse=allow_reverse, angle_threshold=angle_threshold * DEG,
+            reverse_gain_mult=reverse_gain_mult, max_fwd_speed=max_fwd_speed,
+            max_rev_speed=max_rev_speed, min_fwd_speed=min_fwd_speed, dist_kp=dist_kp,
+            steer_kp_fwd=math.degrees(steer_kp_fwd), accel_fwd=accel_fwd,
+            accel_rev=accel_rev, dist_tol=dist_tol)
+        if self.gain_schedule is not None:
+            # picks up edits to the profile file made since the last move
+            self.gain_schedule = params.schedule = self.gain_schedule.refresh()
+        return self.engine.run(Reversible(x, z, params, loop_hz), verbose)
+
+    def print_help(self):
+        super().print_help()
+        print("  gains [load <file> | off]        - Gain schedule profile for move_to")
+
+    def handle_command(self, cmd, parts):
+        if cmd != "gains":
+            return super().handle_command(cmd, parts)
+        if len(parts) == 1:
+            if self.gain_schedule is None:
+                print("No gain schedule - move_to uses fixed gains")
             else:
-                print(f"Unknown command: {cmd}")
-                print("Type 'help' for available commands")
-                
-        except KeyboardInterrupt:
-            print("\nGoodbye!")
-            break
-        except Exception as e:
-            print(f"Error: {e}")
+                self.gain_schedule.show()
+        elif parts[1] == "load" and len(parts) == 3:
+            try:
+                self.load_gain_schedule(parts[2])
+            except (OSError, ValueError) as e:
+                print(f"✗ {e}")
+        elif parts[1:] == ["off"]:
+            self.load_gain_schedule(None)
+            print("✓ Gain schedule off")
+        else:
+            print("Usage: gains [load <file> | off]")
+        return True
 
-localization = Localization(handle_location_update)
+def create_robot(**kwargs):
+    """A BetaRobot with its motor driver and localization server (see runtime.create_runtime)"""
+    return create_runtime(BetaRobot, **kwargs)
 
 # Start the command loop instead of running localization forever
 if __name__ == "__main__":
-    try:
-        # Give localization a moment to start up
-        import time
-        time.sleep(1)
-        command_loop()
-    finally:
-        motor_control.close()
+    main(BetaRobot)
 
 # list of commands, calibrate is one which sets position to 0,0,0 and sets the yaw to 0 also
-
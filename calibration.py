@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+SE(2) calibration: headset world frame → calibrated robot frame
+———————————————————————————————————————————————
+Conventions (QuestNav / Unity): ground plane is x-z, yaw is euler_angles[1]
+in degrees, yaw 0 faces +z and bearing = atan2(dx, dz).
+
+1. mounting: the headset sits at (mount_x, mount_z) in the robot frame
+   (+z forward, +x right) and is turned mount_yaw from the robot's forward
+   axis; the robot base pose is recovered from the headset pose
+2. origin: the base pose at calibration becomes (0, 0) facing +z, so
+   "move_to 1 0" means one metre to the robot's right - not the headset's world x
+
+cos/sin of the origin yaw are cached; Localization applies the transform once
+per frame and every consumer sees calibrated poses.
+"""
+
+import math
+
+
+class Calibration:
+    """Rigid transform from raw QuestNav pose to calibrated robot-base pose"""
+
+    def __init__(self, origin_x=0.0, origin_z=0.0, origin_yaw=0.0,
+                 mount_x=0.0, mount_z=0.0, mount_yaw=0.0):
+        """
+        Args:
+            origin_x, origin_z: robot base position at calibration (headset world, m)
+            origin_yaw: robot base heading at calibration (headset world, degrees)
+            mount_x, mount_z: headset position in the robot frame (m, +z forward, +x right)
+            mount_yaw: headset yaw relative to the robot's forward axis (degrees)
+        """
+        self.origin_x = origin_x
+        self.origin_z = origin_z
+        self.origin_yaw = origin_yaw
+        self.mount_x = mount_x
+        self.mount_z = mount_z
+        self.mount_yaw = mount_yaw
+        self._cos0 = math.cos(math.radians(origin_yaw))
+        self._sin0 = math.sin(math.radians(origin_yaw))
+        self._has_mount = mount_x != 0.0 or mount_z != 0.0
+
+    def base_pose(self, x, z, yaw_deg):
+        """Robot base pose (world x, z, yaw degrees) from the headset pose"""
+        yaw_deg -= self.mount_yaw
+        if self._has_mount:
+            th = math.radians(yaw_deg)
+            c, s = math.cos(th), math.sin(th)
+            # robot-frame vector (a, b) in world: (a·c + b·s, -a·s + b·c)
+            x -= self.mount_x * c + self.mount_z * s
+            z -= -self.mount_x * s + self.mount_z * c
+        return x, z, yaw_deg
+
+    def apply(self, position, euler_angles):
+        """
+        Calibrated copies of a QuestNav position [x, y, z] and euler angles
+        [roll, yaw, pitch] (degrees); y, roll and pitch pass through.
+        """
+        x, z, yaw = self.base_pose(position[0], position[2], euler_angles[1])
+        dx = x - self.origin_x
+        dz = z - self.origin_z
+        c, s = self._cos0, self._sin0
+        return ([dx * c - dz * s, position[1], dx * s + dz * c],
+                [euler_angles[0], yaw - self.origin_yaw, euler_angles[2]])
+
+    def rebased(self, position, euler_angles):
+        """A calibration with the same mounting whose origin is the current pose"""
+        x, z, yaw = self.base_pose(position[0], position[2], euler_angles[1])
+        return Calibration(x, z, yaw, self.mount_x, self.mount_z, self.mount_yaw)
+
+    def with_mount(self, mount_x, mount_z, mount_yaw=0.0):
+        return Calibration(self.origin_x, self.origin_z, self.origin_yaw,
+                           mount_x, mount_z, mount_yaw)
+
+    def to_dict(self):
+        return {"origin_x": self.origin_x, "origin_z": self.origin_z,
+                "origin_yaw": self.origin_yaw, "mount_x": self.mount_x,
+                "mount_z": self.mount_z, "mount_yaw": self.mount_yaw}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        return (f"Calibration(origin=({self.origin_x:.3f}, {self.origin_z:.3f}), "
+                f"yaw={self.origin_yaw:.1f}°, mount=({self.mount_x:.3f}, {self.mount_z:.3f}), "
+                f"mount_yaw={self.mount_yaw:.1f}°)")
+
+
+# quick check -------------------------------------------------------------
+if __name__ == "__main__":
+    # robot calibrated at (2, 3) facing world +x (yaw 90°), headset 10 cm ahead of the axle
+    raw_pos, raw_euler = [2.0 + 0.1, 0.0, 3.0], [0.0, 90.0, 0.0]
+    cal = Calibration(mount_z=0.1).rebased(raw_pos, raw_euler)
+    print(cal)
+    print("at calibration:", cal.apply(raw_pos, raw_euler))
+    # drive 1 m straight ahead (world +x) → calibrated (0, 1)
+    print("1 m ahead:     ", cal.apply([3.1, 0.0, 3.0], [0.0, 90.0, 0.0]))
+    # 1 m to the robot's right (world -z) → calibrated (1, 0)
+    print("1 m right:     ", cal.apply([2.1, 0.0, 2.0], [0.0, 90.0, 0.0]))
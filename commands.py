@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Remote commands over NetworkTables
+———————————————————————————————————————————————
+Request / acknowledge topics on the Localization server's NT instance, so a
+laptop, a dashboard or a test script can drive the robot without stdin:
+
+    <base>/command   string, JSON {"seq": 17, "cmd": "move_to", "args": [1.0, 2.0]}
+    <base>/ack       string, JSON {"seq": 17, "cmd": "move_to", "status": ..., ...}
+
+- cmd: move_to x z | move_to_pose x z yaw | follow_path [[x, z], ...] |
+  follow_spline [[x, z], ...] | stop | calibrate | status (yaw in degrees)
+- seq: increasing per client; a request with seq <= the last one is rejected
+  as stale (CommandClient starts from the wall clock in ms, so a restarted
+  client stays ahead)
+- status: "accepted" (a move was queued), then "done" / "failed" /
+  "preempted" with "result" {ok, x, z, yaw, elapsed}; "rejected" with
+  "error" for bad requests; stop / calibrate / status answer at once
+- preemption: a new move or a stop cancels the running move at its next
+  motor command (Runtime.cancel_move) and replaces any queued one, which
+  is acknowledged as preempted - latest request wins, also over moves and
+  teleop started from the REPL or a fleet (run_control(preempt=True))
+- moves run one at a time on a worker thread (through run_control, so on
+  the real-time thread when it is enabled); the NT listener never blocks
+
+Both topics are published with sendAll so no acknowledgement is coalesced.
+
+    python commands.py --host robot.local move_to 1.0 2.0
+"""
+
+import json
+import threading
+import time
+
+MOVES = ("move_to", "move_to_pose", "follow_path", "follow_spline")
+COMMANDS = MOVES + ("stop", "calibrate", "status")
+
+
+class CommandChannel:
+    """Robot side: executes NT requests on a Runtime and acknowledges them"""
+
+    def __init__(self, runtime, instance, base="/robot"):
+        """
+        Args:
+            runtime: runtime.Runtime to drive
+            instance: NetworkTableInstance (Localization.inst)
+            base: topic prefix (/<name>/robot in a fleet)
+        """
+        from ntcore import EventFlags, PubSubOptions
+
+        self.runtime = runtime
+        self.inst = instance
+        self.base = base
+        self.last_seq = None
+        self.handled = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = None            # (seq, cmd, args) waiting for the worker
+        self._active = None             # seq of the running move
+        self._preempted = None          # seq of the move cancelled for a newer request
+        self._ack = instance.getStringTopic(f"{base}/ack").publish(
+            PubSubOptions(sendAll=True, keepDuplicates=True))
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="nt-commands", daemon=True)
+        self._worker.start()
+        self._listener = instance.addListener([f"{base}/command"], EventFlags.kValueRemote,
+                                              self._on_request)
+
+    # NT listener thread -----------------------------------------------------
+    def _on_request(self, ev):
+        try:
+            request = json.loads(ev.data.value.getString())
+            seq, cmd = int(request["seq"]), request["cmd"]
+            args = request.get("args", [])
+        except (ValueError, KeyError, TypeError) as e:
+            self._send({"seq": None, "status": "rejected", "error": f"bad request: {e}"})
+            return
+        self.handled += 1
+        if self.last_seq is not None and seq <= self.last_seq:
+            self._send({"seq": seq, "cmd": cmd, "status": "rejected",
+                        "error": f"stale sequence (last {self.last_seq})"})
+            return
+        self.last_seq = seq
+        try:
+            self._dispatch(seq, cmd, args)
+        except Exception as e:
+            # an exception escaping an NT listener terminates the process
+            self._send({"seq": seq, "cmd": cmd, "status": "rejected", "error": str(e)})
+
+    def _dispatch(self, seq, cmd, args):
+        if cmd not in COMMANDS:
+            raise ValueError(f"unknown command {cmd!r}")
+        if cmd in MOVES:
+            if cmd == "move_to":
+                args = (float(args[0]), float(args[1]))
+            elif cmd == "move_to_pose":
+                args = (float(args[0]), float(args[1]), float(args[2]))
+            else:
+                args = ([(float(x), float(z)) for x, z in args],)
+                if not args[0]:
+                    raise ValueError("empty path")
+            with self._lock:
+                self._cancel_locked()
+                self._pending = (seq, cmd, args)
+            self._send({"seq": seq, "cmd": cmd, "status": "accepted"})
+            self._wake.set()
+        elif cmd == "stop":
+            with self._lock:
+                self._cancel_locked()
+            self.runtime.cancel_move()              # whoever started the move
+            self._send({"seq": seq, "cmd": cmd, "status": "done", "result": self._pose()})
+        elif cmd == "calibrate":
+            if self.busy:
+                raise ValueError("busy - stop the running move first")
+            ok = self.runtime.calibrate()
+            self._send({"seq": seq, "cmd": cmd, "status": "done" if ok else "failed"})
+        else:
+            self._send({"seq": seq, "cmd": cmd, "status": "done", "result": self.status()})
+
+    def _cancel_locked(self):
+        """Drop the queued move and cancel the running one (caller holds the lock)"""
+        if self._pending is not None:
+            seq, cmd, _ = self._pending
+            self._pending = None
+            self._send({"seq": seq, "cmd": cmd, "status": "preempted"})
+        if self._active is not None:
+            self._preempted = self._active
+            self.runtime.cancel_move()
+
+    # worker thread ----------------------------------------------------------
+    def _run(self):
+        from runtime import MoveCancelled
+
+        def job(seq, func, *args):
+            # a request that arrived between dequeue and run_control's reset
+            # of the cancel flag would otherwise be missed
+            if self._pending is not None or self._preempted == seq:
+                raise MoveCancelled
+            return func(*args)
+
+        while self._running:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                if self._pending is None:
+                    continue
+                seq, cmd, args = self._pending
+                self._pending = None
+                self._active = seq
+            rt = self.runtime
+            func = rt.follow_path if cmd == "follow_path" else \
+                rt.follow_spline if cmd == "follow_spline" else \
+                rt.move_to_pose if cmd == "move_to_pose" else \
+                rt.navigate_to if rt.planner is not None else rt.move_to
+            t0 = time.perf_counter()
+            try:
+                ok, error = bool(rt.run_control(job, seq, func, *args, preempt=True)), None
+            except Exception as e:
+                ok, error = False, str(e)
+            with self._lock:
+                preempted = self._preempted == seq
+                self._active = None
+            result = self._pose()
+            result["ok"] = ok
+            result["elapsed"] = round(time.perf_counter() - t0, 3)
+            ack = {"seq": seq, "cmd": cmd, "result": result,
+                   "status": "done" if ok else "preempted" if preempted else "failed"}
+            if error is not None:
+                ack["error"] = error
+            self._send(ack)
+
+    # helpers ----------------------------------------------------------------
+    @property
+    def busy(self):
+        return self._active is not None or self._pending is not None
+
+    def _pose(self):
+        position = self.runtime.current_position
+        return {"x": position[0], "z": position[2], "yaw": self.runtime.current_yaw}
+
+    def status(self):
+        status = self._pose()
+        status.update(busy=self.busy, active=self._active,
+                      tracking=self.runtime.localization.latest_is_tracking,
+                      pose_source=self.runtime.dead_reckoner.mode)
+        return status
+
+    def _send(self, ack):
+        self._ack.set(json.dumps(ack))
+        self.inst.flush()
+
+    def close(self):
+        self.inst.removeListener(self._listener)
+        with self._lock:
+            self._cancel_locked()
+        self._running = False
+        self._wake.set()
+        self._ack.close()
+
+    def __repr__(self):
+        return (f"CommandChannel({self.base}/command, {self.handled} requests, "
+                f"{'busy' if self.busy else 'idle'})")
+
+
+class CommandClient:
+    """Laptop / test side: send requests and wait for their acknowledgements"""
+
+    def __init__(self, host="127.0.0.1", port=5810, base="/robot", instance=None):
+        """
+        Args:
+            host, port: robot NT4 server (ignored when instance is given)
+            base: the robot's topic prefix
+            instance: an already connected NetworkTableInstance (tests in-process)
+        """
+        from ntcore import NetworkTableInstance, EventFlags, PubSubOptions
+
+        self._owns_instance = instance is None
+        if instance is None:
+            instance = NetworkTableInstance.create()
+            instance.setServer(host, port)
+            instance.startClient4("robot-commands")
+        self.inst = instance
+        self.seq = int(time.time() * 1000)
+        self.acks = {}                  # seq -> latest ack
+        self._changed = threading.Condition()
+        self._request = instance.getStringTopic(f"{base}/command").publish(
+            PubSubOptions(sendAll=True, keepDuplicates=True))
+        self._listener = instance.addListener([f"{base}/ack"], EventFlags.kValueRemote,
+                                              self._on_ack)
+
+    def _on_ack(self, ev):
+        ack = json.loads(ev.data.value.getString())
+        with self._changed:
+            self.acks[ack.get("seq")] = ack
+            self._changed.notify_all()
+
+    def wait_connected(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not self.inst.isConnected():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def send(self, cmd, *args):
+        """Publish a request; returns its sequence number"""
+        self.seq += 1
+        self._request.set(json.dumps({"seq": self.seq, "cmd": cmd, "args": list(args)}))
+        self.inst.flush()
+        return self.seq
+
+    def wait(self, seq, timeout=None, final=True):
+        """
+        The acknowledgement for seq, or None on timeout.
+
+        Args:
+            final: wait past "accepted" for the move's completion
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                ack = self.acks.get(seq)
+                if ack is not None and not (final and ack["status"] == "accepted"):
+                    return ack
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+    def request(self, cmd, *args, timeout=None):
+        """send() and wait() in one call"""
+        return self.wait(self.send(cmd, *args), timeout)
+
+    def close(self):
+        self.inst.removeListener(self._listener)
+        self._request.close()
+        if self._owns_instance:
+            self.inst.stopClient()
+
+
+# command line client -----------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Send a command to a robot over NetworkTables")
+    parser.add_argument("--host", default="127.0.0.1", help="robot running the NT server")
+    parser.add_argument("--port", type=int, default=5810)
+    parser.add_argument("--name", default=None, help="fleet robot name (topics under /<name>/robot)")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds to wait for completion")
+    parser.add_argument("cmd", choices=COMMANDS)
+    parser.add_argument("args", nargs="*", type=float,
+                        help="move_to: x z; move_to_pose: x z yaw; follow_path / follow_spline: x1 z1 x2 z2 ...")
+    args = parser.parse_args()
+
+    client = CommandClient(args.host, args.port, f"/{args.name}/robot" if args.name else "/robot")
+    try:
+        if not client.wait_connected():
+            raise SystemExit(f"✗ No NT server at {args.host}:{args.port}")
+        values = args.args
+        if args.cmd in ("follow_path", "follow_spline"):
+            values = [values[i:i + 2] for i in range(0, len(values) - 1, 2)]
+        ack = client.request(args.cmd, *values, timeout=args.timeout)
+        print(json.dumps(ack, indent=2) if ack is not None else "✗ No acknowledgement")
+    finally:
+        client.close()
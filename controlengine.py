@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+One control loop for every move
+———————————————————————————————————————————————
+ControlEngine owns what all the move loops used to repeat: pose acquisition
+(the dead reckoner), loop timing (LoopTimer, absolute deadlines), output
+(Runtime.drive_motors: geofence, motion monitor, telemetry, cancel) and the
+profiler stages. What differs between moves is a Strategy:
+
+    strategy.begin(state, pose, speed_scale, track_width)   # once, before the loop
+    strategy.step(state, dt) -> bool                        # every cycle; True = arrived
+
+A step leaves this cycle's wheel commands in state.left / state.right, the way
+the step functions it wraps already do, and the engine sends them unchanged.
+Strategy.twist() gives the (v, ω) they amount to, v = k·(L+R)/2 and
+ω = k·(L-R)/track as everywhere else, for simulation. A strategy reads the pose the engine refreshed through the snapshot handed to begin(),
+and prints progress (phase changes, arrival) only when strategy.verbose -
+the engine sets it from run(verbose).
+
+Strategies wrap the allocation-free step functions of controlstate.py,
+path.py and mpc.py:
+- TurnThenDrive: PID turn to the bearing, then ramped drive (Robot.move_to)
+- Reversible: one phase, backs up when the target is behind (BetaRobot.move_to)
+- PoseStabilizer: arrive at x, z facing a heading (move_to_pose)
+- PurePursuit: follow a SplinePath (follow_spline, repeat)
+- MPCStrategy: model predictive control (controller mpc)
+"""
+
+import abc
+import math
+import time
+
+from controlstate import turn_step, drive_step, reversible_step, pose_step, wrap_angle
+
+
+class Strategy(abc.ABC):
+    """A control law run by ControlEngine"""
+    hz = 10                             # loop rate
+    arrived = "✓ Target reached!"
+
+    def __init__(self):
+        self.pose = None
+        self.speed_scale = 0.5
+        self.track_width = 0.30
+        self.settle = 0.0               # > 0: the engine stops and waits this long, once
+        self.verbose = True             # print phase changes (set by ControlEngine.run)
+
+    def begin(self, state, pose, speed_scale, track_width):
+        """Reset state for this move; pose is the snapshot the engine refreshes every cycle"""
+        self.pose = pose
+        self.speed_scale = speed_scale
+        self.track_width = track_width
+
+    @abc.abstractmethod
+    def step(self, state, dt):
+        """Leave this cycle's wheel commands in state.left / state.right; True once arrived"""
+
+    def twist(self, state):
+        """(v, ω) of the wheel commands a step function left in state.left / state.right"""
+        k = self.speed_scale
+        return k * 0.5 * (state.left + state.right), k * (state.left - state.right) / self.track_width
+
+    def describe(self, state):
+        """One line for verbose moves"""
+        return (f"Distance to target: {state.distance:.2f} m, "
+                f"angle error: {math.degrees(state.angle_error):.1f}°, "
+                f"left: {state.left:.3f}, right: {state.right:.3f}")
+
+
+class TurnThenDrive(Strategy):
+    """Turn in place to the bearing (heading PID), pause, then drive with PID steering"""
+
+    def __init__(self, x, z, turn, drive, pause=0.5):
+        """
+        Args:
+            turn: controlstate.TurnParams (tolerance 360° skips the turn)
+            drive: controlstate.DriveParams
+            pause: stop between the phases (s)
+        """
+        super().__init__()
+        self.x, self.z = x, z
+        self.turn = turn
+        self.drive = drive
+        self.pause = pause
+        self.turning = True
+        self.first = True
+
+    def begin(self, state, pose, speed_scale, track_width):
+        super().begin(state, pose, speed_scale, track_width)
+        state.reset(self.x, self.z)
+        self.turning = self.first = True
+
+    def step(self, state, dt):
+        if self.first:
+            self.first = False
+            state.update_pose(self.pose)
+            if self.verbose:
+                print(f"Target angle: {math.degrees(state.bearing):.1f}°")
+                print("Phase 1: Turning to target...")
+        if self.turning:
+            if not turn_step(state, self.pose, self.turn, dt):
+                return False
+            if self.verbose:
+                print("✓ Angle reached!")
+                print("Phase 2: Moving to target...")
+            self.turning = False
+            self.settle = self.pause
+            state.speed = 0.0               # starts from rest
+            state.left = state.right = 0.0
+            return False
+        return drive_step(state, self.pose, self.drive, dt)
+
+    def describe(self, state):
+        if self.turning:
+            return f"Angle error: {math.degrees(state.angle_error):.1f}°, turn speed: {abs(state.left):.3f}"
+        return (f"Distance to target: {state.distance:.2f} m, speed: {state.speed:.3f}, "
+                f"angle error: {math.degrees(state.angle_error):.1f}°, "
+                f"left: {state.left:.3f}, right: {state.right:.3f}")
+
+
+class Reversible(Strategy):
+    """One-phase drive that backs up when the target is behind"""
+
+    def __init__(self, x, z, params, hz=10):
+        """
+        Args:
+            params: controlstate.ReversibleParams (with an optional gain schedule)
+        """
+        super().__init__()
+        self.x, self.z = x, z
+        self.params = params
+        self.hz = hz
+
+    def begin(self, state, pose, speed_scale, track_width):
+        super().begin(state, pose, speed_scale, track_width)
+        state.reset(self.x, self.z)         # speed: signed linear speed (+fwd, –rev)
+
+    def step(self, state, dt):
+        return reversible_step(state, self.pose, self.params, dt)
+
+    def describe(self, state):
+        return f"{super().describe(state)}, {'reversing' if state.reversing else 'forward'}"
+
+
+class PoseStabilizer(Strategy):
+    """Arrive at (x, z) facing yaw in one motion (controlstate.pose_step)"""
+
+    def __init__(self, x, z, yaw, params):
+        """
+        Args:
+            yaw: final heading (rad)
+            params: controlstate.PoseParams
+        """
+        super().__init__()
+        self.x, self.z, self.yaw = x, z, yaw
+        self.params = params
+
+    def begin(self, state, pose, speed_scale, track_width):
+        super().begin(state, pose, speed_scale, track_width)
+        state.reset(self.x, self.z, self.yaw)
+
+    def step(self, state, dt):
+        if pose_step(state, self.pose, self.params, dt):
+            self.arrived = f"✓ Pose reached! ({math.degrees(state.yaw):.1f}°)"
+            return True
+        return False
+
+    def describe(self, state):
+        return (f"Distance to target: {state.distance:.2f} m, "
+                f"angle error: {math.degrees(state.angle_error):.1f}°, "
+                f"heading error: {math.degrees(wrap_angle(state.target_yaw - state.yaw)):.1f}°, "
+                f"{'aligning' if state.aligning else 'reversing' if state.reversing else 'forward'}, "
+                f"left: {state.left:.3f}, right: {state.right:.3f}")
+
+
+class PurePursuit(Strategy):
+    """Follow a path.SplinePath without stopping at its waypoints"""
+    hz = 20
+    arrived = "✓ End of path reached!"
+
+    def __init__(self, path, params):
+        """
+        Args:
+            path: path.SplinePath
+            params: path.PathParams
+        """
+        super().__init__()
+        self.path = path
+        self.params = params
+
+    def begin(self, state, pose, speed_scale, track_width):
+        from path import path_step
+        super().begin(state, pose, speed_scale, track_width)
+        self._step = path_step
+        start = self.path.points[0]
+        state.reset(float(start[0]), float(start[1]))
+
+    def step(self, state, dt):
+        return self._step(state, self.pose, self.path, self.params, dt)
+
+    def describe(self, state):
+        return (f"Progress: {state.progress:.2f} / {self.path.length:.2f} m, "
+                f"angle error: {math.degrees(state.angle_error):.1f}°, "
+                f"left: {state.left:.3f}, right: {state.right:.3f}")
+
+
+class MPCStrategy(Strategy):
+    """Model predictive control to (x, z) (mpc.MPC)"""
+
+    def __init__(self, x, z, mpc):
+        super().__init__()
+        self.x, self.z = x, z
+        self.mpc = mpc
+        self.hz = 1.0 / mpc.params.dt
+
+    def begin(self, state, pose, speed_scale, track_width):
+        from mpc import mpc_step
+        super().begin(state, pose, speed_scale, track_width)
+        self._step = mpc_step
+        state.reset(self.x, self.z)
+        self.mpc.reset()
+
+    def step(self, state, dt):
+        return self._step(state, self.pose, self.mpc)
+
+    def describe(self, state):
+        return (f"{super().describe(state)}, "
+                f"solve: {self.mpc.solve_time * 1e3:.1f} ms ({self.mpc.iterations} it)")
+
+
+class ControlEngine:
+    """Runs strategies on a Runtime: pose in, wheel commands out, at the strategy's rate"""
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.strategy = None            # the one running, for status
+
+    def run(self, strategy, verbose=True):
+        """
+        Drive until the strategy arrives (True) or the pose is lost (False);
+        MoveCancelled / MotionFault from drive_motors propagate.
+        """
+        rt = self.runtime
+        state, pose = rt.control_state, rt.pose_snapshot
+        loop_timer = rt.loop_timer
+        read_pose = rt.profiled("pose_read", rt.dead_reckoner.read_pose)
+        step = rt.profiled("control_law", strategy.step)
+        motor_set = rt.profiled("motor_set", rt.motor.set)
+        track = rt.motor_model["track_width"] if rt.motor_model is not None else 0.30
+
+        strategy.verbose = verbose
+        strategy.begin(state, pose, rt.speed_scale(), track)
+        self.strategy = strategy
+        loop_timer.reset(strategy.hz)
+        dt = loop_timer.period
+        try:
+            while True:
+                if not read_pose(pose):
+                    print("No pose data, stopping...")
+                    rt.stop_motors()
+                    return False
+
+                if step(state, dt):
+                    if verbose:
+                        print(strategy.arrived)
+                    rt.stop_motors()
+                    return True
+                if strategy.settle > 0.0:
+                    rt.stop_motors()
+                    time.sleep(strategy.settle)
+                    strategy.settle = 0.0
+                    loop_timer.resync()
+                    continue
+
+                if verbose:
+                    print(strategy.describe(state))
+                rt.drive_motors(motor_set, state.left, state.right)
+                dt = loop_timer.wait()
+        finally:
+            self.strategy = None
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    from controlstate import (ControlState, PoseSnapshot, TurnParams, DriveParams, ReversibleParams,
+                              PoseParams, count_step_allocations, DEG)
+
+    def closed_loop(strategy, start, limit=40.0):
+        """Seconds to arrival on a kinematic diff drive, fed the (v, ω) of the strategy's wheel commands"""
+        state, pose = ControlState(), PoseSnapshot()
+        pose.x, pose.z, pose.yaw = start
+        pose.valid = pose.is_tracking = True
+        strategy.verbose = False
+        strategy.begin(state, pose, 0.5, 0.30)
+        dt = 1.0 / strategy.hz
+        t = 0.0
+        while t < limit:
+            if strategy.step(state, dt):
+                return t
+            v, w = strategy.twist(state)
+            strategy.settle = 0.0
+            pose.yaw += w * dt
+            pose.x += v * math.sin(pose.yaw) * dt
+            pose.z += v * math.cos(pose.yaw) * dt
+            pose.yaw_rate = w
+            t += dt
+        return None
+
+    start = (-1.0, -1.5, 120.0 * DEG)
+    strategies = {
+        "turn then drive": lambda: TurnThenDrive(0.0, 0.0, TurnParams(), DriveParams(), pause=0.0),
+        "reversible": lambda: Reversible(0.0, 0.0, ReversibleParams()),
+        "pose stabilizer": lambda: PoseStabilizer(0.0, 0.0, 90.0 * DEG, PoseParams()),
+    }
+    for name, make in strategies.items():
+        t = closed_loop(make(), start)
+        strategy = make()
+        strategy.verbose = False
+        state, pose = ControlState(), PoseSnapshot()
+        pose.x, pose.z, pose.yaw = 3.0, 3.0, 0.0
+        strategy.begin(state, pose, 0.5, 0.30)
+        blocks = count_step_allocations(lambda: strategy.step(state, 0.1), filename=__file__)
+        print(f"{name:>16}: arrived in {t:.1f} s, {blocks} blocks allocated per 1000 steps")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Dead-reckoning fallback for QuestNav tracking dropouts
+———————————————————————————————————————————————
+DeadReckoner is a pose source with the same read_pose(snapshot) interface as
+Localization. While tracking is good it passes the QuestNav pose through and
+keeps a wheel-speed model in sync. When isTracking goes false, or the pose
+stops changing while the wheels are commanded to move (a frozen NT stream;
+a robot standing still legitimately repeats its pose), it propagates the
+pose from the commanded wheel speeds through the identified motor model (sysid.py: deadband, gains, lag;
+latency.py: actuation delay) for at most max_dropout seconds. When tracking
+returns, the dead-reckoning error is blended out exponentially instead of
+letting the pose jump. Lost / reacquired messages are rate-limited
+(report_interval), so a flickering headset doesn't flood the console;
+giving up after max_dropout is always reported.
+
+Controllers report every command with command(left, right) - the same
+values they pass to MDDS30AntiPhase.set(). read_pose() advances the
+reckoner and belongs to the control loop; other threads (the geofence,
+teleop) use peek_pose(), which reads without changing anything.
+"""
+
+import math
+import time
+from collections import deque
+
+from controlstate import PoseSnapshot, wrap_angle
+
+# Used when no motor_model.json exists yet - rough, but better than freezing
+NOMINAL_WHEEL = {"gain_fwd": 0.5, "gain_rev": 0.5, "deadband_fwd": 0.0,
+                 "deadband_rev": 0.0, "tau": 0.1}
+
+# peek_pose() trusts the reckoner's mode only if read_pose() ran this recently
+PEEK_STALE = 0.5
+
+
+class WheelModel:
+    """Command → steady-state ground speed, plus first-order lag"""
+    __slots__ = ("gain_fwd", "gain_rev", "deadband_fwd", "deadband_rev", "tau",
+                 "linear_gain", "speed")
+
+    def __init__(self, params, v_max=None):
+        self.gain_fwd = params["gain_fwd"]
+        self.gain_rev = params["gain_rev"]
+        self.deadband_fwd = params["deadband_fwd"]
+        self.deadband_rev = params["deadband_rev"]
+        self.tau = max(params["tau"], 1e-3)
+        # With compensation installed, set() takes normalized speed: c → c · v_max
+        self.linear_gain = v_max
+        self.speed = 0.0
+
+    def target(self, u):
+        if self.linear_gain is not None:
+            return u * self.linear_gain
+        if u > self.deadband_fwd:
+            return self.gain_fwd * (u - self.deadband_fwd)
+        if u < -self.deadband_rev:
+            return self.gain_rev * (u + self.deadband_rev)
+        return 0.0
+
+    def advance(self, u, dt):
+        self.speed += (self.target(u) - self.speed) * (1.0 - math.exp(-dt / self.tau))
+        return self.speed
+
+
+class DeadReckoner:
+    """Tracked pose when available, model-propagated pose during short dropouts"""
+
+    def __init__(self, localization, motor_model=None, compensated=False, delay=0.0,
+                 max_dropout=1.0, stall_timeout=0.25, converge_time=0.5,
+                 verbose=True, report_interval=2.0):
+        """
+        Args:
+            localization: anything with read_pose(snapshot) (Localization)
+            motor_model: dict from sysid.load_model(), or None for a nominal model
+            compensated: True if MDDS30AntiPhase applies the model's feedforward table
+            delay: actuation-to-motion delay in seconds (latency.json)
+            max_dropout: give up (read_pose → False) after this long without tracking
+            stall_timeout: an unchanged pose for this long while the commands in
+                force are non-zero counts as lost tracking
+            converge_time: time constant for blending out the error on reacquisition
+            verbose: print tracking lost / reacquired events
+            report_interval: at most one such message per this many seconds
+        """
+        self.localization = localization
+        self.delay = delay
+        self.max_dropout = max_dropout
+        self.stall_timeout = stall_timeout
+        self.converge_time = converge_time
+        self.verbose = verbose
+        self.report_interval = report_interval
+
+        if motor_model is not None:
+            v_max = motor_model["v_max"] if compensated else None
+            self.left = WheelModel(motor_model["wheels"]["left"], v_max)
+            self.right = WheelModel(motor_model["wheels"]["right"], v_max)
+            self.track_width = motor_model["track_width"]
+        else:
+            self.left = WheelModel(NOMINAL_WHEEL)
+            self.right = WheelModel(NOMINAL_WHEEL)
+            self.track_width = 0.30
+
+        self._raw = PoseSnapshot()
+        self._commands = deque(maxlen=64)       # (t, left, right), newest last
+        self._u_left = self._u_right = 0.0
+        self.x = self.y = self.z = self.yaw = 0.0
+        self.yaw_rate = 0.0                     # model yaw rate while dead reckoning
+        self._have_pose = False
+        self._t = None
+        self._last_x = self._last_z = self._last_yaw = None
+        self._last_change = 0.0
+        self._lost_since = None
+        self._off_x = self._off_z = self._off_yaw = 0.0
+        self._blend_from = None
+        self.mode = "tracking"
+        self.dropouts = 0
+        self._reported = -math.inf
+        self._unreported = 0
+
+    def command(self, left, right):
+        """Record the command just sent to MDDS30AntiPhase.set(left, right)"""
+        self._commands.append((time.perf_counter(), left, right))
+
+    def expected_velocity(self):
+        """(v, ω) the wheel model says the commands produce now (m/s, rad/s; + = right)"""
+        v_left, v_right = self.left.speed, self.right.speed
+        return 0.5 * (v_left + v_right), (v_left - v_right) / self.track_width
+
+    def _command_in_force(self, t):
+        """Latest command issued at least `delay` seconds before t"""
+        cutoff = t - self.delay
+        commands = self._commands
+        while len(commands) > 1 and commands[1][0] <= cutoff:
+            commands.popleft()
+        if commands and commands[0][0] <= cutoff:
+            self._u_left, self._u_right = commands[0][1], commands[0][2]
+        return self._u_left, self._u_right
+
+    def _report(self, now, message):
+        """Print a tracking event, at most one per report_interval"""
+        if not self.verbose:
+            return
+        if now - self._reported < self.report_interval:
+            self._unreported += 1
+            return
+        if self._unreported:
+            message += f" ({self._unreported} more events not shown)"
+        print(message)
+        self._reported = now
+        self._unreported = 0
+
+    def _propagate(self, now):
+        dt = 0.0 if self._t is None else now - self._t
+        self._t = now
+        if dt <= 0.0:
+            return
+        u_left, u_right = self._command_in_force(now)
+        v_left = self.left.advance(u_left, dt)
+        v_right = self.right.advance(u_right, dt)
+        v = 0.5 * (v_left + v_right)
+        w = (v_left - v_right) / self.track_width   # left faster → yaw increases
+        heading = self.yaw + 0.5 * w * dt            # midpoint heading
+        self.x += v * math.sin(heading) * dt         # yaw 0 faces +z
+        self.z += v * math.cos(heading) * dt
+        self.yaw += w * dt
+        self.yaw_rate = w
+
+    def peek_pose(self, snap):
+        """
+        The pose read_pose() would give, without advancing the model or
+        switching modes: the tracked pose while tracking, the last
+        dead-reckoned pose during a dropout, False once lost. With no control
+        loop reading (teleop), just the tracked pose. Safe from any thread.
+        """
+        reading = self._t is not None and time.perf_counter() - self._t < PEEK_STALE
+        if reading and self.mode == "lost":
+            snap.valid = False
+            return False
+        if (not reading or self.mode == "tracking") and self.localization.read_pose(snap) \
+                and snap.is_tracking:
+            return True
+        if not (reading and self._have_pose):
+            snap.valid = False
+            return False
+        snap.x, snap.y, snap.z, snap.yaw = self.x, self.y, self.z, self.yaw
+        snap.yaw_rate = self.yaw_rate
+        snap.is_tracking = False
+        snap.valid = True
+        return True
+
+    def read_pose(self, snap):
+        now = time.perf_counter()
+        self._propagate(now)
+
+        raw = self._raw
+        have = self.localization.read_pose(raw)
+        if have and (raw.x != self._last_x or raw.z != self._last_z or raw.yaw != self._last_yaw):
+            self._last_x, self._last_z, self._last_yaw = raw.x, raw.z, raw.yaw
+            self._last_change = now
+        elif self._u_left == 0.0 and self._u_right == 0.0:
+            self._last_change = now             # standing still: a repeated pose is expected
+        tracking = have and raw.is_tracking and now - self._last_change < self.stall_timeout
+
+        if tracking:
+            if self._lost_since is not None:
+                # reacquired: start blending from the dead-reckoned pose
+                self._off_x = self.x - raw.x
+                self._off_z = self.z - raw.z
+                self._off_yaw = wrap_angle(self.yaw - raw.yaw)
+                self._blend_from = now
+                self._lost_since = None
+                self.mode = "tracking"
+                self._report(now, f"✓ Tracking reacquired "
+                                  f"(correction {math.hypot(self._off_x, self._off_z):.3f} m)")
+            self.x, self.y, self.z, self.yaw = raw.x, raw.y, raw.z, raw.yaw
+            self._have_pose = True
+
+            snap.x, snap.y, snap.z, snap.yaw = raw.x, raw.y, raw.z, raw.yaw
+            snap.yaw_rate = raw.yaw_rate
+            if self._blend_from is not None:
+                k = math.exp(-(now - self._blend_from) / self.converge_time)
+                if k < 0.01:
+                    self._blend_from = None
+                else:
+                    snap.x += self._off_x * k
+                    snap.z += self._off_z * k
+                    snap.yaw += self._off_yaw * k
+            snap.is_tracking = True
+            snap.valid = True
+            return True
+
+        if not self._have_pose:
+            snap.valid = False
+            return False
+        if self._lost_since is None:
+            self._lost_since = now
+            self._blend_from = None
+            self.dropouts += 1
+            self.mode = "dead_reckoning"
+            self._report(now, "⚠ Tracking lost - dead reckoning from wheel commands")
+        if now - self._lost_since > self.max_dropout:
+            if self.mode != "lost":
+                self.mode = "lost"
+                print(f"✗ Tracking lost for more than {self.max_dropout:.1f} s")
+            snap.valid = False
+            return False
+
+        snap.x, snap.y, snap.z, snap.yaw = self.x, self.y, self.z, self.yaw
+        snap.yaw_rate = self.yaw_rate
+        snap.is_tracking = False
+        snap.valid = True
+        return True
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Several robots from one host
+———————————————————————————————————————————————
+- one NetworkTables server (Localization.LocalizationServer); each headset
+  publishes under /<name>/questnav/... and feeds only its own robot's
+  pose store, filter and calibration
+- one Runtime per robot (own motor driver - pigpiod on the robot's Pi -,
+  state file, dead reckoner, loop timer, geofence, map)
+- one worker thread per robot, pinned to its own core with real-time
+  settings, so a long move or a heavy plan on one robot doesn't delay
+  another robot's loop (the control laws release the GIL while they wait);
+  it becomes the robot's rt_thread, so fleet moves, the robot's remote
+  commands and its REPL commands all run there, one at a time (the
+  runtime's move lock, see Runtime.run_control)
+
+    python fleet.py fleet.json
+
+fleet.json:
+    {"nt4_port": 5810,
+     "robots": {"alpha": {"pigpio_host": "alpha.local"},
+                "bravo": {"pigpio_host": "bravo.local", "controller": "beta"}}}
+per robot: pigpio_host, left_pin, right_pin, controller ("turn" | "beta"),
+state (file, default robot_state_<name>.json); telemetry_hz for all robots
+(controller state on /<name>/robot/state, see telemetry.py)
+"""
+
+import json
+import os
+import threading
+
+from realtime import RealtimeThread, isolated_cpus
+from runtime import MoveRejected, create_runtime
+
+
+def _controller_class(kind):
+    if kind == "beta":
+        from beta_controlloop import BetaRobot
+        return BetaRobot
+    from controlloop import Robot
+    return Robot
+
+
+def _worker_cpus(count):
+    """Distinct cores for the workers: isolated ones first, then the highest others"""
+    cpus = isolated_cpus()
+    if hasattr(os, "sched_getaffinity"):
+        cpus += sorted(os.sched_getaffinity(0) - set(cpus), reverse=True)
+    if not cpus:
+        return [None] * count
+    return [cpus[i % len(cpus)] for i in range(count)]
+
+
+class Fleet:
+    """Robots sharing one localization server, each driven by its own worker"""
+
+    def __init__(self, server, robots):
+        """
+        Args:
+            server: Localization.LocalizationServer all robots are attached to
+            robots: {name: Runtime}
+        """
+        self.server = server
+        self.robots = robots
+        self.workers = {}
+        self.jobs = {}                  # name: (thread, [result]) of the last move started
+
+    @classmethod
+    def from_config(cls, config, profile=False):
+        from Localization import LocalizationServer
+        server = LocalizationServer(config.get("nt4_port", 5810), config.get("nt3_port", 0))
+        robots = {}
+        for name, spec in config["robots"].items():
+            robots[name] = create_runtime(
+                _controller_class(spec.get("controller", "turn")),
+                server=server, name=name, profile=profile,
+                state_path=spec.get("state", f"robot_state_{name}.json"),
+                left_pin=spec.get("left_pin", 18), right_pin=spec.get("right_pin", 19),
+                pigpio_host=spec.get("pigpio_host"),
+                telemetry_hz=config.get("telemetry_hz", 20.0))
+        return cls(server, robots)
+
+    @classmethod
+    def load(cls, path, profile=False):
+        with open(path) as f:
+            return cls.from_config(json.load(f), profile=profile)
+
+    def start_workers(self, priority=50):
+        for (name, rt), cpu in zip(self.robots.items(), _worker_cpus(len(self.robots))):
+            # GC is left automatic: with several workers there is no common idle moment
+            worker = RealtimeThread(cpu=cpu, priority=priority, freeze_gc=False,
+                                    disable_gc=False, name=f"control-{name}").start()
+            self.workers[name] = worker
+            rt.rt_thread = worker       # every move of this robot runs on its worker
+        return self
+
+    def submit(self, name, func, *args):
+        """Start the move func(*args) on robot `name` without waiting (see wait())"""
+        rt = self.robots[name]
+        if rt.busy:
+            print(f"✗ {name} is busy - 'wait {name}' or 'stop {name}' first")
+            return False
+        result = []
+
+        def job():
+            try:
+                result.append(rt.run_control(func, *args))
+            except MoveRejected as e:           # another source started a move first
+                print(f"✗ {name}: {e}")
+                result.append(False)
+
+        thread = threading.Thread(target=job, name=f"move-{name}", daemon=True)
+        self.jobs[name] = (thread, result)
+        thread.start()
+        return True
+
+    def move_to(self, name, x, z):
+        """Start a move (planned if the robot has a map) on the robot's worker"""
+        rt = self.robots[name]
+        move = rt.navigate_to if rt.planner is not None else rt.move_to
+        return self.submit(name, move, x, z)
+
+    def wait(self, name=None, timeout=None):
+        for robot in [name] if name else list(self.jobs):
+            thread, result = self.jobs[robot]
+            thread.join(timeout)
+            done = not thread.is_alive() and result and result[0]
+            print(f"{robot}: {'✓ done' if done else '✗ failed or timed out'}")
+
+    def stop(self, name=None):
+        for robot in [name] if name else list(self.robots):
+            self.robots[robot].cancel_move()
+
+    def show_status(self):
+        for name, rt in self.robots.items():
+            x, z = rt.current_position[0], rt.current_position[2]
+            state = "moving" if rt.busy else "idle"
+            print(f"{name:>10}: ({x:6.2f}, {z:6.2f}) yaw {rt.current_yaw:7.1f}°  {state:6}  "
+                  f"tracking {rt.localization.latest_is_tracking}  {rt.dead_reckoner.mode}")
+
+    def print_help(self):
+        print("\nFleet commands:")
+        print("  robots                     - Pose and state of every robot")
+        print("  <name> move_to <x> <z>     - Start a move (returns immediately)")
+        print("  <name> <command ...>       - Any single-robot command (help for the list)")
+        print("  wait [name]                - Wait for moves to finish")
+        print("  stop [name]                - Stop one or all robots")
+        print("  quit                       - Exit")
+
+    def command_loop(self):
+        print(f"🤖 Fleet: {', '.join(self.robots)}")
+        print("Type 'help' for available commands")
+        while True:
+            try:
+                command = input("\nfleet> ").strip().lower()
+                if not command:
+                    continue
+                parts = command.split()
+                cmd = parts[0]
+                if cmd in ("quit", "exit"):
+                    print("Goodbye!")
+                    break
+                elif cmd == "help":
+                    self.print_help()
+                elif cmd == "robots":
+                    self.show_status()
+                elif cmd == "wait":
+                    self.wait(parts[1] if len(parts) > 1 else None)
+                elif cmd == "stop":
+                    self.stop(parts[1] if len(parts) > 1 else None)
+                elif cmd in self.robots:
+                    rest = parts[1:]
+                    if rest[:1] == ["move_to"] and len(rest) == 3:
+                        self.move_to(cmd, float(rest[1]), float(rest[2]))
+                    elif not rest or not self.robots[cmd].handle_command(rest[0], rest):
+                        print(f"Unknown command for {cmd}: {' '.join(rest)}")
+                else:
+                    print(f"Unknown command: {cmd}")
+                    print("Type 'help' for available commands")
+            except KeyboardInterrupt:
+                print("\nGoodbye!")
+                break
+            except Exception as e:
+                print(f"Error: {e}")
+
+    def close(self):
+        self.stop()
+        for thread, _ in self.jobs.values():
+            thread.join(timeout=2.0)
+        for rt in self.robots.values():
+            rt.close()                  # closes its worker (rt_thread) too
+        self.server.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Coordinate several robots from one host")
+    parser.add_argument("config", help="fleet JSON (robots, pigpio hosts, controllers)")
+    parser.add_argument("--priority", type=int, default=50,
+                        help="SCHED_FIFO priority for the per-robot workers")
+    parser.add_argument("--wait", type=float, default=10.0,
+                        help="seconds to wait for each robot's first tracked pose")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each robot's pipeline stages")
+    args = parser.parse_args()
+
+    fleet = Fleet.load(args.config, profile=args.profile)
+    try:
+        for name, rt in fleet.robots.items():
+            print(f"{name}: ", end="")
+            rt.wait_until_ready(args.wait)
+        fleet.start_workers(args.priority)
+        fleet.command_loop()
+    finally:
+        fleet.close()
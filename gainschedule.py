@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Gain scheduling for the one-phase (beta) move_to
+———————————————————————————————————————————————
+A profile holds tables of ReversibleParams gains over up to three axes:
+- speed: |commanded speed| (wheel command units)
+- distance: distance to the goal (m)
+- heading: |heading error| being steered out (degrees)
+Each axis is a uniform grid (min, max, points), so finding the cell is a
+multiply and a floor - no search - and a lookup is a trilinear blend of 8
+corners: O(1) per control cycle whatever the table size. Tables are
+flattened to Python lists at load time (faster to index than numpy from
+scalar code, and nothing is allocated per cycle).
+
+reversible_step() calls schedule.apply(params, ...) every cycle when
+params.schedule is set; the parameters not in the profile keep the values
+move_to was called with. Runtime keeps the loaded schedule and re-reads the
+file at the start of a move when it changed, so profiles can be edited or
+swapped (REPL: gains load <file>) between moves without a restart.
+
+Profile (JSON; axes may be omitted, a parameter may be a single number):
+
+    {"axes": {"distance": [0.0, 2.0, 5], "heading": [0.0, 90.0, 4]},
+     "params": {"dist_kp": [[...4 values...], ... 5 rows ...], "accel_fwd": 1.0}}
+
+    python gainschedule.py --write gain_schedule.json     # the default profile
+    python gainschedule.py --compare                       # fixed vs scheduled, simulated
+"""
+
+import json
+import math
+import os
+
+GAIN_SCHEDULE_FILE = "gain_schedule.json"
+
+AXES = ("speed", "distance", "heading")
+
+# ReversibleParams fields a profile may schedule, with the factor from profile
+# units (move_to's keyword units) to the internal ones
+SCHEDULABLE = {
+    "dist_kp": 1.0,
+    "steer_kp_fwd": math.degrees(1.0),     # per degree in the profile, per radian inside
+    "reverse_gain_mult": 1.0,
+    "max_fwd_speed": 1.0,
+    "max_rev_speed": 1.0,
+    "min_fwd_speed": 1.0,
+    "accel_fwd": 1.0,
+    "accel_rev": 1.0,
+}
+
+
+class GainSchedule:
+    """Uniform-grid tables of controller parameters with O(1) trilinear lookup"""
+
+    def __init__(self, profile, path=None):
+        """
+        Args:
+            profile: dict with "axes" and "params" (see module docstring)
+            path: file the profile came from (for refresh())
+
+        Raises:
+            ValueError: unknown axis or parameter, or a table of the wrong shape
+        """
+        import numpy as np
+
+        axes = profile.get("axes", {})
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            raise ValueError(f"unknown axes {sorted(unknown)} (use {', '.join(AXES)})")
+        self.axes = {}
+        self._lo, self._inv_step, self._last = [], [], []
+        for name in AXES:
+            lo, hi, n = axes.get(name, (0.0, 0.0, 1))
+            n = int(n)
+            if n < 1 or (n > 1 and not hi > lo):
+                raise ValueError(f"axis {name}: need min < max and at least 1 point")
+            if name in axes:
+                self.axes[name] = (lo, hi, n)
+            scale = math.radians(1.0) if name == "heading" else 1.0     # degrees in the profile
+            self._lo.append(lo * scale)
+            self._inv_step.append((n - 1) / ((hi - lo) * scale) if n > 1 else 0.0)
+            self._last.append(n - 1)
+        shape = tuple(self.axes[name][2] for name in AXES if name in self.axes)
+        n_speed, n_dist, n_head = (last + 1 for last in self._last)
+        self._strides = (n_dist * n_head, n_head, 1)
+
+        self.params = {}
+        self._tables = []
+        for name, values in profile.get("params", {}).items():
+            if name not in SCHEDULABLE:
+                raise ValueError(f"{name} cannot be scheduled (use {', '.join(SCHEDULABLE)})")
+            try:
+                table = np.broadcast_to(np.asarray(values, dtype=float), shape)
+            except ValueError:
+                raise ValueError(f"{name}: table shape {np.shape(values)} does not fit "
+                                 f"the axes {shape}") from None
+            self.params[name] = table
+            flat = (table.reshape(n_speed, n_dist, n_head) * SCHEDULABLE[name]).ravel().tolist()
+            self._tables.append((name, flat))
+        if not self._tables:
+            raise ValueError("profile schedules no parameters")
+        self.path = path
+        self._mtime = os.path.getmtime(path) if path is not None else None
+
+    @classmethod
+    def load(cls, path=GAIN_SCHEDULE_FILE):
+        with open(path) as f:
+            return cls(json.load(f), path)
+
+    def refresh(self):
+        """The schedule re-read from its file if that changed since loading, else self"""
+        if self.path is None:
+            return self
+        try:
+            if os.path.getmtime(self.path) == self._mtime:
+                return self
+            schedule = GainSchedule.load(self.path)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Gain schedule {self.path} not reloaded: {e}")
+            self._mtime = None if isinstance(e, OSError) else os.path.getmtime(self.path)
+            return self
+        print(f"✓ Gain schedule reloaded: {schedule}")
+        return schedule
+
+    def apply(self, params, speed, distance, heading):
+        """
+        Set the scheduled fields of params for this operating point (clamped
+        to the table edges).
+
+        Args:
+            params: controlstate.ReversibleParams (or anything with those fields)
+            speed: |commanded speed|
+            distance: distance to the goal (m)
+            heading: |heading error| (rad)
+        """
+        lo, inv_step, last = self._lo, self._inv_step, self._last
+        base = 0
+        # per axis: cell index i, fraction f, stride to the next point (0 at the edge)
+        u = (speed - lo[0]) * inv_step[0]
+        u = 0.0 if u < 0.0 else last[0] if u > last[0] else u
+        i = int(u)
+        f0 = u - i
+        s0 = self._strides[0] if i < last[0] else 0
+        base += i * self._strides[0]
+        u = (distance - lo[1]) * inv_step[1]
+        u = 0.0 if u < 0.0 else last[1] if u > last[1] else u
+        i = int(u)
+        f1 = u - i
+        s1 = self._strides[1] if i < last[1] else 0
+        base += i * self._strides[1]
+        u = (heading - lo[2]) * inv_step[2]
+        u = 0.0 if u < 0.0 else last[2] if u > last[2] else u
+        i = int(u)
+        f2 = u - i
+        s2 = 1 if i < last[2] else 0
+        base += i
+
+        g0, g1, g2 = 1.0 - f0, 1.0 - f1, 1.0 - f2
+        w00, w01, w10, w11 = g0 * g1, g0 * f1, f0 * g1, f0 * f1
+        b01, b10 = base + s1, base + s0
+        b11 = b10 + s1
+        tables, k, n = self._tables, 0, len(self._tables)
+        while k < n:                    # not a for loop: that allocates an iterator per call
+            name, t = tables[k]
+            setattr(params, name,
+                    (w00 * t[base] + w01 * t[b01] + w10 * t[b10] + w11 * t[b11]) * g2
+                    + (w00 * t[base + s2] + w01 * t[b01 + s2] + w10 * t[b10 + s2]
+                       + w11 * t[b11 + s2]) * f2)
+            k += 1
+
+    def show(self):
+        print(f"Gain schedule{f' ({self.path})' if self.path else ''}:")
+        for name, (lo, hi, n) in self.axes.items():
+            print(f"  axis {name:<9} {lo:g} .. {hi:g}, {n} points")
+        for name, table in self.params.items():
+            print(f"  {name:<18} {table.min():.4g} .. {table.max():.4g}")
+
+    def __repr__(self):
+        axes = " x ".join(f"{name}[{n}]" for name, (_, _, n) in self.axes.items()) or "constant"
+        return f"GainSchedule({axes}: {', '.join(self.params)})"
+
+
+def default_profile():
+    """
+    Aggressive far from the goal, gentle close in: distance gain and
+    acceleration fall with distance to the goal, the steering gain falls with
+    speed (less heading correction per cycle when each cycle covers more
+    ground) and rises with heading error (big errors are turned out quickly)
+    """
+    return {
+        "axes": {"speed": [0.3, 0.6, 2], "distance": [0.0, 1.5, 4], "heading": [0.0, 90.0, 4]},
+        "params": {
+            "dist_kp": [[0.8], [1.0], [1.2], [1.2]],
+            "accel_fwd": [[0.8], [1.2], [1.6], [1.6]],
+            "steer_kp_fwd": [
+                [[0.004, 0.006, 0.010, 0.012]],
+                [[0.003, 0.004, 0.008, 0.010]],
+            ],
+        },
+    }
+
+
+def save_profile(profile, path=GAIN_SCHEDULE_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+
+
+# stand-alone use ---------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    from controlstate import (ControlState, PoseSnapshot, ReversibleParams, reversible_step,
+                              count_step_allocations)
+
+    parser = argparse.ArgumentParser(description="Gain schedule profiles for the beta move_to")
+    parser.add_argument("--write", metavar="FILE", help="write the default profile")
+    parser.add_argument("--profile", help="profile to compare (default: the built-in one)")
+    parser.add_argument("--compare", action="store_true", help="fixed vs scheduled gains, simulated")
+    parser.add_argument("--moves", type=int, default=40)
+    args = parser.parse_args()
+
+    if args.write:
+        save_profile(default_profile(), args.write)
+        print(f"✓ Wrote {args.write}")
+
+    schedule = GainSchedule.load(args.profile) if args.profile else GainSchedule(default_profile())
+    params = ReversibleParams()
+    params.schedule = schedule
+    n = 100_000
+    t0 = time.perf_counter()
+    for i in range(n):
+        schedule.apply(params, 0.45, (i % 200) * 0.01, (i % 90) * 0.01)
+    print(f"{schedule}: apply {(time.perf_counter() - t0) / n * 1e6:.2f} µs, "
+          f"{count_step_allocations(lambda: schedule.apply(params, 0.45, 0.7, 0.3), filename=__file__)} "
+          "blocks allocated per 1000")
+
+    if args.compare:
+        # diff drive with 0.5 m/s per unit command, 0.1 s motor lag and 0.1 s delay
+        def run(schedule, start, dt=0.1, limit=40.0):
+            p = ReversibleParams(schedule=schedule)
+            state, pose = ControlState(), PoseSnapshot()
+            pose.x, pose.z, pose.yaw = start
+            state.reset(0.0, 0.0)
+            v = w = 0.0
+            queue = [(0.0, 0.0)]            # one cycle of actuation delay
+            t, flips, last_sign = 0.0, 0, 0.0
+            while t < limit:
+                if reversible_step(state, pose, p, dt):
+                    return t, flips
+                sign = math.copysign(1.0, state.left - state.right)
+                if abs(state.left - state.right) > 0.02:
+                    flips += sign != last_sign and last_sign != 0.0
+                    last_sign = sign
+                queue.append((state.left, state.right))
+                left, right = queue.pop(0)
+                k = 1.0 - math.exp(-dt / 0.1)
+                v += (0.25 * (left + right) - v) * k
+                w += (0.5 * (left - right) / 0.30 - w) * k
+                pose.yaw += w * dt
+                pose.x += v * math.sin(pose.yaw) * dt
+                pose.z += v * math.cos(pose.yaw) * dt
+                t += dt
+            return None, flips
+
+        rng = random.Random(3)
+        starts = [(rng.uniform(-2.5, 2.5), rng.uniform(-2.5, 2.5), math.radians(rng.uniform(-180, 180)))
+                  for _ in range(args.moves)]
+        for label, s in (("fixed", None), ("scheduled", schedule)):
+            results = [run(s, start) for start in starts]
+            times = [t for t, _ in results if t is not None]
+            print(f"{label:>10}: mean {sum(times) / max(len(times), 1):5.2f} s, "
+                  f"max {max(times, default=float('nan')):5.2f} s, "
+                  f"{len(results) - len(times)} failed, "
+                  f"{sum(f for _, f in results) / len(results):.1f} steering reversals per move")
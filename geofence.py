@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Geofence: keep-in / keep-out polygons enforced in the motor layer
+———————————————————————————————————————————————
+- polygons in calibrated coordinates (x, z in metres), loaded from JSON:
+    {"keep_in": [[[x, z], ...], ...], "keep_out": [...], "resolution": 0.05}
+  a point is allowed if it is inside some keep-in polygon (or there are none)
+  and inside no keep-out polygon
+- rasterized once into flat tables: allowed[cell] and clearance[cell]
+  (signed distance to the boundary), so every check is a floor,
+  a multiply and an index - no polygon math at run time
+- GeofencedMotor wraps MDDS30AntiPhase: every set() predicts where the robot
+  would stop (v·latency + v²/2a along the heading); if that point is
+  forbidden the linear part of the command is clamped to what the clearance
+  around the robot allows and the turn part kept. Outside the fence only
+  motion back towards it passes (signed distance increases). Once a pose
+  has been seen, a missing one (tracking lost for good) zeroes the linear
+  part: the fence fails closed
+Rasterizing requires numpy; the run-time checks are plain Python.
+"""
+
+import json
+import math
+from array import array
+
+from controlstate import PoseSnapshot
+
+
+def _inside(polygon, xs, zs):
+    """Even-odd point-in-polygon test for arrays of points"""
+    import numpy as np
+    inside = np.zeros(xs.shape, bool)
+    n = len(polygon)
+    for i in range(n):
+        x0, z0 = polygon[i]
+        x1, z1 = polygon[(i + 1) % n]
+        if z0 == z1:
+            continue
+        crosses = (z0 > zs) != (z1 > zs)
+        x_at = x0 + (zs - z0) * (x1 - x0) / (z1 - z0)
+        inside ^= crosses & (xs < x_at)
+    return inside
+
+
+class Geofence:
+    """Rasterized keep-in / keep-out polygons with O(1) lookups"""
+
+    def __init__(self, keep_in=(), keep_out=(), resolution=0.05, margin=1.0):
+        """
+        Args:
+            keep_in: polygons [[x, z], ...] the robot must stay inside (any of them)
+            keep_out: polygons the robot must never enter
+            resolution: raster cell size (m)
+            margin: raster padding around keep-out-only fences (m); beyond it
+                the clearance reads as margin
+        """
+        import numpy as np
+        from occupancy import distance_transform
+
+        self.keep_in = [[tuple(p) for p in poly] for poly in keep_in]
+        self.keep_out = [[tuple(p) for p in poly] for poly in keep_out]
+        self.resolution = resolution
+        self.margin = margin
+        points = [p for poly in self.keep_in or self.keep_out for p in poly]
+        if not points:
+            raise ValueError("geofence needs at least one polygon")
+        pad = 2 * resolution if self.keep_in else margin
+        xs, zs = zip(*points)
+        self.origin_x = min(xs) - pad
+        self.origin_z = min(zs) - pad
+        self.cols = int(math.ceil((max(xs) + pad - self.origin_x) / resolution))
+        self.rows = int(math.ceil((max(zs) + pad - self.origin_z) / resolution))
+
+        cz, cx = np.mgrid[0:self.rows, 0:self.cols]
+        cx = self.origin_x + (cx + 0.5) * resolution
+        cz = self.origin_z + (cz + 0.5) * resolution
+        if self.keep_in:
+            allowed = np.zeros(cx.shape, bool)
+            for poly in self.keep_in:
+                allowed |= _inside(poly, cx, cz)
+        else:
+            allowed = np.ones(cx.shape, bool)
+        for poly in self.keep_out:
+            allowed &= ~_inside(poly, cx, cz)
+
+        # signed distance to the fence boundary: + inside (clearance), - outside (depth);
+        # centre-to-centre distance, less half a cell to the boundary and half a
+        # cell for where the robot sits inside its own cell
+        forbidden = ~allowed
+        if forbidden.any():
+            clearance = np.maximum(np.sqrt(distance_transform(forbidden)) - 1.0, 0.0) * resolution
+        else:
+            clearance = np.full(allowed.shape, margin)
+        if not self.keep_in:
+            clearance = np.minimum(clearance, margin)
+        if allowed.any():
+            depth = np.sqrt(distance_transform(allowed)) * resolution
+        else:
+            depth = np.full(allowed.shape, float(self.rows + self.cols) * resolution)
+        signed = np.where(allowed, clearance, -depth)
+
+        # flat stdlib arrays: scalar indexing is several times cheaper than numpy's
+        self._allowed = bytes(allowed.astype(np.uint8).ravel())
+        self._signed = array("d", signed.ravel().tolist())
+        self._outside = 0 if self.keep_in else 1           # raster exterior
+        self._outside_signed = -math.inf if self.keep_in else margin
+
+    def _index(self, x, z):
+        col = int((x - self.origin_x) // self.resolution)
+        row = int((z - self.origin_z) // self.resolution)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row * self.cols + col
+        return -1
+
+    def allowed(self, x, z):
+        i = self._index(x, z)
+        return bool(self._allowed[i]) if i >= 0 else bool(self._outside)
+
+    def signed_distance(self, x, z):
+        """Clearance (m) inside the fence, minus the depth outside it"""
+        i = self._index(x, z)
+        return self._signed[i] if i >= 0 else self._outside_signed
+
+    def clearance(self, x, z):
+        """Distance (m) to the nearest forbidden point; 0 if (x, z) is forbidden"""
+        return max(self.signed_distance(x, z), 0.0)
+
+    def to_dict(self):
+        return {"keep_in": self.keep_in, "keep_out": self.keep_out,
+                "resolution": self.resolution, "margin": self.margin}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("keep_in", ()), data.get("keep_out", ()),
+                   data.get("resolution", 0.05), data.get("margin", 1.0))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self):
+        return (f"Geofence({len(self.keep_in)} keep-in / {len(self.keep_out)} keep-out, "
+                f"{self.cols}x{self.rows} cells @ {self.resolution:.2f} m)")
+
+
+class GeofencedMotor:
+    """Motor driver wrapper that clamps or stops commands leaving the fence"""
+
+    def __init__(self, motor, fence, pose_source, speed_scale=0.5, decel=1.0, latency=0.1):
+        """
+        Args:
+            motor: MDDS30AntiPhase (everything but set() is passed through)
+            fence: Geofence
+            pose_source: read_pose-like function filling a PoseSnapshot with the
+                calibrated pose (False without one). It is called from whatever
+                thread sends the command, so it must not change state: the
+                Runtime passes DeadReckoner.peek_pose
+            speed_scale: ground speed (m/s) per unit command
+            decel: braking deceleration assumed for the stopping point (m/s²)
+            latency: actuation + sensing delay before braking starts (s)
+        """
+        self.motor = motor
+        self.fence = fence
+        self.pose_source = pose_source
+        self.speed_scale = speed_scale
+        self.decel = decel
+        self.latency = latency
+        self.clamped = 0            # commands clamped since start
+        self.stopped = 0            # commands whose linear part was zeroed
+        self.inside = True
+        self.blind = 0              # commands sent without a pose (linear part zeroed)
+        self._seen_pose = False
+        self._pose = PoseSnapshot()
+
+    def __getattr__(self, name):
+        return getattr(self.motor, name)
+
+    def set(self, left, right):
+        pose = self._pose
+        if not self.pose_source(pose):
+            if not self._seen_pose:
+                self.motor.set(left, right)     # no pose yet: nothing to check against
+                return
+            turn = 0.5 * (left - right)         # position unknown: turn in place at most
+            self.blind += 1
+            self.motor.set(turn, -turn)
+            return
+        self._seen_pose = True
+        fence = self.fence
+        linear = 0.5 * (left + right)
+        v = abs(linear) * self.speed_scale
+        reach = v * self.latency + v * v / (2.0 * self.decel)
+        if linear < 0.0:
+            reach = -reach
+        sin_yaw, cos_yaw = math.sin(pose.yaw), math.cos(pose.yaw)     # yaw 0 faces +z
+        stop_x, stop_z = pose.x + reach * sin_yaw, pose.z + reach * cos_yaw
+        self.inside = fence.allowed(pose.x, pose.z)
+        if self.inside:
+            # stopping point and the way there allowed: pass
+            if fence.allowed(stop_x, stop_z) and fence.allowed(
+                    pose.x + 0.5 * reach * sin_yaw, pose.z + 0.5 * reach * cos_yaw):
+                self.motor.set(left, right)
+                return
+            # else: the largest speed whose stopping distance fits in the clearance
+            a, tau = self.decel, self.latency
+            room = fence.clearance(pose.x, pose.z)
+            v_max = a * (math.sqrt(tau * tau + 2.0 * room / a) - tau)
+            limited = math.copysign(min(abs(linear), v_max / self.speed_scale), linear)
+            self.clamped += 1
+        elif fence.signed_distance(stop_x, stop_z) > fence.signed_distance(pose.x, pose.z):
+            self.motor.set(left, right)         # outside, but heading back in
+            return
+        else:
+            limited = 0.0                       # outside: no motion that goes deeper
+            self.stopped += 1
+        turn = 0.5 * (left - right)
+        self.motor.set(limited + turn, limited - turn)
+
+    def stats(self):
+        return (f"{'inside' if self.inside else 'OUTSIDE'}, "
+                f"{self.clamped} commands clamped, {self.stopped} stopped, {self.blind} without a pose")
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+
+    class _Motor:
+        def set(self, left, right):
+            self.last = (left, right)
+
+    class _Pose:
+        x, z, yaw = 0.0, 0.0, 0.0
+
+        def read_pose(self, snap):
+            snap.x, snap.z, snap.yaw = self.x, self.z, self.yaw
+            return True
+
+    # a 3 x 2 m table with a keep-out box in the middle
+    fence = Geofence(keep_in=[[(-1.5, -1.0), (1.5, -1.0), (1.5, 1.0), (-1.5, 1.0)]],
+                     keep_out=[[(0.3, 0.3), (0.7, 0.3), (0.7, 0.7), (0.3, 0.7)]])
+    print(fence)
+    motor, pose = _Motor(), _Pose()
+    guarded = GeofencedMotor(motor, fence, pose.read_pose)
+    for z, command in ((0.0, 0.6), (0.6, 0.6), (0.85, 0.6), (0.95, 0.6), (1.1, 0.6), (1.1, -0.2)):
+        pose.z = z
+        guarded.set(command, command)
+        print(f"z={z:4.2f}  clearance {fence.clearance(0.0, z):.2f} m  "
+              f"set({command}, {command})  →  set({motor.last[0]:.2f}, {motor.last[1]:.2f})")
+    print(guarded.stats())
+
+    n = 100_000
+    pose.z = 0.0
+    t0 = time.perf_counter()
+    for _ in range(n):
+        guarded.set(0.5, 0.4)
+    print(f"{(time.perf_counter() - t0) / n * 1e6:.2f} µs per guarded set()")
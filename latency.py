@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Actuation-to-sensing latency measurement
+———————————————————————————————————————————————
+Commands controlled inputs through MDDS30AntiPhase and watches Localization:
+- step trials: spin (or drive) command steps, alternating direction, fitted
+  with a dead-time + first-order-lag model → delay and motor time constant,
+  with 95% confidence intervals over the trials
+- chirp: sine sweep of the same command, cross-correlated with the observed
+  rate → effective delay across frequencies (a cross-check on the steps)
+Results are stored as JSON (latency.json) for estimators and controllers.
+Requires numpy. The robot turns in place (or drives back and forth) - give it room.
+"""
+
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from controlstate import PoseSnapshot
+
+LATENCY_FILE = "latency.json"
+
+# two-sided 95% Student t critical values by degrees of freedom
+_T95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36,
+        8: 2.31, 9: 2.26, 10: 2.23, 15: 2.13, 20: 2.09, 30: 2.04}
+
+
+def t95(dof):
+    if dof <= 0:
+        return math.inf
+    for d in sorted(_T95):
+        if dof <= d:
+            return _T95[d]
+    return 1.96
+
+
+def mean_ci(values):
+    """Mean and 95% confidence half-width"""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return float(values.mean()), math.inf
+    sem = values.std(ddof=1) / math.sqrt(len(values))
+    return float(values.mean()), float(t95(len(values) - 1) * sem)
+
+
+def run_profile(motor, localization, command_fn, duration, mode="turn", rate_hz=1000):
+    """
+    Apply command_fn(t) → command for `duration` seconds while sampling the pose.
+
+    For mode "turn" the command u is applied as set(u, -u) (positive u
+    increases yaw); for "drive" as set(u, u).
+
+    Returns:
+        (command_log, samples): lists of (t, u) and (t, signal) where signal is
+        unwrapped yaw in degrees (turn) or distance along the start heading (drive)
+    """
+    snap = PoseSnapshot()
+    if not localization.read_pose(snap):
+        raise RuntimeError("No pose data - is QuestNav connected?")
+    x0, z0, yaw0 = snap.x, snap.z, snap.yaw
+    fx, fz = math.sin(yaw0), math.cos(yaw0)     # start heading (yaw 0 faces +z)
+
+    commands, samples = [], []
+    last_u = None
+    last_pose = None
+    period = 1.0 / rate_hz
+    t_start = time.perf_counter()
+    try:
+        while True:
+            t = time.perf_counter() - t_start
+            if t >= duration:
+                break
+            u = command_fn(t)
+            if u != last_u:
+                if mode == "turn":
+                    motor.set(u, -u)
+                else:
+                    motor.set(u, u)
+                commands.append((time.perf_counter() - t_start, u))
+                last_u = u
+
+            if localization.read_pose(snap):
+                pose = (snap.x, snap.z, snap.yaw)
+                if pose != last_pose:           # only new QuestNav frames
+                    if mode == "turn":
+                        signal = math.degrees(snap.yaw - yaw0)
+                    else:
+                        signal = (snap.x - x0) * fx + (snap.z - z0) * fz
+                    samples.append((t, signal))
+                    last_pose = pose
+            time.sleep(period)
+    finally:
+        motor.stop()
+
+    if mode == "turn" and samples:
+        t_arr = np.array([s[0] for s in samples])
+        unwrapped = np.degrees(np.unwrap(np.radians([s[1] for s in samples])))
+        samples = list(zip(t_arr.tolist(), unwrapped.tolist()))
+    return commands, samples
+
+
+def fit_step(t, signal, t_step, max_delay=0.5, max_tau=1.0):
+    """
+    Fit signal(t) = K·(s - tau·(1 - exp(-s/tau))), s = max(t - t_step - delay, 0):
+    an integrator behind a first-order lag and a dead time, i.e. the pose
+    response to a step in wheel-speed command. Grid search over (delay, tau)
+    with K solved in closed form, all vectorized.
+
+    Returns:
+        dict with delay, tau, gain (signal units per second) and rms residual
+    """
+    t = np.asarray(t, dtype=float) - t_step
+    y = np.asarray(signal, dtype=float)
+    y = y - y[t <= 0].mean() if np.any(t <= 0) else y - y[0]
+
+    delays = np.arange(0.0, max_delay, 0.002)
+    taus = np.geomspace(0.005, max_tau, 60)
+    s = np.maximum(t[None, :] - delays[:, None], 0.0)[:, None, :]    # (d, 1, n)
+    tau = taus[None, :, None]                                          # (1, k, 1)
+    basis = s - tau * (1.0 - np.exp(-s / tau))                         # (d, k, n)
+
+    bb = np.einsum("dkn,dkn->dk", basis, basis)
+    by = np.einsum("dkn,n->dk", basis, y)
+    bb = np.where(bb > 0, bb, np.inf)
+    sse = y @ y - by * by / bb
+    i, j = np.unravel_index(np.argmin(sse), sse.shape)
+    gain = by[i, j] / bb[i, j]
+    rms = math.sqrt(max(sse[i, j], 0.0) / len(y))
+    return {"delay": float(delays[i]), "tau": float(taus[j]), "gain": float(gain), "rms": rms}
+
+
+def measure_steps(motor, localization, trials=6, amplitude=0.35, mode="turn",
+                  pre=0.5, hold=1.5, settle=1.0):
+    """Step trials alternating direction; returns per-trial fits"""
+    fits = []
+    for k in range(trials):
+        u = amplitude if k % 2 == 0 else -amplitude
+        commands, samples = run_profile(
+            motor, localization, lambda t: 0.0 if t < pre else u, pre + hold, mode=mode)
+        t_step = next(tc for tc, uc in commands if uc != 0.0)
+        if len(samples) < 10:
+            raise RuntimeError("Too few pose updates during the step - is tracking running?")
+        fit = fit_step([s[0] for s in samples], [s[1] for s in samples], t_step)
+        fits.append(fit)
+        print(f"  trial {k + 1}/{trials}: delay {fit['delay'] * 1e3:.0f} ms, "
+              f"tau {fit['tau'] * 1e3:.0f} ms, rms {fit['rms']:.3f}")
+        time.sleep(settle)
+    return fits
+
+
+def measure_chirp(motor, localization, amplitude=0.3, f0=0.2, f1=3.0, duration=8.0,
+                  mode="turn", rate_hz=200):
+    """Sine sweep; delay = lag that maximises the command / observed-rate cross-correlation"""
+    k = (f1 - f0) / duration
+
+    def chirp(t):
+        return amplitude * math.sin(2 * math.pi * (f0 * t + 0.5 * k * t * t))
+
+    commands, samples = run_profile(motor, localization, chirp, duration, mode=mode)
+    if len(samples) < 20:
+        raise RuntimeError("Too few pose updates during the chirp")
+
+    grid = np.arange(0.0, duration, 1.0 / rate_hz)
+    tc, uc = np.array(commands).T
+    u = uc[np.clip(np.searchsorted(tc, grid, side="right") - 1, 0, None)]   # zero-order hold
+    ts, ys = np.array(samples).T
+    rate = np.gradient(np.interp(grid, ts, ys), grid)
+
+    u = u - u.mean()
+    rate = rate - rate.mean()
+    max_lag = int(0.5 * rate_hz)
+    corr = np.array([u[:len(u) - lag] @ rate[lag:] for lag in range(max_lag)])
+    lag = int(np.argmax(corr))
+    return {"delay": lag / rate_hz, "peak_correlation": float(corr[lag] / (np.linalg.norm(u) * np.linalg.norm(rate)))}
+
+
+def measure_latency(motor, localization, trials=6, amplitude=0.35, mode="turn", chirp=True):
+    """Run step trials (and optionally a chirp); returns the summary dict"""
+    print(f"Measuring actuation-to-sensing latency ({mode}, {trials} steps)...")
+    fits = measure_steps(motor, localization, trials=trials, amplitude=amplitude, mode=mode)
+    delay, delay_ci = mean_ci([f["delay"] for f in fits])
+    tau, tau_ci = mean_ci([f["tau"] for f in fits])
+    gain, gain_ci = mean_ci([abs(f["gain"]) / amplitude for f in fits])
+
+    result = {
+        "mode": mode,
+        "delay": delay, "delay_ci95": delay_ci,
+        "tau": tau, "tau_ci95": tau_ci,
+        "gain": gain, "gain_ci95": gain_ci,     # signal units per second per unit command
+        "trials": len(fits),
+        "amplitude": amplitude,
+        "measured_at": time.time(),
+    }
+    if chirp:
+        print("Chirp sweep...")
+        result["chirp"] = measure_chirp(motor, localization, amplitude=amplitude, mode=mode)
+    return result
+
+
+def format_result(result):
+    lines = [
+        f"Delay (actuation → pose): {result['delay'] * 1e3:.0f} ± {result['delay_ci95'] * 1e3:.0f} ms",
+        f"Motor time constant:      {result['tau'] * 1e3:.0f} ± {result['tau_ci95'] * 1e3:.0f} ms",
+    ]
+    if "chirp" in result:
+        lines.append(f"Chirp effective delay:    {result['chirp']['delay'] * 1e3:.0f} ms "
+                     f"(correlation {result['chirp']['peak_correlation']:.2f})")
+    return "\n".join(lines)
+
+
+def save_latency(result, path=LATENCY_FILE):
+    """Store results per mode, written atomically"""
+    data = load_latency(path)
+    data[result["mode"]] = result
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_latency(path=LATENCY_FILE):
+    """Stored results keyed by mode ("turn" / "drive"); empty dict if none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# stand-alone use ---------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+    from Localization import Localization
+    from mdds30na import MDDS30AntiPhase
+
+    parser = argparse.ArgumentParser(description="Measure actuation-to-sensing latency")
+    parser.add_argument("--mode", choices=("turn", "drive"), default="turn")
+    parser.add_argument("--trials", type=int, default=6)
+    parser.add_argument("--amplitude", type=float, default=0.35)
+    parser.add_argument("--no-chirp", action="store_true")
+    args = parser.parse_args()
+
+    localization = Localization(lambda **kw: None)
+    time.sleep(1)
+    with MDDS30AntiPhase() as drv:
+        result = measure_latency(drv, localization, trials=args.trials,
+                                 amplitude=args.amplitude, mode=args.mode,
+                                 chirp=not args.no_chirp)
+    print(format_result(result))
+    save_latency(result)
+    print(f"✓ Saved to {LATENCY_FILE}")
@@ -5,20 +5,37 @@ MDDS30 (Locked Anti-Phase) driver for Raspberry Pi - No Acceleration Version
 - two GPIOs (default 18 / 19)  →  AN1 / AN2
 - value range −1.0 … +1.0      →  full-rev … full-fwd
 - No acceleration - immediate on/off control
+- optional feedforward compensation (deadband / gain tables from sysid.py)
 Requires: sudo pigpiod
 """
 
+from bisect import bisect_right
+
 import pigpio
 
+
+def _interp(table, x):
+    """Piecewise-linear lookup in a (command, duty) table"""
+    xs, ys = table
+    i = bisect_right(xs, x)
+    if i == 0:
+        return ys[0]
+    if i == len(xs):
+        return ys[-1]
+    x0, x1 = xs[i - 1], xs[i]
+    return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - x0) / (x1 - x0)
+
 class MDDS30AntiPhase:
-    def __init__(self, left_pin=18, right_pin=19, freq=20_000):
-        self.pi = pigpio.pi()
+    def __init__(self, left_pin=18, right_pin=19, freq=20_000, host=None):
+        # host: pigpiod on another Pi (one host driving several robots); None = local
+        self.pi = pigpio.pi() if host is None else pigpio.pi(host)
         if not self.pi.connected:
-            raise RuntimeError("pigpio daemon not running (sudo pigpiod).")
+            raise RuntimeError(f"pigpio daemon not running on {host or 'this Pi'} (sudo pigpiod).")
         self.left_pin  = left_pin
         self.right_pin = right_pin
         self.freq      = freq
         self._span     = 1_000_000         # pigpio duty range
+        self._comp     = None              # (left_table, right_table) or None
         
         self.stop()                        # idle at 50%
 
@@ -31,10 +48,30 @@ class MDDS30AntiPhase:
     def set(self, left, right):
         """left, right ∈ [−1.0 … +1.0] - applied immediately"""
         left = max(-1.0, min(1.0, left))
-        right = -max(-1.0, min(1.0, right))
+        right = max(-1.0, min(1.0, right))
+        if self._comp is not None:
+            left = _interp(self._comp[0], left)
+            right = _interp(self._comp[1], right)
+        right = -right
         self._apply(self.left_pin, left)
         self._apply(self.right_pin, right)
 
+    def set_compensation(self, table):
+        """
+        Install a feedforward table so set() values mean normalized speed
+        rather than raw duty. table: {"left": {"command": [...], "duty": [...]},
+        "right": {...}} as written by sysid.py; None disables compensation.
+        """
+        if table is None:
+            self._comp = None
+            return
+        self._comp = tuple((tuple(table[w]["command"]), tuple(table[w]["duty"]))
+                           for w in ("left", "right"))
+
+    @property
+    def compensated(self):
+        return self._comp is not None
+
     def stop(self):
         """Stop both motors immediately"""
         self.set(0.0, 0.0)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Stall and slip detection
+———————————————————————————————————————————————
+Compares the motion the wheels were commanded to make with the motion the
+pose shows, over a sliding time window:
+- expected: the dead reckoner's wheel model (sysid gains, deadband, lag and
+  actuation delay) driven by every command drive_motors() sends, i.e. what
+  MDDS30AntiPhase.set() should be producing right now
+- observed: differences of consecutive tracked poses - forward distance
+  along the heading, sideways distance, rotation (dead-reckoned poses are
+  skipped: they are the model itself)
+
+Per control cycle one sample goes into a preallocated ring buffer and the
+window sums (expected / observed distance and rotation, sideways distance)
+are updated incrementally: add the new sample, subtract the ones that fell
+out of the window - O(1) per cycle, no pass over the buffer. The sums are
+rebuilt from the buffer once per lap of the ring to stop float drift.
+
+Events (returned by update(), raised only after persisting for `hold` s):
+  "stall"  commanded to move, the pose moves less than stall_ratio of it
+           (pushing against an obstacle, wheels blocked)
+  "slip"   moves, but less than slip_ratio of the commanded distance or
+           rotation, or sideways faster than max_lateral (wheel spin, skid)
+"""
+
+import math
+
+from controlstate import wrap_angle
+
+STALL = "stall"
+SLIP = "slip"
+
+
+class MotionMonitor:
+    """Sliding-window commanded-vs-observed motion with O(1) updates"""
+
+    def __init__(self, window=0.6, hold=0.3, stall_ratio=0.25, slip_ratio=0.6,
+                 min_speed=0.05, min_yaw_rate=0.3, max_lateral=0.08, capacity=256):
+        """
+        Args:
+            window: length of the comparison window (s)
+            hold: an event has to persist this long before it is reported (s)
+            stall_ratio: observed / expected below this is a stall
+            slip_ratio: ... below this (and above stall_ratio) is a slip
+            min_speed: judge linear motion only when the expected mean speed
+                is above this (m/s)
+            min_yaw_rate: judge rotation only above this expected mean (rad/s)
+            max_lateral: mean sideways speed that counts as a skid (m/s)
+            capacity: ring size; must hold a window of samples at the loop rate
+        """
+        self.window = window
+        self.hold = hold
+        self.stall_ratio = stall_ratio
+        self.slip_ratio = slip_ratio
+        self.min_speed = min_speed
+        self.min_yaw_rate = min_yaw_rate
+        self.max_lateral = max_lateral
+        self.capacity = capacity
+        # ring buffer of per-sample values
+        self._t = [0.0] * capacity
+        self._dt = [0.0] * capacity
+        self._exp_d = [0.0] * capacity      # |expected distance|
+        self._obs_d = [0.0] * capacity      # observed distance in the expected direction
+        self._exp_a = [0.0] * capacity      # |expected rotation|
+        self._obs_a = [0.0] * capacity      # observed rotation in the expected direction
+        self._lat_d = [0.0] * capacity      # |sideways distance|
+        self.events = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the window (new move)"""
+        self._head = 0                      # next slot to write
+        self._count = 0
+        self._laps = 0
+        self.sum_dt = self.sum_exp_d = self.sum_obs_d = 0.0
+        self.sum_exp_a = self.sum_obs_a = self.sum_lat_d = 0.0
+        self._last_t = None
+        self._last_x = self._last_z = self._last_yaw = 0.0
+        self._suspect = None
+        self._since = 0.0
+        self.state = None                   # last reported event, until it clears
+        self.linear_ratio = self.angular_ratio = math.nan
+
+    def _push(self, t, dt, exp_d, obs_d, exp_a, obs_a, lat_d):
+        i = self._head
+        if self._count == self.capacity:    # ring full: the oldest is overwritten
+            self._drop(i)
+        self._t[i] = t
+        self._dt[i] = dt
+        self._exp_d[i] = exp_d
+        self._obs_d[i] = obs_d
+        self._exp_a[i] = exp_a
+        self._obs_a[i] = obs_a
+        self._lat_d[i] = lat_d
+        self.sum_dt += dt
+        self.sum_exp_d += exp_d
+        self.sum_obs_d += obs_d
+        self.sum_exp_a += exp_a
+        self.sum_obs_a += obs_a
+        self.sum_lat_d += lat_d
+        self._count += 1
+        self._head = i + 1
+        if self._head == self.capacity:
+            self._head = 0
+            self._laps += 1
+            self._resum()
+
+    def _drop(self, i):
+        self.sum_dt -= self._dt[i]
+        self.sum_exp_d -= self._exp_d[i]
+        self.sum_obs_d -= self._obs_d[i]
+        self.sum_exp_a -= self._exp_a[i]
+        self.sum_obs_a -= self._obs_a[i]
+        self.sum_lat_d -= self._lat_d[i]
+        self._count -= 1
+
+    def _resum(self):
+        """Exact sums from the buffer (once per lap; bounds the rounding drift)"""
+        n, cap = self._count, self.capacity
+        first = (self._head - n) % cap
+        idx = [(first + k) % cap for k in range(n)]
+        self.sum_dt = sum(self._dt[k] for k in idx)
+        self.sum_exp_d = sum(self._exp_d[k] for k in idx)
+        self.sum_obs_d = sum(self._obs_d[k] for k in idx)
+        self.sum_exp_a = sum(self._exp_a[k] for k in idx)
+        self.sum_obs_a = sum(self._obs_a[k] for k in idx)
+        self.sum_lat_d = sum(self._lat_d[k] for k in idx)
+
+    def update(self, t, pose, v_expected, w_expected):
+        """
+        Add one control cycle; returns STALL / SLIP once an event has held for
+        `hold` seconds (once per event), else None.
+
+        Args:
+            t: time (s, perf_counter)
+            pose: controlstate.PoseSnapshot of this cycle
+            v_expected: model forward speed (m/s)
+            w_expected: model yaw rate (rad/s, + = right)
+        """
+        if not (pose.valid and pose.is_tracking):
+            self._last_t = None             # no observation across a dropout
+            return None
+        last_t = self._last_t
+        self._last_t = t
+        dx, dz = pose.x - self._last_x, pose.z - self._last_z
+        dyaw = wrap_angle(pose.yaw - self._last_yaw)
+        heading = self._last_yaw + 0.5 * dyaw
+        self._last_x, self._last_z, self._last_yaw = pose.x, pose.z, pose.yaw
+        if last_t is None:
+            return None
+        dt = t - last_t
+        if dt <= 0.0:
+            return None
+
+        sin_h, cos_h = math.sin(heading), math.cos(heading)
+        forward = dx * sin_h + dz * cos_h
+        sideways = dx * cos_h - dz * sin_h
+        exp_d = v_expected * dt
+        exp_a = w_expected * dt
+        self._push(t, dt, abs(exp_d), forward if exp_d >= 0.0 else -forward,
+                   abs(exp_a), dyaw if exp_a >= 0.0 else -dyaw, abs(sideways))
+
+        # slide the window: drop samples older than window
+        cap = self.capacity
+        while self._count > 1:
+            oldest = (self._head - self._count) % cap
+            if t - self._t[oldest] <= self.window:
+                break
+            self._drop(oldest)
+        return self._classify(t)
+
+    def _classify(self, t):
+        span = self.sum_dt
+        if span < 0.5 * self.window:
+            return None
+        suspect = None
+        linear = self.sum_exp_d > self.min_speed * span
+        angular = self.sum_exp_a > self.min_yaw_rate * span
+        self.linear_ratio = self.sum_obs_d / self.sum_exp_d if linear else math.nan
+        self.angular_ratio = self.sum_obs_a / self.sum_exp_a if angular else math.nan
+        if linear or angular:
+            # the better-matching of the commanded motions decides: a pivot that
+            # turns fine while the tiny forward part lags is not a stall
+            ratio = max(self.linear_ratio if linear else -math.inf,
+                        self.angular_ratio if angular else -math.inf)
+            if ratio < self.stall_ratio:
+                suspect = STALL
+            elif (linear and self.linear_ratio < self.slip_ratio) or \
+                    (angular and self.angular_ratio < self.slip_ratio):
+                suspect = SLIP
+        if suspect is None and self.sum_lat_d > self.max_lateral * span:
+            suspect = SLIP
+
+        if suspect != self._suspect:
+            self._suspect = suspect
+            self._since = t
+            if suspect is None:
+                self.state = None
+            return None
+        if suspect is None or suspect == self.state or t - self._since < self.hold:
+            return None
+        self.state = suspect
+        self.events += 1
+        return suspect
+
+    def __repr__(self):
+        return (f"MotionMonitor(window {self.window:.1f} s, {self._count} samples, "
+                f"linear {self.linear_ratio:.2f}, angular {self.angular_ratio:.2f}, "
+                f"{self.state or 'ok'}, {self.events} events)")
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    from controlstate import PoseSnapshot
+
+    monitor = MotionMonitor()
+    pose = PoseSnapshot()
+    pose.valid = pose.is_tracking = True
+    dt, v = 0.05, 0.3
+    for phase, efficiency in (("free driving", 1.0), ("wheel spin", 0.45), ("against a wall", 0.0)):
+        monitor.reset()
+        t = 0.0
+        for i in range(60):
+            t += dt
+            pose.z += v * efficiency * dt + 0.001 * math.sin(i)     # a little tracking noise
+            event = monitor.update(t, pose, v, 0.0)
+            if event:
+                print(f"{phase:>15}: {event} after {t:.2f} s ({monitor})")
+                break
+        else:
+            print(f"{phase:>15}: no event ({monitor})")
+
+    monitor.reset()
+    n = 100_000
+    t0 = time.perf_counter()
+    for i in range(n):
+        pose.z += v * dt
+        monitor.update(i * dt, pose, v, 0.0)
+    print(f"update: {(time.perf_counter() - t0) / n * 1e6:.2f} µs")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Short-horizon model predictive control for the differential drive
+———————————————————————————————————————————————
+State: the target seen from the robot - forward distance f, lateral
+distance l (to the right), bearing error α (controlstate.angle_error):
+    f' = -v + ω·l        l' = -ω·f        α' = -ω + v·sin(α)/d
+linearized at the current state and held over the horizon, so B is one
+3x2 matrix per step (A = I). Inputs are the two wheel commands
+(MDDS30AntiPhase.set(left, right)): v = k·(L+R)/2, ω = k·(L-R)/track.
+
+- condensed QP over the N wheel-command pairs: the stacked prediction is
+  kron(L, B) with L lower-triangular, so the Hessian is
+  kron(L'WL, B'QB) + R - only a 2x2 and a 3x3 product change per step,
+  everything N x N is precomputed once
+- constraints: |command| <= max_command, |Δcommand| <= accel·dt (from the
+  command actually applied), optionally no reversing
+- solved by ADMM (OSQP's splitting) with the constraint matrix and its
+  Gram matrix cached; one small matrix inverse per step, then matvecs
+- warm start: the previous solution and duals, shifted by one step
+- iterations stop at tolerance or at the time budget (default 20 ms)
+Requires numpy.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from controlstate import DEG
+
+
+class MPCParams:
+    """Horizon, limits and weights for MPC"""
+    __slots__ = ("horizon", "dt", "max_command", "accel", "allow_reverse", "q_distance",
+                 "q_heading", "terminal_weight", "r_command", "r_rate", "dist_tol",
+                 "max_iterations", "tolerance", "rho", "budget")
+
+    def __init__(self, horizon=15, dt=0.1, max_command=0.6, accel=0.8, allow_reverse=True,
+                 q_distance=4.0, q_heading=1.0, terminal_weight=5.0, r_command=0.2,
+                 r_rate=1.0, dist_tol=0.15, max_iterations=60, tolerance=1e-3, rho=1.0,
+                 budget=0.02):
+        """
+        Args:
+            horizon: prediction steps
+            dt: step length (s); also the control period
+            max_command: wheel command limit
+            accel: wheel command change per second limit
+            allow_reverse: permit negative forward speed
+            q_distance, q_heading: weights on f, l (m) and α (rad)
+            terminal_weight: multiplier on the last predicted state
+            r_command, r_rate: weights on commands and command changes
+            dist_tol: arrival tolerance (m)
+            max_iterations, tolerance: ADMM stopping rule (residuals)
+            rho: ADMM penalty
+            budget: wall-clock limit per solve (s)
+        """
+        self.horizon = horizon
+        self.dt = dt
+        self.max_command = max_command
+        self.accel = accel
+        self.allow_reverse = allow_reverse
+        self.q_distance = q_distance
+        self.q_heading = q_heading
+        self.terminal_weight = terminal_weight
+        self.r_command = r_command
+        self.r_rate = r_rate
+        self.dist_tol = dist_tol
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.rho = rho
+        self.budget = budget
+
+
+class MPC:
+    """Linearized diff-drive MPC with cached condensed matrices and warm starts"""
+
+    SIGMA = 1e-6
+
+    def __init__(self, params=None, speed_scale=0.5, track_width=0.30):
+        """
+        Args:
+            params: MPCParams
+            speed_scale: ground speed (m/s) per unit wheel command
+            track_width: wheel separation (m)
+        """
+        p = self.params = params or MPCParams()
+        n_steps = p.horizon
+        n = 2 * n_steps
+        self.n = n
+
+        # wheel commands -> (v, ω)
+        k = speed_scale
+        self._wheels = np.array([[0.5 * k, 0.5 * k], [k / track_width, -k / track_width]])
+        self._Q = np.diag([p.q_distance, p.q_distance, p.q_heading])
+
+        # prediction structure: X = 1 ⊗ x0 + (L ⊗ B) U, weights w on each step
+        lower = np.tril(np.ones((n_steps, n_steps)))
+        w = np.ones(n_steps)
+        w[-1] = p.terminal_weight
+        self._LtWL = lower.T @ (w[:, None] * lower)
+        self._LtW = lower.T @ w
+
+        # command differences: row k is u_k - u_(k-1); row 0 is u_0 (minus the applied command)
+        diff = np.eye(n) - np.eye(n, k=-2)
+        self._R = p.r_command * np.eye(n) + p.r_rate * diff.T @ diff
+        self._diff = diff
+
+        # constraints A U in [lo, hi]: commands, command changes, (forward speed >= 0)
+        rows = [np.eye(n), diff]
+        if not p.allow_reverse:
+            rows.append(np.kron(np.eye(n_steps), [[0.5, 0.5]]))
+        self._A = np.vstack(rows)
+        self._AtA = self._A.T @ self._A
+        m = self._A.shape[0]
+        self._lo = np.empty(m)
+        self._hi = np.empty(m)
+        self._lo[:n], self._hi[:n] = -p.max_command, p.max_command
+        self._step = p.accel * p.dt
+        self._prev = np.zeros(n)            # applied command, in the first rate rows
+        if not p.allow_reverse:
+            self._lo[2 * n:], self._hi[2 * n:] = 0.0, np.inf
+
+        # warm start: every block moves one step earlier, the last step is repeated
+        def shifted(start, length, per_step):
+            index = np.arange(length) + per_step
+            index[index >= length] -= per_step
+            return start + index
+
+        self._shift_u = shifted(0, n, 2)
+        blocks = [shifted(0, n, 2), shifted(n, n, 2)]
+        if not p.allow_reverse:
+            blocks.append(shifted(2 * n, n_steps, 1))
+        self._shift = np.concatenate(blocks)
+
+        self.reset()
+
+    def reset(self):
+        """Forget the warm start (new move)"""
+        self._U = np.zeros(self.n)
+        self._Z = np.zeros(self._A.shape[0])
+        self._Y = np.zeros(self._A.shape[0])
+        self.iterations = 0
+        self.solve_time = 0.0
+
+    def solve(self, forward, lateral, alpha, left_prev, right_prev):
+        """
+        Optimal wheel commands for the current step.
+
+        Args:
+            forward, lateral: target position in the robot frame (m)
+            alpha: bearing error (rad, + = target to the right)
+            left_prev, right_prev: the command applied last step
+
+        Returns:
+            (left, right)
+        """
+        t0 = time.perf_counter()
+        p, n = self.params, self.n
+        dt = p.dt
+        d = max(math.hypot(forward, lateral), p.dist_tol)
+        B = dt * np.array([[-1.0, lateral], [0.0, -forward], [math.sin(alpha) / d, -1.0]]) \
+            @ self._wheels
+        x0 = np.array([forward, lateral, alpha])
+        BtQ = B.T @ self._Q
+        H = np.kron(self._LtWL, BtQ @ B) + self._R
+        g = np.kron(self._LtW, BtQ @ x0)
+        prev = self._prev
+        prev[0], prev[1] = left_prev, right_prev
+        g -= p.r_rate * (self._diff.T @ prev)
+
+        lo, hi = self._lo, self._hi
+        lo[n:2 * n] = prev - self._step
+        hi[n:2 * n] = prev + self._step
+
+        A, rho, sigma = self._A, p.rho, self.SIGMA
+        K = np.linalg.inv(H + sigma * np.eye(n) + rho * self._AtA)
+        U, Z, Y = self._U, self._Z, self._Y
+        deadline = t0 + p.budget
+        iteration = 0
+        while iteration < p.max_iterations:
+            iteration += 1
+            U = K @ (sigma * U - g + A.T @ (rho * Z - Y))
+            AU = A @ U
+            Z_new = np.clip(AU + Y / rho, lo, hi)
+            Y = Y + rho * (AU - Z_new)
+            dual = rho * np.abs(A.T @ (Z_new - Z)).max()
+            Z = Z_new
+            if (np.abs(AU - Z).max() < p.tolerance and dual < p.tolerance) \
+                    or time.perf_counter() > deadline:
+                break
+
+        # shift for the next warm start
+        self._U = U[self._shift_u]
+        self._Z = Z[self._shift]
+        self._Y = Y[self._shift]
+        self.iterations = iteration
+        self.solve_time = time.perf_counter() - t0
+        # the projected first command satisfies every constraint exactly
+        return float(Z[0]), float(Z[1])
+
+
+def mpc_step(state, pose, mpc):
+    """One MPC iteration on a controlstate.ControlState; True once at the target"""
+    state.update_pose(pose)
+    if state.distance < mpc.params.dist_tol:
+        state.left = state.right = 0.0
+        return True
+    alpha = state.angle_error
+    left, right = mpc.solve(state.distance * math.cos(alpha), state.distance * math.sin(alpha),
+                            alpha, state.left, state.right)
+    state.left = left
+    state.right = right
+    state.speed = 0.5 * (left + right)
+    state.reversing = state.speed < 0.0
+    return False
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    from controlstate import ControlState, PoseSnapshot
+
+    mpc = MPC()
+    state, pose = ControlState(), PoseSnapshot()
+    state.reset(1.0, 2.0)
+    pose.yaw = -90.0 * DEG
+    k, track, dt = 0.5, 0.30, mpc.params.dt
+    for i in range(200):
+        if mpc_step(state, pose, mpc):
+            print(f"✓ Reached ({pose.x:.2f}, {pose.z:.2f}) after {i * dt:.1f} s")
+            break
+        v = k * 0.5 * (state.left + state.right)
+        w = k * (state.left - state.right) / track
+        pose.yaw += w * dt
+        pose.x += v * math.sin(pose.yaw) * dt
+        pose.z += v * math.cos(pose.yaw) * dt
+        if i % 5 == 0:
+            print(f"t={i * dt:4.1f}  d={state.distance:5.2f}  α={math.degrees(state.angle_error):6.1f}°  "
+                  f"L={state.left:+.2f} R={state.right:+.2f}  "
+                  f"{mpc.iterations:2d} it  {mpc.solve_time * 1e3:.2f} ms")
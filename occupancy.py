@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+2-D occupancy grid in calibrated coordinates
+———————————————————————————————————————————————
+- cells[row, col]: row follows +z, col follows +x (calibrated frame, metres)
+- FREE / OCCUPIED; everything outside the grid counts as occupied
+- distance field: exact Euclidean distance (m) from every cell to the
+  nearest occupied cell, cached and recomputed only after the map changes,
+  so clearance(x, z) is a single array lookup
+- sources: .npz file (save / load), recorded drive traces (CommandLogger
+  CSV - swept cells are free, the rest stays occupied), or block / clear
+  edits from the REPL
+Requires numpy.
+"""
+
+import math
+
+import numpy as np
+
+FREE = 0
+OCCUPIED = 1
+
+
+def distance_transform(occupied):
+    """
+    Exact squared-Euclidean distance transform (in cells) of a boolean
+    grid, separable: one min-plus pass down the rows, one along the columns.
+    """
+    big = float(occupied.shape[0] ** 2 + occupied.shape[1] ** 2)
+    f = np.where(occupied, 0.0, big)
+    for _ in range(2):
+        n = f.shape[0]
+        offsets = np.arange(n, dtype=float)
+        out = np.empty_like(f)
+        for i in range(n):
+            out[i] = (f + ((offsets - i) ** 2)[:, None]).min(axis=0)
+        f = out.T.copy()
+    return f
+
+
+class OccupancyGrid:
+    """Occupancy grid with a cached distance field"""
+
+    def __init__(self, cells, resolution=0.1, origin_x=0.0, origin_z=0.0):
+        """
+        Args:
+            cells: 2-D array (rows along z, columns along x) of FREE / OCCUPIED
+            resolution: cell size (m)
+            origin_x, origin_z: calibrated coordinates of the corner of cell (0, 0)
+        """
+        self.cells = np.asarray(cells, dtype=np.uint8)
+        self.resolution = float(resolution)
+        self.origin_x = float(origin_x)
+        self.origin_z = float(origin_z)
+        self.rows, self.cols = self.cells.shape
+        self.version = 0                # bumped on every edit
+        self._distance = None
+        self._distance_version = -1
+
+    @classmethod
+    def empty(cls, width, height, resolution=0.1, origin_x=None, origin_z=None):
+        """All-free grid of width x height metres, centred on the origin by default"""
+        cols, rows = int(math.ceil(width / resolution)), int(math.ceil(height / resolution))
+        return cls(np.zeros((rows, cols), np.uint8), resolution,
+                   -0.5 * cols * resolution if origin_x is None else origin_x,
+                   -0.5 * rows * resolution if origin_z is None else origin_z)
+
+    # coordinates ----------------------------------------------------------
+    def cell(self, x, z):
+        """(row, col) containing calibrated (x, z); may be out of bounds"""
+        return (int(math.floor((z - self.origin_z) / self.resolution)),
+                int(math.floor((x - self.origin_x) / self.resolution)))
+
+    def center(self, row, col):
+        """Calibrated (x, z) of a cell centre"""
+        return (self.origin_x + (col + 0.5) * self.resolution,
+                self.origin_z + (row + 0.5) * self.resolution)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    # distance field -------------------------------------------------------
+    @property
+    def distance(self):
+        """Distance (m) from each cell centre to the nearest occupied cell"""
+        if self._distance_version != self.version:
+            occupied = self.cells != FREE
+            if occupied.any():
+                self._distance = np.sqrt(distance_transform(occupied)) * self.resolution
+            else:
+                self._distance = np.full(self.cells.shape, np.inf)
+            self._distance_version = self.version
+        return self._distance
+
+    def clearance(self, x, z):
+        """Distance (m) to the nearest obstacle; 0 outside the map"""
+        row, col = self.cell(x, z)
+        if not self.in_bounds(row, col):
+            return 0.0
+        return float(self.distance[row, col])
+
+    def is_free(self, x, z):
+        row, col = self.cell(x, z)
+        return self.in_bounds(row, col) and self.cells[row, col] == FREE
+
+    # editing --------------------------------------------------------------
+    def _disc(self, x, z, radius):
+        rows = (np.arange(self.rows) + 0.5) * self.resolution + self.origin_z
+        cols = (np.arange(self.cols) + 0.5) * self.resolution + self.origin_x
+        return (rows[:, None] - z) ** 2 + (cols[None, :] - x) ** 2 <= radius * radius
+
+    def set_disc(self, x, z, radius, value=OCCUPIED):
+        """Mark every cell whose centre lies within radius of (x, z)"""
+        self.cells[self._disc(x, z, radius)] = value
+        self.version += 1
+
+    def set_rect(self, x0, z0, x1, z1, value=OCCUPIED):
+        r0, c0 = self.cell(min(x0, x1), min(z0, z1))
+        r1, c1 = self.cell(max(x0, x1), max(z0, z1))
+        self.cells[max(r0, 0):max(r1 + 1, 0), max(c0, 0):max(c1 + 1, 0)] = value
+        self.version += 1
+
+    # files ----------------------------------------------------------------
+    def save(self, path):
+        """Write a .npz map; returns the path written (numpy adds the suffix)"""
+        if not path.endswith(".npz"):
+            path += ".npz"
+        np.savez_compressed(path, cells=self.cells, resolution=self.resolution,
+                            origin=np.array([self.origin_x, self.origin_z]))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["cells"], float(data["resolution"]),
+                       float(data["origin"][0]), float(data["origin"][1]))
+
+    @classmethod
+    def from_traces(cls, paths, resolution=0.1, robot_radius=0.2, margin=0.5):
+        """
+        Free space from recorded drives: every cell the robot body swept
+        (within robot_radius of a logged pose, plus one cell so the driven
+        centreline itself clears robot_radius) is free, everything else
+        occupied. The grid covers the traces plus margin metres on each side.
+        """
+        from sysid import load_log
+        points = []
+        for path in paths:
+            _, _, _, x, z, _ = load_log(path)
+            points.append(np.column_stack([x, z]))
+        points = np.concatenate(points)
+        lo = points.min(axis=0) - margin - robot_radius - resolution
+        hi = points.max(axis=0) + margin + robot_radius + resolution
+        cols, rows = np.ceil((hi - lo) / resolution).astype(int)
+        grid = cls(np.full((rows, cols), OCCUPIED, np.uint8), resolution, lo[0], lo[1])
+
+        # drop near-duplicate poses, then stamp a disc per pose
+        keep = np.unique(np.floor(points / (0.5 * resolution)).astype(np.int64), axis=0,
+                         return_index=True)[1]
+        swept = robot_radius + resolution
+        reach = int(math.ceil(swept / resolution))
+        offsets = np.arange(-reach, reach + 1)
+        dr, dc = np.meshgrid(offsets, offsets, indexing="ij")
+        for x, z in points[np.sort(keep)]:
+            row, col = grid.cell(x, z)
+            rr, cc = row + dr, col + dc
+            cx, cz = grid.origin_x + (cc + 0.5) * resolution, grid.origin_z + (rr + 0.5) * resolution
+            inside = ((cx - x) ** 2 + (cz - z) ** 2 <= swept * swept) \
+                & (rr >= 0) & (rr < rows) & (cc >= 0) & (cc < cols)
+            grid.cells[rr[inside], cc[inside]] = FREE
+        grid.version += 1
+        return grid
+
+    def __repr__(self):
+        free = int(np.count_nonzero(self.cells == FREE))
+        return (f"OccupancyGrid({self.cols}x{self.rows} cells @ {self.resolution:.2f} m, "
+                f"x {self.origin_x:.2f}..{self.origin_x + self.cols * self.resolution:.2f}, "
+                f"z {self.origin_z:.2f}..{self.origin_z + self.rows * self.resolution:.2f}, "
+                f"{free} free)")
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+
+    grid = OccupancyGrid.empty(6.0, 6.0, resolution=0.05)
+    grid.set_rect(-1.0, 0.9, 1.0, 1.1)                 # a wall across the room
+    t0 = time.perf_counter()
+    grid.distance
+    print(grid)
+    print(f"distance field: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    for x, z in ((0.0, 0.0), (0.0, 0.5), (1.5, 1.0), (0.0, 2.0)):
+        print(f"clearance at ({x:+.1f}, {z:+.1f}): {grid.clearance(x, z):.2f} m")
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Smooth paths through waypoints, with precomputed lookup tables
+———————————————————————————————————————————————
+SplinePath fits a C2 spline through (x, z) waypoints in calibrated
+coordinates, parameterized by chord length:
+- "cubic": the global natural cubic spline (or clamped, when start / end
+  headings are given) - the smoothest curve, but moving one waypoint
+  moves the whole path
+- "quintic": quintic Hermite segments with Catmull-Rom tangents and zero
+  second derivative at the waypoints - C2 and local (a waypoint only shapes
+  its two segments), curvature returns to zero at every waypoint
+
+It is then sampled densely (`spacing` apart) into NumPy tables of arc
+length, position, heading, curvature and a curvature-limited speed profile
+(lateral acceleration bound, then forward / backward passes for the
+acceleration limits). The tables are copied to lists once, so the per-cycle
+lookup(s) is a bisect plus a linear interpolation - no root finding and no
+NumPy scalars on the hot path.
+
+path_step() follows a SplinePath with pure pursuit on a ControlState,
+driving each curve at the speed the profile allows instead of stopping at
+every waypoint. Requires numpy.
+"""
+
+import bisect
+import math
+
+import numpy as np
+
+from controlstate import DEG, wrap_angle, limit_scale, pid_update, TurnParams
+
+
+class PathPoint:
+    """Reference sample filled in place by SplinePath.lookup()"""
+    __slots__ = ("s", "x", "z", "heading", "curvature", "speed")
+
+    def __init__(self):
+        self.s = self.x = self.z = self.heading = self.curvature = self.speed = 0.0
+
+
+def _cubic_coefficients(u, y, d0=None, d1=None):
+    """Per-segment coefficients (n-1, 6) in t = u - u_i of the C2 cubic spline through y"""
+    n = len(u)
+    h = np.diff(u)
+    # second derivatives M: tridiagonal system, natural or clamped ends
+    A = np.zeros((n, n))
+    b = np.zeros(n)
+    i = np.arange(1, n - 1)
+    A[i, i - 1] = h[:-1]
+    A[i, i] = 2.0 * (h[:-1] + h[1:])
+    A[i, i + 1] = h[1:]
+    slope = np.diff(y) / h
+    b[1:-1] = 6.0 * (slope[1:] - slope[:-1])
+    if d0 is None:
+        A[0, 0] = 1.0
+    else:
+        A[0, 0], A[0, 1] = 2.0 * h[0], h[0]
+        b[0] = 6.0 * (slope[0] - d0)
+    if d1 is None:
+        A[-1, -1] = 1.0
+    else:
+        A[-1, -2], A[-1, -1] = h[-1], 2.0 * h[-1]
+        b[-1] = 6.0 * (d1 - slope[-1])
+    M = np.linalg.solve(A, b)
+
+    c = np.zeros((n - 1, 6))
+    c[:, 0] = y[:-1]
+    c[:, 1] = slope - h * (2.0 * M[:-1] + M[1:]) / 6.0
+    c[:, 2] = 0.5 * M[:-1]
+    c[:, 3] = (M[1:] - M[:-1]) / (6.0 * h)
+    return c
+
+
+def _quintic_coefficients(u, y, d0=None, d1=None):
+    """Per-segment coefficients (n-1, 6) of quintic Hermite segments, Catmull-Rom tangents"""
+    h = np.diff(u)
+    d = np.empty(len(u))
+    d[1:-1] = (y[2:] - y[:-2]) / (u[2:] - u[:-2])
+    d[0] = (y[1] - y[0]) / h[0] if d0 is None else d0
+    d[-1] = (y[-1] - y[-2]) / h[-1] if d1 is None else d1
+    # in tau = t / h with zero second derivatives at both ends of each segment
+    dp = y[1:] - y[:-1]
+    v0, v1 = d[:-1] * h, d[1:] * h
+    c = np.zeros((len(h), 6))
+    c[:, 0] = y[:-1]
+    c[:, 1] = v0
+    c[:, 3] = 10.0 * dp - 6.0 * v0 - 4.0 * v1
+    c[:, 4] = -15.0 * dp + 8.0 * v0 + 7.0 * v1
+    c[:, 5] = 6.0 * dp - 3.0 * v0 - 3.0 * v1
+    return c / h[:, None] ** np.arange(6)          # back to t = u - u_i
+
+
+def _evaluate(c, t):
+    """Value, first and second derivative of the polynomials c (rows) at t"""
+    value = first = second = 0.0
+    for k in range(5, -1, -1):
+        value = value * t + c[:, k]
+    for k in range(5, 0, -1):
+        first = first * t + k * c[:, k]
+    for k in range(5, 1, -1):
+        second = second * t + k * (k - 1) * c[:, k]
+    return value, first, second
+
+
+class SplinePath:
+    """Dense arc-length tables of a C2 spline through waypoints"""
+
+    KINDS = ("cubic", "quintic")
+
+    def __init__(self, points, kind="cubic", start_heading=None, end_heading=None,
+                 max_speed=0.3, max_accel=0.3, max_lateral=0.3, start_speed=0.05,
+                 end_speed=0.0, spacing=0.01):
+        """
+        Args:
+            points: [(x, z), ...] waypoints, at least two (calibrated, m)
+            kind: "cubic" or "quintic"
+            start_heading, end_heading: tangent directions (rad, yaw convention) or None
+            max_speed: speed cap of the profile (m/s)
+            max_accel: acceleration and deceleration limit along the path (m/s²)
+            max_lateral: lateral acceleration limit, v² · |κ| (m/s²)
+            start_speed, end_speed: profile speeds at the ends (m/s; the start
+                must be > 0 or the profile never leaves it)
+            spacing: table resolution along the path (m)
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown spline kind {kind!r} (choose from {', '.join(self.KINDS)})")
+        pts = np.asarray(points, dtype=float)
+        keep = np.r_[True, np.hypot(*np.diff(pts, axis=0).T) > 1e-6]
+        pts = pts[keep]                             # repeated waypoints would divide by zero
+        if len(pts) < 2:
+            raise ValueError("a path needs at least two distinct waypoints")
+        self.kind = kind
+        self.points = pts
+        u = np.r_[0.0, np.cumsum(np.hypot(*np.diff(pts, axis=0).T))]
+
+        # tangent at the ends: unit vector in (x, z) for a heading (yaw 0 faces +z)
+        ends = [(None, None) if a is None else (math.sin(a), math.cos(a))
+                for a in (start_heading, end_heading)]
+        fit = _cubic_coefficients if kind == "cubic" else _quintic_coefficients
+        cx = fit(u, pts[:, 0], ends[0][0], ends[1][0])
+        cz = fit(u, pts[:, 1], ends[0][1], ends[1][1])
+
+        # dense samples: every segment split at ~spacing, shared ends kept once
+        counts = np.maximum(np.ceil(np.diff(u) / spacing).astype(int), 1)
+        segment = np.repeat(np.arange(len(counts)), counts)
+        t = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)) \
+            * np.repeat(np.diff(u) / counts, counts)
+        segment = np.r_[segment, len(counts) - 1]
+        t = np.r_[t, u[-1] - u[-2]]
+        x, dx, ddx = _evaluate(cx[segment], t)
+        z, dz, ddz = _evaluate(cz[segment], t)
+
+        norm = np.hypot(dx, dz)
+        ds = 0.5 * (norm[1:] + norm[:-1]) * np.diff(u[segment] + t)   # trapezoid arc length
+        s = np.r_[0.0, np.cumsum(ds)]
+        heading = np.arctan2(dx, dz)
+        # yaw rate per metre, + = turning right (like yaw)
+        curvature = (dz * ddx - dx * ddz) / np.maximum(norm, 1e-9) ** 3
+
+        speed = np.minimum(max_speed, np.sqrt(max_lateral / np.maximum(np.abs(curvature), 1e-9)))
+        speed[0] = min(speed[0], start_speed)
+        speed[-1] = min(speed[-1], end_speed)
+        two_a_ds = 2.0 * max_accel * np.diff(s)
+        for i in range(1, len(s)):                   # accelerate
+            speed[i] = min(speed[i], math.sqrt(speed[i - 1] ** 2 + two_a_ds[i - 1]))
+        for i in range(len(s) - 2, -1, -1):          # brake in time
+            speed[i] = min(speed[i], math.sqrt(speed[i + 1] ** 2 + two_a_ds[i]))
+
+        self.s, self.x, self.z = s, x, z
+        self.heading, self.curvature, self.speed = heading, curvature, speed
+        self.length = float(s[-1])
+        # list copies for the per-cycle lookup
+        self._s = s.tolist()
+        self._x = x.tolist()
+        self._z = z.tolist()
+        self._heading = heading.tolist()
+        self._curvature = curvature.tolist()
+        self._speed = speed.tolist()
+        self._last = len(self._s) - 2
+
+    def lookup(self, s, ref):
+        """Fill PathPoint ref at arc length s (clamped to the path); returns ref"""
+        table = self._s
+        if s <= 0.0:
+            s = 0.0
+        elif s >= self.length:
+            s = self.length
+        i = bisect.bisect_right(table, s) - 1
+        if i > self._last:
+            i = self._last
+        s0 = table[i]
+        f = (s - s0) / (table[i + 1] - s0)
+        ref.s = s
+        ref.x = self._x[i] + f * (self._x[i + 1] - self._x[i])
+        ref.z = self._z[i] + f * (self._z[i + 1] - self._z[i])
+        h0 = self._heading[i]
+        ref.heading = h0 + f * wrap_angle(self._heading[i + 1] - h0)
+        ref.curvature = self._curvature[i] + f * (self._curvature[i + 1] - self._curvature[i])
+        ref.speed = self._speed[i] + f * (self._speed[i + 1] - self._speed[i])
+        return ref
+
+    def project(self, x, z, s, ref, iterations=2):
+        """
+        Arc length of the point on the path closest to (x, z), starting from s:
+        a couple of tangent-projection steps, each a lookup - the robot only
+        moves a few cm per cycle, so the previous s is already close.
+        """
+        for _ in range(iterations):
+            self.lookup(s, ref)
+            s += (x - ref.x) * math.sin(ref.heading) + (z - ref.z) * math.cos(ref.heading)
+        return self.lookup(s, ref).s
+
+    def duration(self):
+        """Time to drive the profile (s)"""
+        mean = 0.5 * (self.speed[1:] + self.speed[:-1])
+        return float(np.sum(np.diff(self.s) / np.maximum(mean, 1e-9)))
+
+    def __repr__(self):
+        return (f"SplinePath({self.kind}, {len(self.points)} waypoints, {self.length:.2f} m, "
+                f"{len(self._s)} samples, {self.duration():.1f} s)")
+
+
+class PathParams:
+    """Pure-pursuit tracking of a SplinePath (speeds from the path's profile)"""
+    __slots__ = ("lookahead", "lookahead_time", "speed_scale", "track_width", "max_speed",
+                 "min_speed", "max_turn", "align_angle", "aligned_angle", "dist_tol", "pid",
+                 "ref", "goal")
+
+    def __init__(self, lookahead=0.25, lookahead_time=0.8, speed_scale=0.5, track_width=0.30,
+                 max_speed=0.6, min_speed=0.3, max_turn=0.5, align_angle=60.0 * DEG,
+                 aligned_angle=15.0 * DEG, dist_tol=0.10, turn=None):
+        """
+        Args:
+            lookahead: minimum pursuit distance along the path (m)
+            lookahead_time: extra pursuit distance per m/s of reference speed (s)
+            speed_scale: ground speed (m/s) per unit wheel command
+            track_width: wheel separation (m)
+            max_speed, min_speed, max_turn: wheel command limits (see limit_scale)
+            align_angle: turn in place first when the pursuit point is further off
+            aligned_angle: ... until it is within this
+            dist_tol: arrival tolerance at the end of the path (m)
+            turn: TurnParams for the in-place alignment (default: TurnParams())
+        """
+        self.lookahead = lookahead
+        self.lookahead_time = lookahead_time
+        self.speed_scale = speed_scale
+        self.track_width = track_width
+        self.max_speed = max_speed
+        self.min_speed = min_speed
+        self.max_turn = max_turn
+        self.align_angle = align_angle
+        self.aligned_angle = aligned_angle
+        self.dist_tol = dist_tol
+        self.pid = (turn or TurnParams()).pid
+        self.ref = PathPoint()          # scratch samples, so a step allocates nothing
+        self.goal = PathPoint()
+
+
+def path_step(state, pose, path, p, dt):
+    """
+    One pure-pursuit iteration along path; True once at its end.
+
+    state.progress tracks the projected arc length (never backwards);
+    state.target_x / target_z is the pursuit point, so angle_error and
+    distance in the ControlState (and in telemetry) are the pursuit geometry.
+    """
+    ref, goal = p.ref, p.goal
+    s = path.project(pose.x, pose.z, state.progress, ref)
+    if s > state.progress:
+        state.progress = s
+    speed = ref.speed
+    path.lookup(path.length, goal)
+    if path.length - state.progress < p.dist_tol + p.lookahead \
+            and math.hypot(goal.x - pose.x, goal.z - pose.z) < p.dist_tol:
+        state.left = state.right = state.speed = 0.0
+        return True
+
+    path.lookup(state.progress + p.lookahead + p.lookahead_time * speed, ref)
+    state.target_x = ref.x
+    state.target_z = ref.z
+    state.update_pose(pose)
+    alpha = state.angle_error
+
+    if state.aligning:
+        state.aligning = abs(alpha) > p.aligned_angle
+    elif abs(alpha) > p.align_angle:
+        state.aligning = True
+        state.heading.reset()
+    if state.aligning:
+        turn = pid_update(state.heading, p.pid, alpha, state.yaw, pose.yaw_rate, dt)
+        state.speed = 0.0
+        state.left = turn
+        state.right = -turn
+        return False
+
+    # pure pursuit: the arc through the pursuit point, κ = 2·sin(α) / L
+    distance = state.distance if state.distance > 1e-3 else 1e-3
+    w = speed * 2.0 * math.sin(alpha) / distance
+    command = speed / p.speed_scale
+    turn = w * p.track_width / (2.0 * p.speed_scale)
+    scale = limit_scale(command, turn, p)
+    state.speed = command * scale
+    turn *= scale
+    state.left = state.speed + turn
+    state.right = state.speed - turn
+    return False
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    from controlstate import ControlState, PoseSnapshot, count_step_allocations
+
+    waypoints = [(0.0, 0.0), (0.0, 1.0), (1.0, 2.0), (2.0, 1.5), (2.0, 0.0)]
+    for kind in SplinePath.KINDS:
+        t0 = time.perf_counter()
+        path = SplinePath(waypoints, kind=kind)
+        build = time.perf_counter() - t0
+        print(f"{path}  built in {build * 1e3:.1f} ms, "
+              f"max |κ| {np.abs(path.curvature).max():.2f} /m, min speed {path.speed[1:-1].min():.2f} m/s")
+
+    ref = PathPoint()
+    n = 100_000
+    t0 = time.perf_counter()
+    for i in range(n):
+        path.lookup(i * path.length / n, ref)
+    print(f"lookup: {(time.perf_counter() - t0) / n * 1e6:.2f} µs")
+
+    # follow it on a kinematic diff-drive
+    k, track, dt = 0.5, 0.30, 0.05
+    params = PathParams(speed_scale=k, track_width=track, min_speed=0.0)
+    state, pose = ControlState(), PoseSnapshot()
+    state.reset(0.0, 0.0)
+    worst, t = 0.0, 0.0
+    while not path_step(state, pose, path, params, dt) and t < 60.0:
+        v = k * 0.5 * (state.left + state.right)
+        w = k * (state.left - state.right) / track
+        pose.yaw += w * dt
+        pose.x += v * math.sin(pose.yaw) * dt
+        pose.z += v * math.cos(pose.yaw) * dt
+        path.lookup(path.project(pose.x, pose.z, state.progress, ref), ref)
+        worst = max(worst, math.hypot(pose.x - ref.x, pose.z - ref.z))
+        t += dt
+    print(f"✓ Followed in {t:.1f} s (profile {path.duration():.1f} s), "
+          f"max cross-track {worst * 100:.1f} cm, end ({pose.x:.2f}, {pose.z:.2f})")
+
+    state.reset(0.0, 0.0)
+    blocks = count_step_allocations(lambda: path_step(state, pose, path, params, dt),
+                                    filename=__file__)
+    print(f"Allocations per 1000 steps: {blocks}")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Grid path planner with incremental re-planning
+———————————————————————————————————————————————
+D* Lite (Koenig & Likhachev) on the 8-connected occupancy grid:
+- the search runs backwards from the goal, so the first plan is an A*
+  search and later plans reuse it - when the robot moves only the key
+  offset changes, when the map changes only the affected cells are repaired
+- a cell is blocked if its clearance (distance field) is below robot_radius;
+  cells closer than safe_distance cost more, keeping paths off the walls
+- the cell path is shortened Theta*-style: any waypoint visible in a straight
+  line (no blocked cell on the segment) from the previous one is skipped,
+  so the controller gets a few any-angle waypoints instead of a staircase
+"""
+
+import heapq
+import math
+
+INF = float("inf")
+SQRT2 = math.sqrt(2.0)
+_NEIGHBOURS = ((-1, -1, SQRT2), (-1, 0, 1.0), (-1, 1, SQRT2), (0, -1, 1.0),
+               (0, 1, 1.0), (1, -1, SQRT2), (1, 0, 1.0), (1, 1, SQRT2))
+
+
+class GridPlanner:
+    """D* Lite planner over an occupancy.OccupancyGrid"""
+
+    def __init__(self, grid, robot_radius=0.2, safe_distance=0.4, clearance_weight=2.0):
+        """
+        Args:
+            grid: occupancy.OccupancyGrid (its distance field defines blocked cells)
+            robot_radius: minimum clearance of the robot centre (m)
+            safe_distance: clearance below which cells get more expensive (m)
+            clearance_weight: extra cost per cell at zero margin beyond robot_radius
+        """
+        self.grid = grid
+        self.robot_radius = robot_radius
+        self.safe_distance = max(safe_distance, robot_radius)
+        self.clearance_weight = clearance_weight
+        self.cols = grid.cols
+        self.goal = None
+        self.expanded = 0               # cells expanded by the last plan
+        self._map_version = None
+        self._cost = None
+
+    # costs ----------------------------------------------------------------
+    def _cell_costs(self):
+        """Per-cell traversal cost (INF = blocked) as a flat list"""
+        clearance = self.grid.distance.ravel().tolist()
+        radius, safe, weight = self.robot_radius, self.safe_distance, self.clearance_weight
+        span = max(safe - radius, 1e-9)
+        return [INF if c < radius else 1.0 + weight * (safe - c) / span if c < safe else 1.0
+                for c in clearance]
+
+    def _successors(self, u):
+        """(v, edge cost) for the 8 neighbours of flat index u"""
+        cols, rows, cost = self.cols, self.grid.rows, self._cost
+        row, col = divmod(u, cols)
+        cu = cost[u]
+        for dr, dc, length in _NEIGHBOURS:
+            r, c = row + dr, col + dc
+            if 0 <= r < rows and 0 <= c < cols:
+                v = r * cols + c
+                cv = cost[v]
+                if cu == INF or cv == INF:
+                    yield v, INF
+                elif dr and dc and (cost[row * cols + c] == INF or cost[r * cols + col] == INF):
+                    yield v, INF        # no corner cutting past a blocked cell
+                else:
+                    yield v, 0.5 * length * (cu + cv)
+
+    def _h(self, a, b):
+        """Octile distance (admissible: every cell costs at least 1)"""
+        ar, ac = divmod(a, self.cols)
+        br, bc = divmod(b, self.cols)
+        dr, dc = abs(ar - br), abs(ac - bc)
+        return max(dr, dc) + (SQRT2 - 1.0) * min(dr, dc)
+
+    # D* Lite --------------------------------------------------------------
+    def _key(self, s):
+        m = min(self._g[s], self._rhs[s])
+        # rounded so ties are exact (km and h accumulate float error) and
+        # the second component breaks them, as D* Lite requires
+        return (round(m + self._h(self._start, s) + self._km, 9), m)
+
+    def _update_vertex(self, u):
+        if u != self.goal:
+            best = INF
+            g = self._g
+            for v, c in self._successors(u):
+                if c + g[v] < best:
+                    best = c + g[v]
+            self._rhs[u] = best
+        if self._g[u] != self._rhs[u]:
+            key = self._key(u)
+            self._open[u] = key
+            heapq.heappush(self._heap, (key, u))
+        else:
+            self._open.pop(u, None)
+
+    def _compute(self):
+        g, rhs, heap, open_ = self._g, self._rhs, self._heap, self._open
+        start = self._start
+        expanded = 0
+        while heap:
+            k_old, u = heap[0]
+            if open_.get(u) != k_old:           # stale entry
+                heapq.heappop(heap)
+                continue
+            if not (k_old < self._key(start) or rhs[start] > g[start]):
+                break
+            heapq.heappop(heap)
+            del open_[u]
+            expanded += 1
+            k_new = self._key(u)
+            if k_old < k_new:
+                open_[u] = k_new
+                heapq.heappush(heap, (k_new, u))
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for v, _ in self._successors(u):
+                    self._update_vertex(v)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for v, _ in self._successors(u):
+                    self._update_vertex(v)
+        self.expanded = expanded
+
+    def _reset(self, goal):
+        n = self.grid.rows * self.cols
+        self._g = [INF] * n
+        self._rhs = [INF] * n
+        self._heap = []
+        self._open = {}
+        self._km = 0.0
+        self.goal = goal
+        self._rhs[goal] = 0.0
+        self._open[goal] = self._key(goal)
+        heapq.heappush(self._heap, (self._open[goal], goal))
+
+    def _apply_map_changes(self):
+        """Repair the search around every cell whose cost changed"""
+        new_cost = self._cell_costs()
+        old_cost = self._cost
+        changed = [i for i, (a, b) in enumerate(zip(old_cost, new_cost)) if a != b]
+        self._cost = new_cost
+        self._map_version = self.grid.version
+        touched = set(changed)
+        for u in changed:
+            touched.update(v for v, _ in self._successors(u))
+        for u in touched:
+            self._update_vertex(u)
+        return len(changed)
+
+    # public API -----------------------------------------------------------
+    def plan(self, start_x, start_z, goal_x, goal_z):
+        """
+        Waypoints [(x, z), ...] from the start to the goal (the last one is the
+        exact goal), or None if the goal is unreachable. Re-planning to the
+        same goal reuses the previous search.
+        """
+        grid = self.grid
+        start_rc, goal_rc = grid.cell(start_x, start_z), grid.cell(goal_x, goal_z)
+        if not (grid.in_bounds(*start_rc) and grid.in_bounds(*goal_rc)):
+            return None
+        start = start_rc[0] * self.cols + start_rc[1]
+        goal = goal_rc[0] * self.cols + goal_rc[1]
+
+        new_search = goal != self.goal or self._cost is None \
+            or len(self._cost) != grid.rows * self.cols
+        if new_search:
+            self._cost = self._cell_costs()
+            self._map_version = grid.version
+        elif grid.version != self._map_version:
+            self._apply_map_changes()
+        if self._cost[goal] == INF:
+            return None
+        snapped = None
+        if self._cost[start] == INF:
+            # inside an obstacle margin: leave it by the shortest way first
+            start = snapped = self._nearest_free(start)
+            if start is None:
+                return None
+
+        if new_search:
+            self._start = start
+            self._reset(goal)
+        else:
+            self._km += self._h(self._start, start)
+            self._start = start
+        self._compute()
+        if self._g[start] == INF and self._rhs[start] == INF:
+            return None
+
+        cells = self._extract(start)
+        if cells is None:
+            return None
+        kept = self._shortcut(cells)
+        waypoints = [grid.center(*divmod(u, self.cols)) for u in kept[0 if snapped else 1:-1]]
+        waypoints.append((goal_x, goal_z))
+        return waypoints
+
+    def _nearest_free(self, u, max_rings=10):
+        """Closest unblocked cell to u (ring search), or None"""
+        cols, rows, cost = self.cols, self.grid.rows, self._cost
+        row, col = divmod(u, cols)
+        for ring in range(1, max_rings + 1):
+            best, best_d = None, INF
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if 0 <= r < rows and 0 <= c < cols and cost[r * cols + c] != INF:
+                        d = (r - row) ** 2 + (c - col) ** 2
+                        if d < best_d:
+                            best, best_d = r * cols + c, d
+            if best is not None:
+                return best
+        return None
+
+    def _extract(self, start):
+        """Greedy descent on g from start to goal"""
+        g, path, u = self._g, [start], start
+        limit = len(g)
+        while u != self.goal:
+            best, best_v = INF, None
+            for v, c in self._successors(u):
+                if c + g[v] < best:
+                    best, best_v = c + g[v], v
+            if best_v is None or len(path) > limit:
+                return None
+            u = best_v
+            path.append(u)
+        return path
+
+    def line_of_sight(self, a, b):
+        """True if no blocked cell lies on the segment between flat cells a and b"""
+        cost, cols = self._cost, self.cols
+        r0, c0 = divmod(a, cols)
+        r1, c1 = divmod(b, cols)
+        steps = max(abs(r1 - r0), abs(c1 - c0)) * 2
+        if steps == 0:
+            return True
+        for k in range(1, steps + 1):
+            t = k / steps
+            r = int(math.floor(r0 + 0.5 + (r1 - r0) * t))
+            c = int(math.floor(c0 + 0.5 + (c1 - c0) * t))
+            if cost[r * cols + c] == INF:
+                return False
+        return True
+
+    def _shortcut(self, cells):
+        """Drop every cell reachable in a straight line from the last kept one"""
+        kept = [cells[0]]
+        i = 0
+        while i < len(cells) - 1:
+            j = len(cells) - 1
+            while j > i + 1 and not self.line_of_sight(cells[i], cells[j]):
+                j -= 1
+            kept.append(cells[j])
+            i = j
+        return kept
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    from occupancy import OccupancyGrid
+
+    grid = OccupancyGrid.empty(6.0, 6.0, resolution=0.1)
+    grid.set_rect(-2.0, 0.9, 1.5, 1.1)                 # wall with a gap on the right
+    planner = GridPlanner(grid)
+
+    t0 = time.perf_counter()
+    path = planner.plan(0.0, 0.0, 0.0, 2.0)
+    print(f"first plan:   {(time.perf_counter() - t0) * 1e3:6.1f} ms, "
+          f"{planner.expanded} expanded, waypoints {[(round(x, 2), round(z, 2)) for x, z in path]}")
+
+    t0 = time.perf_counter()
+    path = planner.plan(0.3, 0.2, 0.0, 2.0)            # robot moved
+    print(f"moved:        {(time.perf_counter() - t0) * 1e3:6.1f} ms, {planner.expanded} expanded")
+
+    grid.set_rect(1.5, 0.9, 3.0, 1.1)                  # gap closed on the right ...
+    grid.set_rect(-3.0, 0.9, -2.0, 1.1, value=0)       # ... opened on the left
+    t0 = time.perf_counter()
+    path = planner.plan(0.3, 0.2, 0.0, 2.0)
+    print(f"map changed:  {(time.perf_counter() - t0) * 1e3:6.1f} ms, "
+          f"{planner.expanded} expanded, waypoints {[(round(x, 2), round(z, 2)) for x, z in path]}")
+
+    fresh = GridPlanner(grid)
+    t0 = time.perf_counter()
+    check = fresh.plan(0.3, 0.2, 0.0, 2.0)
+    print(f"from scratch: {(time.perf_counter() - t0) * 1e3:6.1f} ms, {fresh.expanded} expanded, "
+          f"same path: {check == path}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Pose outlier rejection for the Localization ingest path
+———————————————————————————————————————————————
+QuestNav sometimes relocalizes and the pose jumps by tens of centimetres.
+PoseFilter gates every frame against a median of the last three accepted
+frames with a velocity limit (position: max_speed, yaw: max_yaw_rate):
+- a frame inside the gate is accepted as-is
+- a frame outside it is counted as a jump and the last good value is held
+- if confirm_frames consecutive out-of-gate frames agree with each other,
+  the jump is real (relocalization): the filter re-anchors and the output
+  slews to the new value at catchup_speed instead of stepping
+Constant work per frame (a few comparisons), no buffers beyond 3 samples.
+"""
+
+import math
+
+
+def _median3(a, b, c):
+    return a + b + c - min(a, b, c) - max(a, b, c)
+
+
+def _wrap_deg(angle):
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class _Gate:
+    """Velocity gate + relocalization handling for one signal (2-D position or yaw)"""
+
+    def __init__(self, max_rate, noise, confirm_frames, catchup_rate, angular=False):
+        self.max_rate = max_rate
+        self.noise = noise
+        self.confirm_frames = confirm_frames
+        self.catchup_rate = catchup_rate
+        self.angular = angular
+        self.jumps = 0
+        self.relocalizations = 0
+        self.flagged = False        # last frame was rejected / is being caught up
+        self._hist = None           # last 3 accepted (t, a, b)
+        self._pending = None        # candidate new anchor (a, b, count)
+        self.out_a = self.out_b = 0.0
+        self._t_out = None
+
+    def _diff(self, a, b):
+        return _wrap_deg(a - b) if self.angular else a - b
+
+    def _distance(self, a0, b0, a1, b1):
+        return abs(self._diff(a0, a1)) if self.angular else math.hypot(a0 - a1, b0 - b1)
+
+    def _reset(self, t, a, b):
+        self._hist = [(t, a, b)] * 3
+        self._pending = None
+
+    def update(self, t, a, b=0.0):
+        """Feed one raw frame at time t (s); returns the filtered (a, b)"""
+        if self._hist is None:
+            self._reset(t, a, b)
+            self.out_a, self.out_b, self._t_out = a, b, t
+            return a, b
+
+        h0, h1, h2 = self._hist
+        if self.angular:
+            # median of angles across the wrap: work in offsets from the newest sample
+            ref_a = h2[1] + _median3(0.0, self._diff(h1[1], h2[1]), self._diff(h0[1], h2[1]))
+        else:
+            ref_a = _median3(h0[1], h1[1], h2[1])
+        ref_b = _median3(h0[2], h1[2], h2[2])
+        allowed = self.max_rate * max(t - h0[0], 0.0) + self.noise
+
+        if self._distance(a, b, ref_a, ref_b) <= allowed:
+            self._hist = [h1, h2, (t, a, b)]
+            self._pending = None
+            target_a, target_b = a, b
+        else:
+            self.jumps += 1
+            p = self._pending
+            if p is not None and self._distance(a, b, p[0], p[1]) <= self.noise + self.max_rate * 0.05:
+                self._pending = (a, b, p[2] + 1)
+            else:
+                self._pending = (a, b, 1)
+            if self._pending[2] >= self.confirm_frames:
+                self.relocalizations += 1
+                self._reset(t, a, b)
+                target_a, target_b = a, b
+            else:
+                target_a, target_b = self.out_a, self.out_b    # hold
+
+        # slew the output toward the target so accepted jumps don't step
+        dt = max(t - self._t_out, 0.0)
+        self._t_out = t
+        step = self.catchup_rate * dt + self.noise
+        da, db = self._diff(target_a, self.out_a), target_b - self.out_b
+        dist = abs(da) if self.angular else math.hypot(da, db)
+        if dist <= step:
+            self.out_a, self.out_b = target_a, target_b
+            self.flagged = self._pending is not None
+        else:
+            k = step / dist
+            self.out_a += da * k
+            self.out_b += db * k
+            if self.angular:
+                self.out_a = _wrap_deg(self.out_a)
+            self.flagged = True
+        return self.out_a, self.out_b
+
+
+class PoseFilter:
+    """Jump filter for QuestNav position and yaw (degrees, as published)"""
+
+    def __init__(self, max_speed=1.5, max_yaw_rate=720.0, position_noise=0.02,
+                 yaw_noise=2.0, confirm_frames=5, catchup_speed=0.5, catchup_yaw_rate=90.0):
+        """
+        Args:
+            max_speed: fastest physically possible speed (m/s)
+            max_yaw_rate: fastest possible turn rate (deg/s)
+            position_noise / yaw_noise: tolerance added to every gate (m / deg)
+            confirm_frames: consecutive consistent jumped frames that mean relocalization
+            catchup_speed / catchup_yaw_rate: output slew after an accepted jump
+        """
+        self.position = _Gate(max_speed, position_noise, confirm_frames, catchup_speed)
+        self.yaw = _Gate(max_yaw_rate, yaw_noise, confirm_frames, catchup_yaw_rate, angular=True)
+
+    def filter_position(self, t, position):
+        """Filtered copy of a [x, y, z] position (y passes through)"""
+        x, z = self.position.update(t, position[0], position[2])
+        return [x, position[1], z]
+
+    def filter_euler(self, t, euler_angles):
+        """Filtered copy of euler angles; only yaw (index 1) is gated"""
+        yaw, _ = self.yaw.update(t, euler_angles[1])
+        return [euler_angles[0], yaw, euler_angles[2]]
+
+    @property
+    def jumps(self):
+        return self.position.jumps + self.yaw.jumps
+
+    @property
+    def relocalizations(self):
+        return self.position.relocalizations + self.yaw.relocalizations
+
+    @property
+    def flagged(self):
+        return self.position.flagged or self.yaw.flagged
+
+    def stats(self):
+        return (f"{self.position.jumps} position / {self.yaw.jumps} yaw frames rejected, "
+                f"{self.relocalizations} relocalizations accepted")
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+
+    # spike / relocalization / wrap behaviour: tests/test_posefilter.py
+    f = PoseFilter()
+    n = 100_000
+    t0 = time.perf_counter()
+    for k in range(n):
+        f.filter_position(k / 60, [0.0, 0.0, 0.3 * k / 60])
+        f.filter_euler(k / 60, [0.0, 10.0, 0.0])
+    print(f"{(time.perf_counter() - t0) / n * 1e6:.1f} µs per frame (position + yaw)")
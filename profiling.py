@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Hot-path profiling with per-stage timing histograms
+———————————————————————————————————————————————
+Stages of the pipeline, in order:
+  nt_transit       QuestNav publish → value seen by the server (NT timestamps)
+  nt_event         Localization._on_event (includes location_update)
+  location_update  handle_location_update callback
+  pose_read        Localization.read_pose in the control loop
+  control_law      turn / drive step
+  motor_set        MDDS30AntiPhase.set round trip to pigpiod
+
+Disabled means no profiler object at all: call sites bind the plain functions
+once, so there is zero per-iteration cost. Enabled, each sample is one
+perf_counter_ns() pair plus an O(1) histogram increment (well under 1 µs).
+"""
+
+import time
+
+STAGES = ("nt_transit", "nt_event", "location_update", "pose_read", "control_law", "motor_set")
+
+
+class Histogram:
+    """
+    HDR-style log-linear histogram of nanosecond values: 16 linear
+    sub-buckets per power of two, i.e. ~6% relative precision over any range,
+    in a fixed list of counters.
+    """
+
+    SUB_BITS = 4
+    SUB_COUNT = 1 << SUB_BITS
+
+    def __init__(self):
+        self.counts = [0] * (self.SUB_COUNT * 64)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        shift = ns.bit_length() - 5          # 5 = SUB_BITS + 1
+        if shift <= 0:
+            self.counts[ns] += 1
+        else:
+            self.counts[(shift << 4) + (ns >> shift)] += 1
+        self.total += 1
+        self.sum += ns
+        if ns > self.max:
+            self.max = ns
+
+    def _bucket_value(self, index):
+        """Upper edge of a bucket, in ns"""
+        if index < 2 * self.SUB_COUNT:
+            return index
+        shift = (index >> self.SUB_BITS) - 1
+        top = index - (shift << self.SUB_BITS)
+        return ((top + 1) << shift) - 1
+
+    def percentile(self, pct):
+        if not self.total:
+            return 0
+        wanted = max(1, int(self.total * pct / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(self._bucket_value(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.total = self.sum = self.max = 0
+
+
+class Profiler:
+    """One histogram per pipeline stage"""
+
+    def __init__(self, stages=STAGES):
+        self.histograms = {stage: Histogram() for stage in stages}
+
+    def record(self, stage, start_ns):
+        """Record the time since start_ns (from time.perf_counter_ns())"""
+        self.histograms[stage].record(time.perf_counter_ns() - start_ns)
+
+    def record_value(self, stage, ns):
+        self.histograms[stage].record(ns)
+
+    def wrap(self, stage, func):
+        """Return func with every call timed into `stage`"""
+        histogram = self.histograms[stage]
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(clock() - t0)
+
+        return timed
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def report(self):
+        lines = [f"{'stage':<16}{'count':>8}{'mean':>10}{'p50':>10}{'p90':>10}"
+                 f"{'p99':>10}{'p99.9':>10}{'max':>10}   (µs)"]
+        for stage, h in self.histograms.items():
+            if not h.total:
+                lines.append(f"{stage:<16}{0:>8}")
+                continue
+            cols = (h.mean, h.percentile(50), h.percentile(90), h.percentile(99),
+                    h.percentile(99.9), h.max)
+            lines.append(f"{stage:<16}{h.total:>8}" + "".join(f"{v / 1e3:>10.1f}" for v in cols))
+        return "\n".join(lines)
+
+    def dump(self):
+        print("\n=== Hot-path profile ===")
+        print(self.report())
+
+
+# overhead check ----------------------------------------------------------
+if __name__ == "__main__":
+    profiler = Profiler()
+    n = 200_000
+
+    def work():
+        pass
+
+    def loop(func):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            func()
+        return (time.perf_counter() - t0) / n
+
+    plain = loop(work)
+    timed = loop(profiler.wrap("control_law", work))
+
+    print(profiler.report())
+    print(f"\nOverhead per timed call: {(timed - plain) * 1e9:.0f} ns")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Real-time helpers for the control loop (Linux / Raspberry Pi)
+———————————————————————————————————————————————
+- dedicated control thread pinned to one CPU (isolcpus=… if available)
+- SCHED_FIFO priority when permitted (root or CAP_SYS_NICE)
+- gc.freeze() after warm-up, GC disabled while moving and run between moves
+- LoopTimer: absolute-deadline pacing that reports achieved period jitter
+Anything the OS refuses is reported and skipped - the loop still runs.
+"""
+
+import gc
+import math
+import os
+import threading
+import time
+
+
+def isolated_cpus():
+    """CPUs reserved with the isolcpus= kernel parameter (may be empty)"""
+    try:
+        with open("/sys/devices/system/cpu/isolated") as f:
+            text = f.read().strip()
+    except OSError:
+        return []
+
+    cpus = []
+    for part in filter(None, text.split(",")):
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def pick_control_cpu():
+    """Prefer an isolated core, otherwise the highest core we may run on"""
+    isolated = isolated_cpus()
+    if isolated:
+        return isolated[0]
+    if hasattr(os, "sched_getaffinity"):
+        return max(os.sched_getaffinity(0))
+    return None
+
+
+class LoopTimer:
+    """
+    Paces a loop at a fixed rate using absolute deadlines, so the time spent
+    in the loop body doesn't stretch the period, and keeps running statistics
+    of the period that was actually achieved.
+    """
+
+    def __init__(self, hz):
+        self.period = 1.0 / hz
+        self.reset()
+
+    def reset(self, hz=None):
+        """Start a new run (optionally at a new rate) and clear the statistics"""
+        if hz is not None:
+            self.period = 1.0 / hz
+        self.resync()
+        self.count = 0
+        self.overruns = 0
+        self.last_period = self.period
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min_period = math.inf
+        self.max_period = 0.0
+
+    def resync(self):
+        """Forget the schedule after a deliberate pause, keeping the statistics"""
+        self._deadline = None
+        self._last = None
+
+    def wait(self):
+        """Sleep until the next period boundary; returns the measured dt"""
+        now = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += self.period
+
+        remaining = self._deadline - now
+        if remaining > 0:
+            time.sleep(remaining)
+        else:
+            # We are late - resync instead of bursting to catch up
+            self.overruns += 1
+            self._deadline = now
+
+        now = time.perf_counter()
+        dt = self.period if self._last is None else now - self._last
+        if self._last is not None:
+            self._record(dt)
+        self._last = now
+        self.last_period = dt
+        return dt
+
+    def _record(self, dt):
+        # Welford's running mean / variance - O(1), no buffer
+        self.count += 1
+        delta = dt - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (dt - self._mean)
+        if dt < self.min_period:
+            self.min_period = dt
+        if dt > self.max_period:
+            self.max_period = dt
+
+    @property
+    def mean_period(self):
+        return self._mean if self.count else self.period
+
+    @property
+    def jitter(self):
+        """Standard deviation of the achieved period (seconds)"""
+        return math.sqrt(self._m2 / self.count) if self.count > 1 else 0.0
+
+    def report(self):
+        if not self.count:
+            return "Loop timing: no samples"
+        return (f"Loop timing: {self.count} periods, target {self.period * 1e3:.2f} ms, "
+                f"mean {self.mean_period * 1e3:.2f} ms, jitter {self.jitter * 1e3:.3f} ms, "
+                f"min {self.min_period * 1e3:.2f} / max {self.max_period * 1e3:.2f} ms, "
+                f"{self.overruns} overruns")
+
+
+class RealtimeThread:
+    """
+    A single long-lived thread that runs control jobs (e.g. move_to) with
+    real-time settings applied once at start-up. Jobs are submitted from the
+    REPL thread and run one at a time.
+    """
+
+    def __init__(self, cpu="auto", priority=50, freeze_gc=True, disable_gc=True,
+                 name="control-rt"):
+        """
+        Args:
+            cpu: core to pin to, "auto" for pick_control_cpu(), None to skip pinning
+            priority: SCHED_FIFO priority (1-99), None to skip
+            freeze_gc: move everything allocated during warm-up out of the GC's reach
+            disable_gc: no automatic collections; collect explicitly between jobs
+            name: thread name (one per robot in a fleet)
+        """
+        self.cpu = pick_control_cpu() if cpu == "auto" else cpu
+        self.priority = priority
+        self.freeze_gc = freeze_gc
+        self.disable_gc = disable_gc
+        self.status = {}
+
+        self._job = None
+        self._result = None
+        self._error = None
+        self._pending = threading.Event()
+        self._done = threading.Event()
+        self._done.set()                # nothing submitted yet: wait() returns at once
+        self._ready = threading.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        self.print_status()
+        return self
+
+    def _apply_settings(self):
+        if self.cpu is not None and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, {self.cpu})  # 0 = this thread on Linux
+                self.status["affinity"] = f"cpu {self.cpu}"
+            except OSError as e:
+                self.status["affinity"] = f"unavailable ({e.strerror})"
+        else:
+            self.status["affinity"] = "not requested" if self.cpu is None else "unsupported"
+
+        if self.priority is not None and hasattr(os, "sched_setscheduler"):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+                self.status["scheduler"] = f"SCHED_FIFO {self.priority}"
+            except (OSError, ValueError) as e:
+                reason = getattr(e, "strerror", None) or str(e)
+                self.status["scheduler"] = f"SCHED_OTHER (FIFO refused: {reason})"
+        else:
+            self.status["scheduler"] = "SCHED_OTHER"
+
+        # Warm-up is done by now (modules imported, hardware and NT set up):
+        # collect once and freeze the survivors so later collections are cheap.
+        gc.collect()
+        if self.freeze_gc:
+            gc.freeze()
+            self.status["gc_frozen"] = gc.get_freeze_count()
+        if self.disable_gc:
+            gc.disable()
+        self.status["gc"] = "manual (between moves)" if self.disable_gc else "automatic"
+
+    def _run(self):
+        self._apply_settings()
+        self._ready.set()
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            if not self._running:
+                return
+            func, args, kwargs = self._job
+            try:
+                self._result = func(*args, **kwargs)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._job = None
+                if self.disable_gc:
+                    gc.collect()   # explicit collection while the robot is idle
+                self._done.set()
+
+    def submit(self, func, *args, **kwargs):
+        """Start func on the control thread without waiting (see wait())"""
+        if self.busy:
+            raise RuntimeError(f"{self._thread.name} is still running a job")
+        self._result = self._error = None
+        self._done.clear()
+        self._job = (func, args, kwargs)
+        self._pending.set()
+
+    def wait(self, timeout=None):
+        """Result of the submitted job (re-raises its exception); None on timeout"""
+        if not self._done.wait(timeout):
+            return None
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    @property
+    def busy(self):
+        return self._job is not None
+
+    def on_thread(self):
+        """True when called from the control thread itself"""
+        return threading.current_thread() is self._thread
+
+    def run(self, func, *args, **kwargs):
+        """Run func on the control thread and wait for its result"""
+        self.submit(func, *args, **kwargs)
+        return self.wait()
+
+    def print_status(self):
+        print("Real-time control thread:")
+        for key, value in self.status.items():
+            print(f"  {key}: {value}")
+
+    def close(self):
+        self._running = False
+        self._pending.set()
+        self._thread.join(timeout=1.0)
+        if self.disable_gc:
+            gc.enable()
+        if self.freeze_gc:
+            gc.unfreeze()
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    def spin(hz, seconds):
+        timer = LoopTimer(hz)
+        for _ in range(int(hz * seconds)):
+            sum(i * i for i in range(200))   # a bit of "control law" work
+            timer.wait()
+        return timer.report()
+
+    print(spin(200, 1.0))
+    rt = RealtimeThread().start()
+    try:
+        print(rt.run(spin, 200, 1.0))
+    finally:
+        rt.close()
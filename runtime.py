@@ -0,0 +1,1071 @@
+#!/usr/bin/env python3
+"""
+Robot runtime: motor driver, localization and the shared REPL
+———————————————————————————————————————————————
+Importing this module (or controlloop / beta_controlloop) does no I/O:
+pigpio, ntcore and numpy are imported only when first needed, and no
+driver or server exists until create_runtime() builds one.
+
+    rt = create_runtime(Robot)                        # real robot
+    rt = Robot(motor=fake_motor, localization=sim)    # tools, benches, simulation
+
+A Runtime owns everything that used to be module state - motor, pose
+source, persisted state, timing, profiler, logger - so several can live in
+one process (each with its own NT instance, ports, pins and state file).
+Controllers subclass Runtime and provide move_to(); every move runs on the
+one ControlEngine loop (controlengine.py) with its own strategy.
+"""
+
+import abc
+import atexit
+import math
+import threading
+import time
+
+from calibration import Calibration
+from controlengine import ControlEngine, MPCStrategy, PoseStabilizer, PurePursuit, TurnThenDrive
+from controlstate import PoseSnapshot, ControlState, PoseParams, TurnParams, DriveParams, DEG
+from deadreckoning import DeadReckoner
+from motionmonitor import MotionMonitor
+from posefilter import PoseFilter
+from profiling import Profiler
+from realtime import LoopTimer, RealtimeThread
+from statefile import StateStore, STATE_FILE
+
+
+class MoveCancelled(Exception):
+    """Raised inside a move loop when cancel_move() was called"""
+
+
+class MoveRejected(RuntimeError):
+    """run_control() was called while another move holds the runtime"""
+
+
+class MotionFault(MoveCancelled):
+    """Raised inside a move loop when the motion monitor saw a stall or slip"""
+
+    def __init__(self, kind, action, obstacle=None):
+        super().__init__(f"{kind} ({action})")
+        self.kind = kind
+        self.action = action
+        self.obstacle = obstacle        # (x, z) the robot was pushing into, if known
+
+
+class Runtime(abc.ABC):
+    """Hardware, localization and shared commands for one robot"""
+
+    def __init__(self, motor, localization, state_store=None, profiler=None,
+                 pose_filter=None, telemetry=None):
+        """
+        Args:
+            motor: MDDS30AntiPhase or anything with set / stop / close / set_compensation
+            localization: Localization or anything with read_pose / get_latest_data /
+                calibrate / set_calibration / wait_for_pose
+            state_store: statefile.StateStore (default: robot_state.json)
+            profiler: optional profiling.Profiler for the hot path
+            pose_filter: the PoseFilter installed in localization (for status)
+            telemetry: optional telemetry.Telemetry publishing the control state to NT
+        """
+        self.driver = motor             # the bare driver; self.motor may wrap it (geofence)
+        self.motor = motor
+        self.localization = localization
+        self.state_store = state_store if state_store is not None else StateStore()
+        self.profiler = profiler
+        self.pose_filter = pose_filter
+        self.telemetry = telemetry
+        self.commands = None            # commands.CommandChannel (remote requests over NT)
+        self.nt_base = "/robot"         # topic prefix of this robot (/<name>/robot in a fleet)
+        self.teleop = None              # teleop.Teleop while driven by hand (holds the move lock)
+        self.teleop_nt = None           # (Teleop, NTAxes) while NT teleop is on
+        self._teleop_keys = None        # teleop.KeyboardAxes while keyboard teleop runs
+
+        # Identified motor model (see sysid.py); its feedforward table makes small
+        # commands move the robot, so the controllers' stall floors are dropped
+        self.motor_model = self.state_store.get("motor_model")
+        if self.motor_model is None:
+            from sysid import load_model
+            self.motor_model = load_model()
+        if self.motor_model is not None:
+            motor.set_compensation(self.motor_model["compensation"])
+        self.command_logger = None
+
+        # Measured actuation-to-sensing delay / motor lag per mode ("turn", "drive"), see latency.py
+        self.latency_model = self.state_store.get("latency")
+        if self.latency_model is None:
+            from latency import load_latency
+            self.latency_model = load_latency()
+
+        # Control law used by move_to ("default" = the subclass's own, or "mpc")
+        self.controller = "default"
+        self.mpc = None
+        self.pose_params = PoseParams()     # move_to_pose (polar pose stabilizer)
+
+        # Teach and repeat (teach.py)
+        self.route_recorder = None
+        self._routes = None
+
+        # Real-time mode (opt-in): moves run on a pinned SCHED_FIFO thread
+        self.rt_thread = None
+        self.loop_timer = LoopTimer(10)
+        self._cancel = threading.Event()
+        # One move at a time: REPL, remote commands and fleet jobs all go through
+        # run_control, which holds this for the whole move
+        self._move_lock = threading.Lock()
+
+        # Preallocated per-move state, reused by every move (see controlstate.py)
+        self.pose_snapshot = PoseSnapshot()
+        self.control_state = ControlState()
+        self.engine = ControlEngine(self)
+
+        self.dead_reckoner = self.build_dead_reckoner()
+
+        # Stall / slip detection on every drive_motors() command (motionmonitor.py);
+        # per event: "abort", "back_off" (reverse briefly, then abort), "replan"
+        # (back off, mark the obstacle, let navigate_to plan around it) or "warn"
+        self.motion_monitor = MotionMonitor()
+        self.motion_policy = {"stall": "back_off", "slip": "warn"}
+        self.motion_policy.update(self.state_store.get("motion_policy") or {})
+        self.back_off_time = 0.4
+        self.back_off_speed = 0.4
+
+        # Obstacle map and planner (occupancy.py / planner.py); None = drive straight
+        self.occupancy = None
+        self.planner = None
+        saved_map = self.state_store.get("map")
+        if saved_map is not None:
+            try:
+                self.load_map(saved_map["path"], saved_map.get("robot_radius", 0.2), save=False)
+            except OSError as e:
+                print(f"⚠ Saved map not loaded: {e}")
+
+        # Geofence (geofence.py): enforced on every motor command when loaded
+        self.fence = None
+        saved_fence = self.state_store.get("geofence")
+        if saved_fence is not None:
+            from geofence import Geofence
+            self.set_geofence(Geofence.from_dict(saved_fence), save=False)
+
+    # pose -----------------------------------------------------------------
+    @property
+    def current_position(self):
+        """Calibrated position (Localization applies the calibration at ingest)"""
+        return self.localization.calibrated_position or [0.0, 0.0, 0.0]
+
+    @property
+    def current_yaw(self):
+        euler = self.localization.calibrated_euler_angles
+        return euler[1] if euler else 0.0
+
+    def build_dead_reckoner(self):
+        """Pose source for the move loops: QuestNav, bridged by dead reckoning on dropouts"""
+        latency = self.latency_model
+        delay = latency.get("drive", latency.get("turn", {})).get("delay", 0.0)
+        return DeadReckoner(self.localization, self.motor_model,
+                            compensated=self.motor.compensated, delay=delay)
+
+    def calibrate(self):
+        """Calibrate by setting current position to (0,0,0) and yaw to 0"""
+        if self.localization.calibrate():
+            self.state_store.update(calibration=self.localization.calibration.to_dict())
+            print("✓ Calibration complete! Position and yaw set to zero.")
+            print(self.localization.calibration)
+            return True
+        print("✗ Calibration failed: No position data available")
+        return False
+
+    def set_mount(self, x, z, yaw=0.0):
+        """Headset position (m) and yaw (deg) relative to the robot base; +z forward"""
+        self.localization.set_calibration(self.localization.calibration.with_mount(x, z, yaw))
+        self.state_store.update(calibration=self.localization.calibration.to_dict())
+        print(f"✓ Mount offset set: x={x}, z={z}, yaw={yaw}° - run 'calibrate' again")
+
+    def save_last_pose(self):
+        """Persist the last calibrated pose (checked against the first pose after a restart)"""
+        position = self.localization.calibrated_position
+        euler = self.localization.calibrated_euler_angles
+        if position and euler:
+            self.state_store.update(last_pose={
+                "x": position[0], "z": position[2], "yaw": euler[1], "t": time.time(),
+            })
+
+    def wait_until_ready(self, timeout=10.0):
+        """Wait for the first tracked QuestNav pose instead of sleeping blindly"""
+        t0 = time.perf_counter()
+        if not self.localization.wait_for_pose(timeout):
+            print(f"⚠ No tracked pose after {timeout:.0f} s - continuing without localization")
+            return False
+        print(f"✓ First tracked pose after {time.perf_counter() - t0:.2f} s")
+
+        last = self.state_store.get("last_pose")
+        if last is not None and self.state_store.get("calibration") is not None:
+            x, z = self.current_position[0], self.current_position[2]
+            moved = math.hypot(x - last["x"], z - last["z"])
+            if moved > 0.5:
+                print(f"⚠ Pose is {moved:.2f} m from where the robot stopped last time - "
+                      "the headset may have re-centred; run 'calibrate' if moves look wrong")
+            else:
+                print(f"✓ Restored calibration (pose within {moved:.2f} m of last shutdown)")
+        return True
+
+    # control plumbing -----------------------------------------------------
+    @property
+    def busy(self):
+        """True while a move holds the runtime (see run_control)"""
+        return self._move_lock.locked()
+
+    def run_control(self, func, *args, preempt=False):
+        """
+        Run a control job, on the real-time thread if enabled, and report loop jitter.
+
+        Only one move runs per runtime: the job holds the move lock until it
+        returns, so moves from the REPL, the command channel and a fleet never
+        drive the shared control state and motors at the same time.
+
+        Args:
+            preempt: cancel the running move and wait for it to end instead of
+                refusing to start
+
+        Raises:
+            MoveRejected: another move is running (and preempt is False)
+        """
+        self._acquire_move(preempt)
+        try:
+            if self.motion_monitor is not None:
+                self.motion_monitor.reset()
+            try:
+                if self.rt_thread is not None and not self.rt_thread.on_thread():
+                    result = self.rt_thread.run(func, *args)
+                else:
+                    result = func(*args)
+            except MotionFault as e:
+                print(f"✗ Move aborted: {e}")
+                result = False
+            except MoveCancelled:
+                print("✗ Move cancelled")
+                result = False
+            if self.telemetry is not None:
+                self.telemetry.publish(self.control_state, self.loop_timer.last_period, force=True)
+            print(self.loop_timer.report())
+            self.save_last_pose()
+            return result
+        finally:
+            self._move_lock.release()
+
+    def _acquire_move(self, preempt):
+        """Take the move lock (run_control, teleop sessions); see run_control"""
+        if not self._move_lock.acquire(blocking=False):
+            if not preempt:
+                raise MoveRejected("another move is running - stop it first")
+            self.cancel_move()
+            self._move_lock.acquire()
+        # cleared only once the previous move is over, so a cancel aimed at
+        # it can't be swallowed by this one starting
+        self._cancel.clear()
+
+    def profiled(self, stage, func):
+        """func timed into the profiler's `stage` histogram, or func itself when profiling is off"""
+        return func if self.profiler is None else self.profiler.wrap(stage, func)
+
+    def drive_motors(self, motor_set, left, right):
+        """
+        Send a wheel command and let the dead reckoner know about it. The command
+        goes out on the calling (control) thread: a pigpio write is a short
+        socket round trip, far cheaper and steadier than a thread per command.
+        """
+        if self._cancel.is_set():
+            self.stop_motors()
+            raise MoveCancelled
+        monitor = self.motion_monitor
+        if monitor is not None:
+            v, w = self.dead_reckoner.expected_velocity()
+            event = monitor.update(time.perf_counter(), self.pose_snapshot, v, w)
+            if event is not None:
+                self.on_motion_event(event, left, right)
+        self.dead_reckoner.command(left, right)
+        motor_set(left, right)
+        if self.telemetry is not None:
+            self.telemetry.publish(self.control_state, self.loop_timer.last_period)
+
+    def stop_motors(self):
+        self.dead_reckoner.command(0.0, 0.0)
+        self.motor.stop()
+
+    def on_motion_event(self, kind, left, right):
+        """
+        React to a stall / slip reported by the motion monitor, as motion_policy
+        says; raises MotionFault unless the policy is "warn".
+
+        Args:
+            left, right: the command the move loop was about to send
+        """
+        action = self.motion_policy.get(kind, "abort")
+        print(f"⚠ {kind.capitalize()} detected: {self.motion_monitor} - {action}")
+        if action == "warn":
+            return
+        obstacle = None
+        pose = self.pose_snapshot
+        if kind == "stall" and abs(left + right) > abs(left - right):
+            # pushing straight into something: it is just beyond the robot's nose (or tail)
+            reach = 0.3 if left + right > 0 else -0.3
+            obstacle = (pose.x + reach * math.sin(pose.yaw), pose.z + reach * math.cos(pose.yaw))
+        if action in ("back_off", "replan"):
+            self.back_off(left, right)
+        else:
+            self.stop_motors()
+        raise MotionFault(kind, action, obstacle)
+
+    def back_off(self, left, right):
+        """Drive opposite to (left, right) at back_off_speed for back_off_time, then stop"""
+        scale = max(abs(left), abs(right))
+        if scale > 1e-6:
+            scale = self.back_off_speed / scale
+            self.dead_reckoner.command(-left * scale, -right * scale)
+            self.motor.set(-left * scale, -right * scale)
+            deadline = time.perf_counter() + self.back_off_time
+            while time.perf_counter() < deadline and not self._cancel.is_set():
+                time.sleep(0.02)
+        self.dead_reckoner.command(0.0, 0.0)
+        self.motor.stop()
+
+    def set_motion_policy(self, kind, action):
+        """What a stall / slip does: abort, back_off, replan or warn (persisted)"""
+        if kind not in ("stall", "slip") or action not in ("abort", "back_off", "replan", "warn"):
+            raise ValueError(f"bad motion policy {kind} {action}")
+        self.motion_policy[kind] = action
+        self.state_store.update(motion_policy=dict(self.motion_policy))
+
+    def cancel_move(self):
+        """Stop now and make the running move (if any) end at its next command; ends teleop"""
+        self._cancel.set()
+        if self.teleop_nt is not None:
+            self.teleop_nt_stop()
+        if self._teleop_keys is not None:
+            self._teleop_keys.close()       # teleop_keys returns and releases the lock
+        self.stop_motors()
+
+    def apply_motor_model(self):
+        """Hook for controllers whose parameters depend on compensation"""
+
+    def speed_scale(self):
+        """Ground speed (m/s) per unit wheel command, from the motor model if there is one"""
+        model = self.motor_model
+        if model is not None and self.driver.compensated:
+            return model["v_max"]
+        if model is not None:
+            return 0.5 * (model["wheels"]["left"]["gain_fwd"] + model["wheels"]["right"]["gain_fwd"])
+        return 0.5
+
+    def move_to_mpc(self, x, z, verbose=True):
+        """Drive to (x, z) with the model predictive controller (mpc.py)"""
+        from mpc import MPC
+        if self.mpc is None:
+            track = self.motor_model["track_width"] if self.motor_model is not None else 0.30
+            self.mpc = MPC(speed_scale=self.speed_scale(), track_width=track)
+        print(f"Moving to relative position (MPC): x={x}, z={z}")
+        return self.engine.run(MPCStrategy(x, z, self.mpc), verbose)
+
+    def move_to_pose(self, x, z, theta, verbose=True):
+        """
+        Drive to (x, z) and arrive facing theta (degrees, calibrated yaw) in one
+        continuous motion, backing in when the target is behind (controlstate.pose_step).
+        """
+        p = self.pose_params
+        p.speed_scale = self.speed_scale()
+        p.track_width = self.motor_model["track_width"] if self.motor_model is not None else 0.30
+        p.min_speed = 0.0 if self.driver.compensated else 0.3
+        print(f"Moving to pose: x={x}, z={z}, yaw={theta}°")
+        return self.engine.run(PoseStabilizer(x, z, theta * DEG, p), verbose)
+
+    def move_to_direct(self, x, z, verbose=True):
+        """Turn fully to the target, then drive (the original two-phase move, looser arrival)"""
+        print(f"Moving to relative position: x={x}, z={z}")
+        drive = DriveParams(dist_tol=0.25, min_speed=0.0 if self.driver.compensated else 0.15,
+                            dist_kp=0.8)
+        return self.engine.run(TurnThenDrive(x, z, TurnParams(), drive), verbose)
+
+    def move_to_bu(self, x, z, verbose=True):
+        """Drive straight off with steering (no turn phase) at up to 0.4"""
+        print(f"Moving to relative position: x={x}, z={z}")
+        drive = DriveParams(dist_tol=0.25, max_speed=0.4,
+                            min_speed=0.0 if self.driver.compensated else 0.15, dist_kp=0.8)
+        return self.engine.run(TurnThenDrive(x, z, TurnParams(tolerance=360.0 * DEG), drive), verbose)
+
+    @abc.abstractmethod
+    def move_to(self, x, z, verbose=True):
+        """The controller's move to calibrated (x, z); True once there"""
+
+    # map and planning -----------------------------------------------------
+    def set_map(self, grid, robot_radius=0.2):
+        from planner import GridPlanner
+        self.occupancy = grid
+        self.planner = GridPlanner(grid, robot_radius=robot_radius)
+        print(f"✓ Map: {grid}")
+
+    def load_map(self, path, robot_radius=0.2, save=True):
+        """Load an occupancy grid (.npz); move_to then plans around obstacles"""
+        from occupancy import OccupancyGrid
+        self.set_map(OccupancyGrid.load(path), robot_radius)
+        if save:
+            self.state_store.update(map={"path": path, "robot_radius": robot_radius})
+
+    def build_map(self, path, traces, resolution=0.1, robot_radius=0.2):
+        """Occupancy grid from recorded drives (free where the robot has been)"""
+        from occupancy import OccupancyGrid
+        grid = OccupancyGrid.from_traces(traces, resolution=resolution, robot_radius=robot_radius)
+        self.load_map(grid.save(path), robot_radius)
+
+    def plan_path(self, x, z):
+        """Waypoints from the current pose to (x, z), or None"""
+        position = self.current_position
+        t0 = time.perf_counter()
+        path = self.planner.plan(position[0], position[2], x, z)
+        print(f"Planned in {(time.perf_counter() - t0) * 1e3:.1f} ms "
+              f"({self.planner.expanded} cells expanded)")
+        return path
+
+    def follow_path(self, points):
+        """Drive through a list of (x, z) waypoints; False at the first failed leg"""
+        for i, (x, z) in enumerate(points):
+            print(f"Waypoint {i + 1}/{len(points)}: ({x:.2f}, {z:.2f})")
+            move = self.navigate_to if self.planner is not None else self.move_to
+            if not move(x, z):
+                return False
+        return True
+
+    def follow_spline(self, points, kind="cubic", verbose=True, max_speed=None):
+        """
+        Drive a smooth spline through (x, z) waypoints without stopping at them,
+        at the speed its curvature allows (path.SplinePath / path_step)
+
+        Args:
+            max_speed: profile speed cap (m/s; default: the max_speed command)
+        """
+        from path import SplinePath, PathParams
+        position = self.current_position
+        start = (position[0], position[2])
+        if math.hypot(points[0][0] - start[0], points[0][1] - start[1]) < 0.1:
+            points = points[1:]
+        track = self.motor_model["track_width"] if self.motor_model is not None else 0.30
+        params = PathParams(speed_scale=self.speed_scale(), track_width=track,
+                            min_speed=0.0 if self.driver.compensated else 0.3)
+        top = params.max_speed * params.speed_scale
+        path = SplinePath([start] + list(points), kind=kind,
+                          max_speed=top if max_speed is None else min(max_speed, top))
+        print(f"Following {path}")
+        return self.engine.run(PurePursuit(path, params), verbose)
+
+    # teleop ---------------------------------------------------------------
+    def start_teleop(self):
+        """
+        Start a hand-driving session: the running move is cancelled and the
+        session holds the move lock until stop_teleop(), so moves from the
+        REPL, the command channel or a fleet are rejected (or, preempting,
+        end the session) instead of fighting teleop for the motors.
+        """
+        from teleop import Teleop
+        self._acquire_move(preempt=True)
+        self.teleop = Teleop(self.motor, observer=self.dead_reckoner.command).start()
+        return self.teleop
+
+    def stop_teleop(self):
+        teleop, self.teleop = self.teleop, None
+        if teleop is None:
+            return None
+        teleop.close()
+        self._move_lock.release()
+        return teleop
+
+    def teleop_keys(self):
+        """Drive from this terminal's keyboard until x (blocks; teleop.KeyboardAxes)"""
+        from teleop import KeyboardAxes
+        teleop = self.start_teleop()
+        self._teleop_keys = KeyboardAxes(teleop.command)
+        try:
+            self._teleop_keys.run()
+        finally:
+            self._teleop_keys = None
+            self.stop_teleop()
+        print(teleop.report())
+
+    def teleop_nt_start(self):
+        """Accept [throttle, steer] on <base>/teleop until teleop_nt_stop()"""
+        from teleop import NTAxes
+        if self.teleop_nt is not None:
+            print("NT teleop already on")
+            return
+        teleop = self.start_teleop()
+        axes = NTAxes(teleop, self.localization.inst, self.nt_base)
+        self.teleop_nt = (teleop, axes)
+        print(f"✓ Teleop on {axes.topic} - 'teleop off' to stop")
+
+    def teleop_nt_stop(self):
+        if self.teleop_nt is None:
+            print("NT teleop is off")
+            return
+        teleop, axes = self.teleop_nt
+        self.teleop_nt = None
+        axes.close()
+        self.stop_teleop()
+        print(teleop.report())
+
+    # teach and repeat ------------------------------------------------------
+    @property
+    def routes(self):
+        """teach.RouteLibrary, opened on first use"""
+        if self._routes is None:
+            from teach import RouteLibrary
+            self._routes = RouteLibrary()
+        return self._routes
+
+    def teach_start(self):
+        """Record the calibrated pose while the robot is driven (teleop or by hand)"""
+        from teach import RouteRecorder
+        if self.route_recorder is not None:
+            print("Already teaching - 'teach stop <name>' first")
+            return
+        self.route_recorder = RouteRecorder(self.localization).start()
+        print("✓ Recording - drive the route, then 'teach stop <name>'")
+
+    def teach_stop(self, name=None, tolerance=0.03):
+        """Stop recording and save the decimated route as name (None discards it)"""
+        if self.route_recorder is None:
+            print("Not teaching")
+            return None
+        samples = self.route_recorder.stop()
+        self.route_recorder = None
+        if name is None:
+            print(f"Discarded {len(samples)} samples")
+            return None
+        try:
+            entry = self.routes.save(name, samples, tolerance)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return None
+        print(f"✓ Route {name}: {entry['length']:.2f} m, {entry['samples']} samples -> "
+              f"{entry['points']} points")
+        return entry
+
+    def repeat_route(self, name, speed=1.0, verbose=False):
+        """Drive a taught route at `speed` times the taught speed (spline through its points)"""
+        route = self.routes.load(name)
+        taught = route.get("speed") or 0.2
+        print(f"Repeating {name} at {speed:g}x the taught {taught:.2f} m/s")
+        return self.follow_spline([tuple(p) for p in route["waypoints"]], "quintic",
+                                  verbose=verbose, max_speed=taught * speed)
+
+    def navigate_to(self, x, z, max_legs=50):
+        """
+        move_to around obstacles: plan, drive to the first waypoint, re-plan
+        from where the robot ended up (incremental, picks up map edits).
+        """
+        for _ in range(max_legs):
+            path = self.plan_path(x, z)
+            if path is None:
+                print("✗ No path to target")
+                return False
+            position = self.current_position
+            wx, wz = path[0]
+            if len(path) > 1 and math.hypot(wx - position[0], wz - position[2]) < 0.2:
+                wx, wz = path[1]
+                path = path[1:]
+            print(f"Waypoint ({wx:.2f}, {wz:.2f}), {len(path) - 1} more")
+            try:
+                if not self.move_to(wx, wz):
+                    return False
+            except MotionFault as e:
+                if e.action != "replan":
+                    raise
+                if e.obstacle is not None:
+                    self.occupancy.set_disc(*e.obstacle, 0.15)
+                    print(f"Blocked ({e.obstacle[0]:.2f}, {e.obstacle[1]:.2f}) - re-planning")
+                self.motion_monitor.reset()
+                continue
+            if len(path) == 1:
+                return True
+        print("✗ Too many re-plans, giving up")
+        return False
+
+    # geofence -------------------------------------------------------------
+    def set_geofence(self, fence, save=True):
+        """Route every motor command through the fence (None removes it)"""
+        from geofence import GeofencedMotor
+        self.fence = fence
+        if fence is None:
+            self.motor = self.driver
+        else:
+            latency = self.latency_model.get("drive", {})
+            # the pose the move loops see, bridged through tracking dropouts, read
+            # without advancing the reckoner (commands come from several threads)
+            self.motor = GeofencedMotor(self.driver, fence, self.dead_reckoner.peek_pose,
+                                        speed_scale=self.speed_scale(),
+                                        latency=latency.get("delay", 0.05) + latency.get("tau", 0.05))
+            print(f"✓ Geofence: {fence}")
+        if self.teleop is not None:
+            self.teleop.set_motor(self.motor)              # a session in progress sees the change
+        if save:
+            self.state_store.update(geofence=fence.to_dict() if fence is not None else None)
+
+    def load_geofence(self, path):
+        from geofence import Geofence
+        self.set_geofence(Geofence.load(path))
+
+    # commands -------------------------------------------------------------
+    def show_status(self):
+        """Show current robot status"""
+        latest_data = self.localization.get_latest_data()
+        print("\n=== Robot Status ===")
+        print(f"Raw Position: {latest_data['position']}")
+        print(f"Calibrated Position: {self.current_position}")
+        print(f"Raw Yaw: {latest_data['euler_angles'][1] if latest_data['euler_angles'] else 'N/A'}")
+        print(f"Calibrated Yaw: {self.current_yaw}")
+        print(f"Is Tracking: {latest_data['is_tracking']}")
+        if self.pose_filter is not None:
+            print(f"Pose filter: {self.pose_filter.stats()}")
+        print(f"Pose source: {self.dead_reckoner.mode} ({self.dead_reckoner.dropouts} dropouts bridged)")
+        if self.motion_monitor is not None:
+            print(f"Motion monitor: {self.motion_monitor}, policy {self.motion_policy}")
+        if self.fence is not None:
+            print(f"Geofence: {self.motor.stats()}")
+        if self.telemetry is not None:
+            print(f"Telemetry: {self.telemetry}")
+        if self.commands is not None:
+            print(f"Remote commands: {self.commands}")
+        print(f"Battery: {latest_data['battery_percent']}%")
+
+    def run_latency_measurement(self, trials=6, mode="turn"):
+        """
+        Measure actuation-to-sensing delay with step and chirp inputs and store it.
+        It drives the motors: run it through run_control, like a move.
+        """
+        from latency import measure_latency, format_result, save_latency, load_latency
+        self.loop_timer.reset()             # no control loop here: don't report the last move's
+        print("⚠ The robot will " + ("spin in place" if mode == "turn" else "drive back and forth"))
+        result = measure_latency(self.motor, self.localization, trials=trials, mode=mode)
+        print(format_result(result))
+        save_latency(result)
+        self.latency_model = load_latency()
+        self.state_store.update(latency=self.latency_model)
+        self.dead_reckoner = self.build_dead_reckoner()
+        if self.fence is not None:
+            self.set_geofence(self.fence, save=False)      # new latency and pose source
+        print("✓ Latency saved")
+
+    def start_log(self, path):
+        """Record motor commands and poses for system identification"""
+        from sysid import CommandLogger
+        if self.command_logger is not None:
+            print("Already logging - 'log stop' first")
+            return
+        if self.driver.compensated:
+            self.driver.set_compensation(None)  # identify the raw motors, not the compensated ones
+            print("Compensation disabled while logging")
+        # on the driver: the duties it really gets, after the geofence (which may be swapped)
+        self.command_logger = CommandLogger(self.localization, path).attach(self.driver)
+        print(f"✓ Logging commands and poses to {path} - drive around, then 'log stop'")
+
+    def stop_log(self):
+        if self.command_logger is None:
+            print("Not logging")
+            return
+        rows = self.command_logger.detach()
+        print(f"✓ Wrote {rows} rows to {self.command_logger.path}")
+        self.command_logger = None
+        if self.motor_model is not None and not self.driver.compensated:
+            self.driver.set_compensation(self.motor_model["compensation"])
+
+    def run_sysid(self, path, track_width=0.30):
+        """Fit the motor model from a log and install its compensation table"""
+        from sysid import identify, format_model, save_model
+        delay = self.latency_model.get("turn", {}).get("delay", 0.0)
+        try:
+            model = identify(path, track_width=track_width, delay=delay)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return
+        print(format_model(model))
+        save_model(model)
+        self.state_store.update(motor_model=model)
+        self.motor_model = model
+        self.driver.set_compensation(model["compensation"])
+        self.dead_reckoner = self.build_dead_reckoner()
+        if self.fence is not None:
+            self.set_geofence(self.fence, save=False)      # new speed scale and pose source
+        self.mpc = None                                    # rebuilt on the next MPC move
+        self.apply_motor_model()
+        print("✓ Motor model saved and compensation enabled")
+
+    def show_realtime(self):
+        """Show real-time settings and the timing of the last move"""
+        if self.rt_thread is None:
+            print("Real-time mode: off (start with --realtime)")
+        else:
+            self.rt_thread.print_status()
+        print(self.loop_timer.report())
+
+    def print_help(self):
+        """Print available commands"""
+        print("\nAvailable commands:")
+        print("  calibrate           - Set current position to (0,0,0) and yaw to 0")
+        print("  mount <x> <z> [yaw] - Headset offset from the robot base (m, deg; +z forward)")
+        print("  move_to <x> <z>     - Move to relative x,z position (around obstacles if a map is loaded)")
+        print("  move_to_pose <x> <z> <yaw>       - Move to x,z and arrive facing yaw (deg)")
+        print("  plan <x> <z>        - Show the planned waypoints to x,z")
+        print("  teleop [keys|nt|off]             - Drive by hand (keyboard here, or <base>/teleop over NT)")
+        print("  teach start | teach stop [<name> [tolerance]]  - Record a driven route")
+        print("  routes [delete <name>]           - List (or delete) taught routes")
+        print("  repeat <name> [speed]            - Drive a taught route (speed x taught speed)")
+        print("  spline [cubic|quintic] <x1> <z1> [<x2> <z2> ...] - Drive a smooth path through the points")
+        print("  map [load <file> | build <file> <trace.csv>... | save <file> | off]")
+        print("  map block|clear <x> <z> <r>      - Mark a disc occupied / free")
+        print("  fence [load <file.json> | off]   - Keep-in / keep-out polygons for every command")
+        print("  status              - Show current position and tracking status")
+        print("  measure_latency [n] [turn|drive] - Measure actuation-to-pose delay and motor lag")
+        print("  log start [file] | log stop       - Record commands and poses for sysid")
+        print("  sysid <file> [track_width]        - Fit the motor model and enable compensation")
+        print("  realtime            - Show real-time thread settings and last loop timing")
+        print("  profile [reset]     - Show (or clear) per-stage timing histograms")
+        print("  controller [default|mpc]         - Control law used by move_to")
+        print("  monitor [on|off | stall|slip abort|back_off|replan|warn] - Stall / slip detection")
+        print("  help                - Show this help message")
+        print("  quit                - Exit the program")
+
+    def handle_command(self, cmd, parts):
+        """
+        Run one REPL command; subclasses extend this for their own commands.
+
+        Returns:
+            bool: False for an unknown command
+        """
+        if cmd == "help":
+            self.print_help()
+        elif cmd == "calibrate":
+            self.calibrate()
+        elif cmd == "mount":
+            try:
+                self.set_mount(*(float(v) for v in parts[1:4]))
+            except (TypeError, ValueError):
+                print("Usage: mount <x> <z> [yaw]")
+        elif cmd == "status":
+            self.show_status()
+        elif cmd == "measure_latency":
+            try:
+                trials = int(parts[1]) if len(parts) > 1 else 6
+                mode = parts[2] if len(parts) > 2 else "turn"
+                if trials < 1 or mode not in ("turn", "drive"):
+                    raise ValueError
+            except ValueError:
+                print("Usage: measure_latency [trials] [turn|drive]")
+            else:
+                self.run_control(self.run_latency_measurement, trials, mode)
+        elif cmd == "log":
+            if len(parts) >= 2 and parts[1] == "start":
+                self.start_log(parts[2] if len(parts) > 2 else "drive_log.csv")
+            elif len(parts) == 2 and parts[1] == "stop":
+                self.stop_log()
+            else:
+                print("Usage: log start [file] | log stop")
+        elif cmd == "sysid":
+            if len(parts) < 2:
+                print("Usage: sysid <file> [track_width]")
+            else:
+                self.run_sysid(parts[1], float(parts[2]) if len(parts) > 2 else 0.30)
+        elif cmd == "realtime":
+            self.show_realtime()
+        elif cmd == "profile":
+            if self.profiler is None:
+                print("Profiling is off (start with --profile)")
+            elif len(parts) > 1 and parts[1] == "reset":
+                self.profiler.reset()
+                print("✓ Profile cleared")
+            else:
+                self.profiler.dump()
+        elif cmd == "move_to":
+            if len(parts) != 3:
+                print("Usage: move_to <x> <z>")
+                print("Example: move_to 1.5 -2.0")
+            else:
+                try:
+                    x = float(parts[1])
+                    z = float(parts[2])
+                    if self.planner is not None:
+                        self.run_control(self.navigate_to, x, z)
+                    else:
+                        self.run_control(self.move_to, x, z)
+                except ValueError:
+                    print("Error: x and z must be numbers")
+        elif cmd == "move_to_pose":
+            try:
+                x, z, theta = (float(v) for v in parts[1:])
+            except ValueError:
+                print("Usage: move_to_pose <x> <z> <yaw>")
+                print("Example: move_to_pose 1.5 -2.0 90")
+            else:
+                self.run_control(self.move_to_pose, x, z, theta)
+        elif cmd == "spline":
+            kind = parts.pop(1) if len(parts) > 1 and parts[1] in ("cubic", "quintic") else "cubic"
+            try:
+                values = [float(v) for v in parts[1:]]
+                if not values or len(values) % 2:
+                    raise ValueError
+            except ValueError:
+                print("Usage: spline [cubic|quintic] <x1> <z1> [<x2> <z2> ...]")
+            else:
+                self.run_control(self.follow_spline, list(zip(values[::2], values[1::2])), kind)
+        elif cmd == "teleop":
+            mode = parts[1] if len(parts) > 1 else "keys"
+            if mode == "keys":
+                self.teleop_keys()
+            elif mode == "nt":
+                self.teleop_nt_start()
+            elif mode == "off":
+                self.teleop_nt_stop()
+            else:
+                print("Usage: teleop [keys|nt|off]")
+        elif cmd == "teach":
+            if parts[1:2] == ["start"]:
+                self.teach_start()
+            elif parts[1:2] == ["stop"] and len(parts) <= 4:
+                try:
+                    self.teach_stop(*parts[2:3], *(float(v) for v in parts[3:4]))
+                except ValueError:
+                    print("Usage: teach stop [<name> [tolerance]]")
+            else:
+                print("Usage: teach start | teach stop [<name> [tolerance]]")
+        elif cmd == "routes":
+            if len(parts) == 3 and parts[1] == "delete":
+                self.routes.delete(parts[2])
+                print(f"✓ Deleted {parts[2]}")
+            else:
+                self.routes.show()
+        elif cmd == "repeat":
+            try:
+                speed = float(parts[2]) if len(parts) > 2 else 1.0
+                self.run_control(self.repeat_route, parts[1], speed)
+            except (IndexError, ValueError):
+                print("Usage: repeat <name> [speed]")
+            except KeyError as e:
+                print(f"✗ {e.args[0]}")
+        elif cmd == "plan":
+            if self.planner is None:
+                print("No map loaded ('map load <file>')")
+            else:
+                try:
+                    path = self.plan_path(float(parts[1]), float(parts[2]))
+                    print("✗ No path" if path is None else
+                          "Waypoints: " + ", ".join(f"({x:.2f}, {z:.2f})" for x, z in path))
+                except (IndexError, ValueError):
+                    print("Usage: plan <x> <z>")
+        elif cmd == "map":
+            self.handle_map_command(parts[1:])
+        elif cmd == "controller":
+            if len(parts) == 1:
+                print(f"Controller: {self.controller}")
+            elif parts[1] in ("default", "mpc"):
+                self.controller = parts[1]
+                print(f"✓ move_to uses the {parts[1]} controller")
+            else:
+                print("Usage: controller [default|mpc]")
+        elif cmd == "monitor":
+            if len(parts) == 1:
+                print(f"Motion monitor: {self.motion_monitor or 'off'}, policy {self.motion_policy}")
+            elif parts[1:] == ["on"]:
+                self.motion_monitor = self.motion_monitor or MotionMonitor()
+                print("✓ Stall / slip detection on")
+            elif parts[1:] == ["off"]:
+                self.motion_monitor = None
+                print("✓ Stall / slip detection off")
+            else:
+                try:
+                    self.set_motion_policy(*parts[1:])
+                    print(f"✓ On {parts[1]}: {parts[2]}")
+                except (TypeError, ValueError):
+                    print("Usage: monitor [on|off | stall|slip abort|back_off|replan|warn]")
+        elif cmd == "fence":
+            if len(parts) == 1:
+                print(f"Geofence: {self.fence}, {self.motor.stats()}" if self.fence is not None
+                      else "No geofence")
+            elif parts[1] == "load" and len(parts) == 3:
+                self.load_geofence(parts[2])
+            elif parts[1] == "off":
+                self.set_geofence(None)
+                print("✓ Geofence removed")
+            else:
+                print("Usage: fence [load <file.json> | off]")
+        else:
+            return False
+        return True
+
+    def handle_map_command(self, args):
+        sub = args[0] if args else ""
+        try:
+            if sub == "":
+                print(f"Map: {self.occupancy}" if self.occupancy is not None else "No map loaded")
+            elif sub == "load":
+                self.load_map(args[1])
+            elif sub == "build":
+                if len(args) < 3:
+                    raise ValueError
+                self.build_map(args[1], args[2:])
+            elif sub == "save":
+                print(f"✓ Map saved to {self.occupancy.save(args[1])}")
+            elif sub in ("block", "clear"):
+                x, z, r = (float(v) for v in args[1:4])
+                self.occupancy.set_disc(x, z, r, value=1 if sub == "block" else 0)
+                print(f"✓ {'Blocked' if sub == 'block' else 'Cleared'} r={r} m at ({x}, {z})")
+            elif sub == "off":
+                self.occupancy = self.planner = None
+                self.state_store.update(map=None)
+                print("✓ Map disabled - move_to drives straight")
+            else:
+                raise ValueError
+        except (IndexError, ValueError):
+            print("Usage: map [load <file> | build <file> <trace.csv>... | save <file> | off]")
+            print("       map block|clear <x> <z> <r>")
+        except AttributeError:
+            print("No map loaded ('map load <file>')")
+
+    def command_loop(self):
+        """Main command loop for user interaction"""
+        print("🤖 Robot Path Following System")
+        print("Type 'help' for available commands")
+
+        while True:
+            try:
+                command = input("\nrobot> ").strip().lower()
+
+                if not command:
+                    continue
+
+                parts = command.split()
+                cmd = parts[0]
+
+                if cmd == "quit" or cmd == "exit":
+                    print("Goodbye!")
+                    break
+                if not self.handle_command(cmd, parts):
+                    print(f"Unknown command: {cmd}")
+                    print("Type 'help' for available commands")
+
+            except KeyboardInterrupt:
+                print("\nGoodbye!")
+                break
+            except Exception as e:
+                print(f"Error: {e}")
+
+    def close(self):
+        """Save the last pose, stop logging and the RT thread, release the motors"""
+        self.save_last_pose()
+        if self.commands is not None:
+            self.commands.close()
+            self.commands = None
+        if self.command_logger is not None:
+            self.stop_log()
+        if self.route_recorder is not None:
+            self.route_recorder.stop()
+        if self.teleop_nt is not None:
+            self.teleop_nt_stop()
+        if self.rt_thread is not None:
+            self.rt_thread.close()
+            self.rt_thread = None
+        self.motor.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+        close_localization = getattr(self.localization, "close", None)
+        if close_localization is not None:
+            close_localization()
+
+
+def create_runtime(runtime_cls, *, motor=None, localization=None,
+                   state_path=STATE_FILE, profile=False, pose_filter=None,
+                   nt_instance=None, nt4_port=5810, nt3_port=1735,
+                   server=None, name=None, left_pin=18, right_pin=19, pigpio_host=None,
+                   telemetry_hz=20.0, commands=True):
+    """
+    Build a runtime, creating the motor driver and the localization server
+    unless they are injected. This is where pigpio / ntcore get imported.
+
+    Args:
+        runtime_cls: Runtime subclass providing the controller (controlloop.Robot, ...)
+        motor / localization: prebuilt objects (simulators, shared servers)
+        state_path: persisted calibration / motor model / latency / last pose
+        profile: time each hot-path stage (profiling.Profiler)
+        pose_filter: jump filter for a newly created Localization (default: PoseFilter())
+        nt_instance: NetworkTableInstance for the server (default: the process default;
+            pass NetworkTableInstance.create() to run a second server in-process)
+        server, name: join a Localization.LocalizationServer as robot `name`
+            (topics under /<name>/questnav) instead of starting a server
+        left_pin, right_pin, pigpio_host: motor driver GPIOs and pigpiod host
+        telemetry_hz: controller state published on the localization's NT instance
+            (under /robot, or /<name>/robot); 0 = none
+        commands: accept move_to / stop / ... requests on the same instance (commands.py)
+    """
+    state_store = StateStore(state_path)
+    profiler = Profiler() if profile else None
+    telemetry = None
+    base = f"/{name}/robot" if name else "/robot"
+    created_localization = localization is None
+
+    if localization is None:
+        from Localization import Localization
+        if pose_filter is None:
+            pose_filter = PoseFilter()
+        saved_calibration = state_store.get("calibration")
+        calibration = Calibration.from_dict(saved_calibration) if saved_calibration else None
+        if server is not None:
+            localization = server.add_robot(name, profiler=profiler, pose_filter=pose_filter,
+                                            calibration=calibration)
+        else:
+            localization = Localization(
+                None, nt4_port=nt4_port, nt3_port=nt3_port, profiler=profiler,
+                pose_filter=pose_filter, instance=nt_instance, calibration=calibration)
+        if telemetry_hz:
+            from telemetry import Telemetry
+            telemetry = Telemetry(localization.inst, base, rate_hz=telemetry_hz)
+    if motor is None:
+        from mdds30na import MDDS30AntiPhase
+        motor = MDDS30AntiPhase(left_pin, right_pin, host=pigpio_host)
+
+    rt = runtime_cls(motor, localization, state_store, profiler=profiler,
+                     pose_filter=pose_filter, telemetry=telemetry)
+    rt.nt_base = base
+    if commands and created_localization:
+        from commands import CommandChannel
+        rt.commands = CommandChannel(rt, localization.inst, base)
+    return rt
+
+
+def main(runtime_cls, description="Robot path following REPL"):
+    """Command-line entry point shared by the controller scripts"""
+    import argparse
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--realtime", action="store_true",
+                        help="run moves on a pinned SCHED_FIFO thread with GC frozen")
+    parser.add_argument("--cpu", type=int, default=None,
+                        help="core for the control thread (default: isolated or last core)")
+    parser.add_argument("--priority", type=int, default=50,
+                        help="SCHED_FIFO priority for the control thread")
+    parser.add_argument("--wait", type=float, default=10.0,
+                        help="seconds to wait for the first tracked pose")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each pipeline stage and dump histograms on exit")
+    parser.add_argument("--state", default=STATE_FILE,
+                        help="state file (calibration, motor model, latency, last pose)")
+    parser.add_argument("--telemetry-hz", type=float, default=20.0,
+                        help="controller state published to NetworkTables (0 = off)")
+    parser.add_argument("--no-commands", action="store_true",
+                        help="don't accept remote commands over NetworkTables")
+    args = parser.parse_args()
+
+    rt = create_runtime(runtime_cls, state_path=args.state, profile=args.profile,
+                        telemetry_hz=args.telemetry_hz, commands=not args.no_commands)
+    if rt.profiler is not None:
+        atexit.register(rt.profiler.dump)
+    try:
+        rt.wait_until_ready(args.wait)
+        if args.realtime:
+            rt.rt_thread = RealtimeThread(cpu="auto" if args.cpu is None else args.cpu,
+                                          priority=args.priority).start()
+        rt.command_loop()
+    finally:
+        rt.close()
+    return rt
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Persistent robot state for fast startup
+———————————————————————————————————————————————
+One small JSON file (robot_state.json) with independent sections:
+  calibration   Calibration.to_dict() - origin and headset mounting
+  motor_model   sysid.py result (feedforward table included)
+  latency       latency.py results keyed by mode
+  last_pose     last calibrated pose {x, z, yaw, t} seen before shutdown
+Every update rewrites the file atomically (temp file, fsync, rename), so a
+crash or power cut leaves either the old or the new state - never half.
+"""
+
+import json
+import os
+import threading
+
+STATE_FILE = "robot_state.json"
+
+
+class StateStore:
+    """Load once, update sections, write atomically"""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, section, default=None):
+        return self.data.get(section, default)
+
+    def update(self, **sections):
+        """Replace the given sections and write the file"""
+        with self._lock:
+            self._write({**self.data, **sections})
+
+    def remove(self, *sections):
+        """Drop the given sections (missing ones are ignored) and write the file"""
+        with self._lock:
+            self._write({k: v for k, v in self.data.items() if k not in sections})
+
+    def _write(self, data):
+        """
+        Atomic rewrite with data, which becomes self.data only once it is on
+        disk (caller holds the lock); on any failure both stay as they were
+        and no temp file is left behind
+        """
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.data = data
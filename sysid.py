@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Motor system identification from command / pose logs
+———————————————————————————————————————————————
+1. Record:  CommandLogger writes t, left, right, x, z, yaw rows (CSV) while
+            the robot drives - every MDDS30AntiPhase.set() is captured, and a
+            row is written for every new QuestNav frame.
+2. Fit:     python sysid.py drive_log.csv [--track-width 0.30]
+            Per wheel (driver channel), resampled to a uniform grid:
+                w[k+1] = a·w[k] + (1-a)·f(u[k-d])
+                f(u) = g⁺·(u - db⁺) for u > db⁺,  g⁻·(u + db⁻) for u < -db⁻,  else 0
+            solved by vectorized least squares (iterated so samples inside
+            the deadband count as zero drive). tau = -dt / ln(a).
+3. Output:  motor_model.json with the fitted parameters and a feedforward
+            table MDDS30AntiPhase.set_compensation() applies, mapping a
+            desired normalized speed to the duty that produces it - both
+            wheels matched, deadband and asymmetry removed.
+Requires numpy.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from controlstate import PoseSnapshot
+
+MOTOR_MODEL_FILE = "motor_model.json"
+LOG_HEADER = "t,left,right,x,z,yaw"
+
+
+class CommandLogger:
+    """Records every motor command and every new pose frame to a CSV file"""
+
+    def __init__(self, localization, path, rate_hz=500):
+        self.localization = localization
+        self.path = path
+        self.period = 1.0 / rate_hz
+        self.left = 0.0
+        self.right = 0.0
+        self.rows = 0
+        self._motor = None
+        self._running = False
+        self._thread = None
+
+    def attach(self, motor):
+        """Start logging and capture motor.set() calls on this driver instance"""
+        original_set = motor.set
+
+        def logged_set(left, right):
+            self.left, self.right = left, right
+            original_set(left, right)
+
+        motor.set = logged_set
+        self._motor = motor
+        self._file = open(self.path, "w")
+        self._file.write(LOG_HEADER + "\n")
+        self._t0 = time.perf_counter()
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        snap = PoseSnapshot()
+        last = None
+        while self._running:
+            if self.localization.read_pose(snap):
+                pose = (snap.x, snap.z, snap.yaw)
+                if pose != last:
+                    t = time.perf_counter() - self._t0
+                    self._file.write(f"{t:.5f},{self.left:.4f},{self.right:.4f},"
+                                     f"{snap.x:.5f},{snap.z:.5f},{snap.yaw:.6f}\n")
+                    self.rows += 1
+                    last = pose
+            time.sleep(self.period)
+
+    def detach(self):
+        """Stop logging and restore the driver's own set()"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self._motor is not None:
+            del self._motor.set          # drop the instance override
+            self._motor = None
+        self._file.close()
+        return self.rows
+
+
+def load_log(path):
+    """Returns t, left, right, x, z, yaw arrays"""
+    data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    return tuple(data[:, i] for i in range(6))
+
+
+def wheel_speeds(t, x, z, yaw, track_width, dt):
+    """
+    Resample the pose log on a uniform grid and derive per-wheel ground
+    speeds. Positive yaw rate means the left driver channel runs faster.
+    """
+    grid = np.arange(t[0], t[-1], dt)
+    yaw = np.unwrap(yaw)
+    xs, zs, yaws = (np.interp(grid, t, s) for s in (x, z, yaw))
+    vx, vz, w = np.gradient(xs, dt), np.gradient(zs, dt), np.gradient(yaws, dt)
+    v = vx * np.sin(yaws) + vz * np.cos(yaws)        # forward speed (yaw 0 faces +z)
+    half = 0.5 * track_width
+    return grid, v + w * half, v - w * half
+
+
+def fit_wheel(u, w, dt, iterations=4):
+    """
+    Fit the deadband / asymmetric gain / first-order lag model for one wheel.
+    u: commands aligned with w (already delay-shifted), w: wheel speed (m/s)
+
+    Raises:
+        ValueError: a direction's gain isn't positive (never driven that way
+            in the log, or the wheel didn't respond)
+    """
+    db_pos = db_neg = 0.0
+    for _ in range(iterations):
+        pos = u > db_pos
+        neg = u < -db_neg
+        features = np.column_stack([
+            w[:-1],
+            np.where(pos, u, 0.0)[:-1], pos[:-1].astype(float),
+            np.where(neg, u, 0.0)[:-1], neg[:-1].astype(float),
+        ])
+        coef, *_ = np.linalg.lstsq(features, w[1:], rcond=None)
+        a, c1, c2, c3, c4 = coef
+        a = min(max(a, 1e-6), 1.0 - 1e-6)
+        db_pos = min(max(-c2 / c1, 0.0), 0.9) if c1 > 0 else 0.0
+        db_neg = min(max(c4 / c3, 0.0), 0.9) if c3 > 0 else 0.0
+
+    residual = w[1:] - features @ coef
+    gain_fwd, gain_rev = c1 / (1.0 - a), c3 / (1.0 - a)
+    if not (gain_fwd > 0.0 and gain_rev > 0.0):
+        raise ValueError(f"bad wheel gain (forward {gain_fwd:.3f}, reverse {gain_rev:.3f} m/s) "
+                         "- log driving both forward and in reverse")
+    return {
+        "gain_fwd": float(gain_fwd),             # m/s per unit command above the deadband
+        "gain_rev": float(gain_rev),
+        "deadband_fwd": float(db_pos),
+        "deadband_rev": float(db_neg),
+        "tau": float(-dt / math.log(a)),
+        "rms": float(np.sqrt(np.mean(residual ** 2))),
+    }
+
+
+def compensation_table(models, points=11):
+    """
+    Feedforward tables: normalized command c ∈ [-1, 1] → duty, such that both
+    wheels produce c · v_max with v_max the slowest wheel/direction's top speed.
+
+    Raises:
+        ValueError: a gain isn't positive (the table would divide by it)
+    """
+    for wheel, m in models.items():
+        if not (m["gain_fwd"] > 0.0 and m["gain_rev"] > 0.0):
+            raise ValueError(f"bad {wheel} wheel gain {m['gain_fwd']} / {m['gain_rev']}")
+    v_max = min(min(m["gain_fwd"] * (1.0 - m["deadband_fwd"]),
+                    m["gain_rev"] * (1.0 - m["deadband_rev"])) for m in models.values())
+    half = np.linspace(0.0, 1.0, points)[1:]
+    table = {}
+    for wheel, m in models.items():
+        fwd = m["deadband_fwd"] + half * v_max / m["gain_fwd"]
+        rev = -(m["deadband_rev"] + half * v_max / m["gain_rev"])
+        # a tiny ramp around zero keeps stop() at exactly 0 duty
+        command = np.concatenate([-half[::-1], [-1e-3, 0.0, 1e-3], half])
+        duty = np.concatenate([rev[::-1], [-m["deadband_rev"], 0.0, m["deadband_fwd"]], fwd])
+        table[wheel] = {"command": np.round(command, 6).tolist(),
+                        "duty": np.round(np.clip(duty, -1.0, 1.0), 6).tolist()}
+    return table, float(v_max)
+
+
+def identify(path, track_width=0.30, dt=0.02, delay=0.0):
+    """Fit both wheels from a CommandLogger CSV; returns the motor model dict"""
+    t, left, right, x, z, yaw = load_log(path)
+    grid, w_left, w_right = wheel_speeds(t, x, z, yaw, track_width, dt)
+
+    # command in force at each grid time, shifted by the actuation delay
+    idx = np.clip(np.searchsorted(t, grid - delay, side="right") - 1, 0, None)
+    models = {
+        "left": fit_wheel(left[idx], w_left, dt),
+        "right": fit_wheel(right[idx], w_right, dt),
+    }
+    table, v_max = compensation_table(models)
+    return {
+        "wheels": models,
+        "track_width": track_width,
+        "delay": delay,
+        "v_max": v_max,
+        "compensation": table,
+        "source": os.path.basename(path),
+        "fitted_at": time.time(),
+    }
+
+
+def format_model(model):
+    lines = []
+    for wheel, m in model["wheels"].items():
+        lines.append(f"{wheel:>5}: deadband +{m['deadband_fwd']:.3f} / -{m['deadband_rev']:.3f}, "
+                     f"gain {m['gain_fwd']:.3f} / {m['gain_rev']:.3f} m/s, "
+                     f"tau {m['tau'] * 1e3:.0f} ms, rms {m['rms']:.3f}")
+    lines.append(f"Matched top speed: {model['v_max']:.3f} m/s")
+    return "\n".join(lines)
+
+
+def save_model(model, path=MOTOR_MODEL_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(model, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_model(path=MOTOR_MODEL_FILE):
+    """The stored motor model, or None"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    from latency import load_latency
+
+    parser = argparse.ArgumentParser(description="Fit the motor model from a drive log")
+    parser.add_argument("log", help="CSV written by CommandLogger (REPL: log start)")
+    parser.add_argument("--track-width", type=float, default=0.30, help="wheel separation (m)")
+    parser.add_argument("--dt", type=float, default=0.02, help="resampling period (s)")
+    parser.add_argument("--delay", type=float, default=None,
+                        help="actuation delay (s); default: measured value from latency.json")
+    parser.add_argument("-o", "--output", default=MOTOR_MODEL_FILE)
+    args = parser.parse_args()
+
+    delay = args.delay
+    if delay is None:
+        delay = load_latency().get("turn", {}).get("delay", 0.0)
+
+    try:
+        model = identify(args.log, track_width=args.track_width, dt=args.dt, delay=delay)
+    except ValueError as e:
+        parser.exit(1, f"✗ {e}\n")
+    print(format_model(model))
+    save_model(model, args.output)
+    print(f"✓ Saved to {args.output}")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Teach and repeat
+———————————————————————————————————————————————
+- RouteRecorder samples the calibrated pose stream (read_pose, like
+  sysid.CommandLogger) on a background thread while the robot is driven by
+  teleop or pushed by hand, keeping a sample every min_step metres
+- douglas_peucker() decimates the trace to the few points that keep it
+  within a tolerance - a 30 s drive of ~1500 samples becomes a dozen
+  waypoints
+- RouteLibrary stores routes as <dir>/<name>.json, with <dir>/index.json
+  listing name, length, point count, taught speed and date, so routes can
+  be listed without opening every file (both written atomically)
+- Runtime.repeat_route() drives a route back through path.SplinePath /
+  path_step at the taught speed times a multiplier
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from controlstate import PoseSnapshot
+from statefile import StateStore
+
+ROUTES_DIR = "routes"
+
+
+def douglas_peucker(points, tolerance):
+    """
+    Indices of the points to keep so that no dropped point is further than
+    tolerance from the polyline through the kept ones (iterative, no recursion).
+
+    Args:
+        points: (n, 2) array-like of (x, z)
+        tolerance: maximum perpendicular deviation (m)
+    """
+    pts = np.asarray(points, dtype=float)
+    n = len(pts)
+    if n < 3:
+        return list(range(n))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = pts[first], pts[last]
+        inner = pts[first + 1:last]
+        ab = b - a
+        length = math.hypot(ab[0], ab[1])
+        if length < 1e-9:                   # closed loop: distance to the point
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(ab[0] * (inner[:, 1] - a[1]) - ab[1] * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep).tolist()
+
+
+class RouteRecorder:
+    """Samples the calibrated pose on a background thread while the robot is driven"""
+
+    def __init__(self, localization, min_step=0.02, rate_hz=50):
+        """
+        Args:
+            localization: anything with read_pose(snapshot) (Localization, DeadReckoner)
+            min_step: distance between kept samples (m)
+            rate_hz: polling rate
+        """
+        self.localization = localization
+        self.min_step = min_step
+        self.period = 1.0 / rate_hz
+        self.samples = []               # (t, x, z, yaw)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self.samples = []
+        self._t0 = time.perf_counter()
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, name="teach", daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        snap = PoseSnapshot()
+        last_x = last_z = None
+        while self._running:
+            if self.localization.read_pose(snap) and snap.is_tracking:
+                if last_x is None or math.hypot(snap.x - last_x, snap.z - last_z) >= self.min_step:
+                    self.samples.append((time.perf_counter() - self._t0, snap.x, snap.z, snap.yaw))
+                    last_x, last_z = snap.x, snap.z
+            time.sleep(self.period)
+
+    def stop(self):
+        """Stop sampling; returns the samples"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        return self.samples
+
+    def __repr__(self):
+        return f"RouteRecorder({len(self.samples)} samples, {'recording' if self._running else 'stopped'})"
+
+
+class RouteLibrary:
+    """Named routes on disk with an index file"""
+
+    def __init__(self, directory=ROUTES_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index = StateStore(os.path.join(directory, "index.json"))
+
+    def _path(self, name):
+        if not name or os.sep in name or "/" in name or name.startswith(".") or name == "index":
+            raise ValueError(f"bad route name {name!r}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def save(self, name, samples, tolerance=0.03):
+        """
+        Decimate recorded samples and store them as route `name`.
+
+        Args:
+            samples: RouteRecorder samples [(t, x, z, yaw), ...]
+            tolerance: Douglas-Peucker tolerance (m)
+
+        Returns:
+            the index entry
+        """
+        if len(samples) < 2:
+            raise ValueError("route needs at least two samples - drive further")
+        data = np.asarray(samples, dtype=float)
+        keep = douglas_peucker(data[:, 1:3], tolerance)
+        points = data[keep, 1:3].round(4).tolist()
+        steps = np.hypot(*np.diff(data[:, 1:3], axis=0).T)
+        length = float(np.sum(steps))
+        # taught speed between the first and last samples taken on the move: the
+        # recording starts (and may end) standing still, which isn't driving time
+        moving = np.flatnonzero(steps > 1e-6) + 1
+        speed = None
+        if len(moving) > 1:
+            first, last = moving[0], moving[-1]
+            duration = float(data[last, 0] - data[first, 0])
+            if duration > 0:
+                speed = round(float(np.sum(steps[first:last])) / duration, 3)
+        entry = {
+            "points": len(points), "samples": len(samples), "length": round(length, 3),
+            "speed": speed,
+            "tolerance": tolerance, "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        route = dict(entry, name=name, waypoints=points,
+                     start_yaw=float(data[0, 3]), end_yaw=float(data[-1, 3]))
+        path = self._path(name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(route, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self.index.update(**{name: entry})
+        return entry
+
+    def load(self, name):
+        """The stored route dict (waypoints, speed, ...)"""
+        if name not in self.index.data:
+            raise KeyError(f"no route {name!r}")
+        with open(self._path(name)) as f:
+            return json.load(f)
+
+    def delete(self, name):
+        path = self._path(name)
+        self.index.remove(name)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def names(self):
+        return sorted(self.index.data)
+
+    def show(self):
+        if not self.index.data:
+            print("No routes (teach start / teach stop <name>)")
+        for name in self.names():
+            e = self.index.data[name]
+            speed = f"{e['speed']:.2f} m/s" if e.get("speed") else "?"
+            print(f"  {name:<16} {e['length']:6.2f} m  {e['points']:3d} points "
+                  f"(from {e['samples']})  taught at {speed}  {e['created']}")
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    import tempfile
+
+    # a wobbly S-curve as recorded at 2 cm spacing
+    s = np.arange(0.0, 6.0, 0.02)
+    rng = np.random.default_rng(1)
+    trace = [(0.05 * i, math.sin(v) + rng.normal(0, 0.005), v, 0.0) for i, v in enumerate(s)]
+
+    t0 = time.perf_counter()
+    keep = douglas_peucker([(x, z) for _, x, z, _ in trace], 0.03)
+    print(f"Douglas-Peucker: {len(trace)} -> {len(keep)} points in "
+          f"{(time.perf_counter() - t0) * 1e3:.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        library = RouteLibrary(directory)
+        library.save("s_curve", trace)
+        library.show()
+        route = RouteLibrary(directory).load("s_curve")
+        print(f"✓ Reloaded {route['name']}: {route['points']} waypoints, "
+              f"{route['length']:.2f} m at {route['speed']:.2f} m/s")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Controller state published back to NetworkTables
+———————————————————————————————————————————————
+- one DoubleArray topic <base>/state holding every field in FIELDS, so a
+  dashboard gets a consistent snapshot in a single message instead of one
+  put (and one network update) per value
+- <base>/fields: the field names, published once, for labelling
+- rate-limited: publish() is called every control cycle but only packs,
+  sets and flushes once per interval; the other calls cost one clock read
+- the value buffer is preallocated and filled in place
+
+Served by the Localization server's NT instance, so dashboards that already
+connect for QuestNav see it without another server.
+"""
+
+import math
+import time
+
+FIELDS = ("target_x", "target_z", "x", "z", "yaw_deg", "distance", "angle_error_deg",
+          "left", "right", "loop_period_ms", "reversing")
+
+
+class Telemetry:
+    """Rate-limited packed controller-state publisher"""
+
+    def __init__(self, instance, base="/robot", rate_hz=20.0):
+        """
+        Args:
+            instance: NetworkTableInstance to publish on (Localization.inst)
+            base: topic prefix (one per robot in a fleet: /<name>/robot)
+            rate_hz: maximum publish rate
+        """
+        self.inst = instance
+        self.base = base
+        self.interval = 1.0 / rate_hz
+        self.published = 0
+        self._next = 0.0
+        self._values = [0.0] * len(FIELDS)
+        self._fields = instance.getStringArrayTopic(f"{base}/fields").publish()
+        self._fields.set(list(FIELDS))
+        self._state = instance.getDoubleArrayTopic(f"{base}/state").publish()
+
+    def publish(self, state, period, force=False):
+        """
+        Publish a controlstate.ControlState if the interval has passed.
+
+        Args:
+            state: ControlState of the running move
+            period: last loop period (s)
+            force: publish regardless of the rate limit (end of a move)
+        """
+        now = time.perf_counter()
+        if now < self._next and not force:
+            return False
+        self._next = now + self.interval
+        v = self._values
+        v[0] = state.target_x
+        v[1] = state.target_z
+        v[2] = state.x
+        v[3] = state.z
+        v[4] = math.degrees(state.yaw)
+        v[5] = state.distance
+        v[6] = math.degrees(state.angle_error)
+        v[7] = state.left
+        v[8] = state.right
+        v[9] = period * 1e3
+        v[10] = 1.0 if state.reversing else 0.0
+        self._state.set(v)
+        self.inst.flush()
+        self.published += 1
+        return True
+
+    def close(self):
+        self._state.close()
+        self._fields.close()
+
+    def __repr__(self):
+        return (f"Telemetry({self.base}/state, {1.0 / self.interval:.0f} Hz max, "
+                f"{self.published} published)")
+
+
+# quick demo --------------------------------------------------------------
+if __name__ == "__main__":
+    from ntcore import NetworkTableInstance
+    from controlstate import ControlState
+
+    inst = NetworkTableInstance.create()
+    inst.startServer(persist_filename="", port3=0, port4=5899)
+    telemetry = Telemetry(inst, rate_hz=50.0)
+    sub = inst.getDoubleArrayTopic("/robot/state").subscribe([])
+    state = ControlState()
+    state.reset(1.0, 2.0)
+
+    n = 100_000
+    t0 = time.perf_counter()
+    for i in range(n):
+        state.left = state.right = i * 1e-6
+        telemetry.publish(state, 0.01)
+    elapsed = time.perf_counter() - t0
+    print(f"{elapsed / n * 1e6:.2f} µs per publish() call, {telemetry.published} frames sent")
+
+    t0 = time.perf_counter()
+    for i in range(1000):
+        telemetry.publish(state, 0.01, force=True)
+    print(f"{(time.perf_counter() - t0) * 1e3:.2f} µs per packed publish + flush")
+
+    # the alternative: one topic and one network update per value
+    singles = [inst.getDoubleTopic(f"/robot/single/{name}").publish() for name in FIELDS]
+    t0 = time.perf_counter()
+    for i in range(1000):
+        for pub, value in zip(singles, telemetry._values):
+            pub.set(value)
+            inst.flush()
+    print(f"{(time.perf_counter() - t0) * 1e3:.2f} µs per cycle with per-value puts")
+    print(dict(zip(FIELDS, sub.get())))
+    telemetry.close()
+    inst.stopServer()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Low-latency teleoperation
+———————————————————————————————————————————————
+Axis streams (throttle, steer ∈ −1 … +1) go straight to the motor driver
+from the thread that received them - no planning loop, no per-command
+thread:
+- Teleop mixes them in velocity space (v = throttle · max_speed,
+  turn = steer · max_turn, + steer = right), slew-limits each wheel and
+  calls set() on the runtime's motor, so compensation and the geofence still
+  apply
+- latest wins: every input replaces the target; NTAxes reads the newest
+  value, not the queued event, so a backlog is skipped instead of replayed
+- deadman: no input for `timeout` stops the motors (watchdog thread, which
+  also finishes slew ramps between sparse inputs)
+- input → PWM latency of every command goes into a profiling.Histogram:
+  from the NT publish timestamp (NTAxes) or the key read (KeyboardAxes)
+  until set() has returned
+
+Sources:
+  KeyboardAxes  stdin in cbreak mode on the robot (w/s throttle, a/d steer,
+                space stop, +/- speed, x to leave); a key counts as held
+                until its auto-repeat stops
+  NTAxes        DoubleArray <base>/teleop [throttle, steer] on the robot's NT
+                instance; `python teleop.py --host robot.local` publishes it
+                from a laptop keyboard
+
+    python teleop.py --bench        # loopback latency and deadman check
+"""
+
+import math
+import os
+import select
+import sys
+import threading
+import time
+
+from profiling import Histogram
+
+
+class Teleop:
+    """Axes → slew-limited wheel commands, with a deadman watchdog"""
+
+    def __init__(self, motor, max_speed=0.6, max_turn=0.4, deadzone=0.05, accel=4.0,
+                 timeout=0.3, observer=None):
+        """
+        Args:
+            motor: anything with set(left, right) / stop() (Runtime.motor)
+            max_speed: wheel command at full throttle
+            max_turn: wheel command difference / 2 at full steer
+            deadzone: axis values below this count as zero
+            accel: wheel command change per second
+            timeout: deadman - seconds without input before stopping
+            observer: called with (left, right) after every set (dead reckoning)
+        """
+        self.motor = motor
+        self.max_speed = max_speed
+        self.max_turn = max_turn
+        self.deadzone = deadzone
+        self.accel = accel
+        self.timeout = timeout
+        self.observer = observer
+        self.latency = Histogram()
+        self.inputs = 0
+        self.deadman_stops = 0
+        self.left = self.right = 0.0
+        self._target_left = self._target_right = 0.0
+        self._last_input = 0.0
+        self._last_apply = time.perf_counter()
+        self._lock = threading.Lock()
+        self._running = False
+        self._watchdog = None
+
+    def _axis(self, value):
+        if value != value or -self.deadzone < value < self.deadzone:   # nan too
+            return 0.0
+        return max(-1.0, min(1.0, value))
+
+    def command(self, throttle, steer, age_ns=0):
+        """
+        New axis values (any thread); applied immediately.
+
+        Args:
+            age_ns: how long before this call the input was produced, for the
+                latency histogram
+        """
+        t0 = time.perf_counter_ns()
+        v = self._axis(throttle) * self.max_speed
+        turn = self._axis(steer) * self.max_turn
+        with self._lock:
+            self._target_left = v + turn
+            self._target_right = v - turn
+            self._last_input = time.perf_counter()
+            self.inputs += 1
+            self._apply()
+        self.latency.record(age_ns + time.perf_counter_ns() - t0)
+
+    def _apply(self):
+        """Step the wheels toward the target and set the motors (caller holds the lock)"""
+        now = time.perf_counter()
+        step = self.accel * (now - self._last_apply)
+        self._last_apply = now
+        left = self._target_left
+        right = self._target_right
+        if left > self.left + step:
+            left = self.left + step
+        elif left < self.left - step:
+            left = self.left - step
+        if right > self.right + step:
+            right = self.right + step
+        elif right < self.right - step:
+            right = self.right - step
+        self.left, self.right = left, right
+        self.motor.set(left, right)
+        if self.observer is not None:
+            self.observer(left, right)
+
+    def set_motor(self, motor):
+        """Send the following commands to motor (e.g. after a geofence was installed)"""
+        with self._lock:
+            self.motor = motor
+
+    def stop(self):
+        """Zero target and output now"""
+        with self._lock:
+            self._target_left = self._target_right = self.left = self.right = 0.0
+            self.motor.stop()
+            if self.observer is not None:
+                self.observer(0.0, 0.0)
+
+    # watchdog ---------------------------------------------------------------
+    def start(self, rate_hz=100):
+        self._running = True
+        self._last_input = time.perf_counter()
+        self._watchdog = threading.Thread(target=self._watch, args=(1.0 / rate_hz,),
+                                          name="teleop-deadman", daemon=True)
+        self._watchdog.start()
+        return self
+
+    def _watch(self, period):
+        while self._running:
+            time.sleep(period)
+            with self._lock:
+                idle = time.perf_counter() - self._last_input > self.timeout
+                moving = self.left != 0.0 or self.right != 0.0
+                if idle and (moving or self._target_left or self._target_right):
+                    self._target_left = self._target_right = self.left = self.right = 0.0
+                    self.motor.stop()
+                    if self.observer is not None:
+                        self.observer(0.0, 0.0)
+                    self.deadman_stops += 1
+                elif self.left != self._target_left or self.right != self._target_right:
+                    self._apply()                   # finish the ramp between inputs
+
+    def close(self):
+        self._running = False
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+        self.stop()
+
+    def report(self):
+        h = self.latency
+        if not h.total:
+            return "Teleop: no inputs"
+        return (f"Teleop: {self.inputs} inputs, input→PWM p50 {h.percentile(50) / 1e6:.2f} ms, "
+                f"p99 {h.percentile(99) / 1e6:.2f} ms, max {h.max / 1e6:.2f} ms, "
+                f"{self.deadman_stops} deadman stops")
+
+
+class NTAxes:
+    """Feeds Teleop from a DoubleArray [throttle, steer] topic, in the NT listener thread"""
+
+    def __init__(self, teleop, instance, base="/robot"):
+        from ntcore import EventFlags, PubSubOptions
+
+        self.teleop = teleop
+        self.inst = instance
+        self.topic = f"{base}/teleop"
+        # a held stick repeats the same value - those repeats are the deadman's heartbeat
+        self._sub = instance.getDoubleArrayTopic(self.topic).subscribe(
+            [], PubSubOptions(sendAll=True, keepDuplicates=True))
+        self._listener = instance.addListener(self._sub, EventFlags.kValueAll, self._on_axes)
+
+    def _on_axes(self, ev):
+        from ntcore import _now
+        try:
+            value = self._sub.getAtomic()           # newest, even if events queued up
+            axes = value.value
+            if len(axes) >= 2:
+                self.teleop.command(axes[0], axes[1], (_now() - value.time) * 1000)
+        except Exception as e:
+            # an exception escaping an NT listener terminates the process
+            print(f"⚠ Teleop input ignored: {e}")
+
+    def close(self):
+        self.inst.removeListener(self._listener)
+        self._sub.close()
+
+
+class AxesPublisher:
+    """Laptop side: publish [throttle, steer] to a robot's teleop topic"""
+
+    def __init__(self, instance, base="/robot"):
+        from ntcore import PubSubOptions
+        self.inst = instance
+        self._pub = instance.getDoubleArrayTopic(f"{base}/teleop").publish(
+            PubSubOptions(sendAll=True, keepDuplicates=True))
+
+    def send(self, throttle, steer):
+        self._pub.set([throttle, steer])
+        self.inst.flush()
+
+    def close(self):
+        self._pub.close()
+
+
+class KeyboardAxes:
+    """Keys on stdin (cbreak mode) → axis values, until x / Esc"""
+
+    KEYS = {"w": (1.0, 0.0), "s": (-1.0, 0.0), "a": (0.0, -1.0), "d": (0.0, 1.0),
+            "q": (1.0, -0.5), "e": (1.0, 0.5), " ": (0.0, 0.0)}
+
+    def __init__(self, send, level=0.5):
+        """
+        Args:
+            send: called with (throttle, steer, age_ns) - Teleop.command or a publisher
+            level: axis magnitude of a key press, changed with + / -
+        """
+        self.send = send
+        self.level = level
+        self._closed = False
+
+    def close(self):
+        """Make run() return within one repeat period (from another thread)"""
+        self._closed = True
+
+    def run(self, repeat=0.05, hold=0.6):
+        """
+        Blocking. The last key is re-sent every `repeat` s for up to `hold` s
+        after it was last seen, bridging the keyboard's initial auto-repeat
+        delay, so the receiving deadman can stay short.
+        """
+        import termios
+        import tty
+
+        fd = sys.stdin.fileno()
+        saved = termios.tcgetattr(fd)
+        print("w/s: forward/back  a/d: left/right  q/e: curve  space: stop  +/-: speed  x: quit")
+        last, last_t = None, 0.0
+        try:
+            tty.setcbreak(fd)
+            while not self._closed:
+                ready, _, _ = select.select([fd], [], [], repeat)
+                if not ready:
+                    if last is not None and time.perf_counter() - last_t < hold:
+                        self.send(last[0], last[1], 0)
+                    continue
+                t0 = time.perf_counter_ns()
+                key = os.read(fd, 1).decode(errors="ignore").lower()
+                if key in ("x", "\x1b"):
+                    break
+                if key in "+=":
+                    self.level = min(1.0, self.level + 0.1)
+                    print(f"\rlevel {self.level:.1f}  ", end="", flush=True)
+                elif key == "-":
+                    self.level = max(0.1, self.level - 0.1)
+                    print(f"\rlevel {self.level:.1f}  ", end="", flush=True)
+                elif key in self.KEYS:
+                    throttle, steer = self.KEYS[key]
+                    last, last_t = (throttle * self.level, steer * self.level), time.perf_counter()
+                    self.send(last[0], last[1], time.perf_counter_ns() - t0)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+            self.send(0.0, 0.0, 0)
+            print()
+
+
+def run_bench(rate=200, duration=3.0, port=5870, motor_delay=0.0):
+    """Loopback NT publisher → NTAxes → Teleop → fake motor; returns the Teleop"""
+    from ntcore import NetworkTableInstance
+
+    class _Motor:
+        def __init__(self):
+            self.last = (0.0, 0.0)
+
+        def set(self, left, right):
+            if motor_delay:
+                time.sleep(motor_delay)          # e.g. a pigpiod round trip
+            self.last = (left, right)
+
+        def stop(self):
+            self.set(0.0, 0.0)
+
+    server = NetworkTableInstance.create()
+    server.startServer(persist_filename="", port3=0, port4=port)
+    motor = _Motor()
+    teleop = Teleop(motor, timeout=0.3).start()
+    axes = NTAxes(teleop, server)
+    client = NetworkTableInstance.create()
+    client.setServer("127.0.0.1", port)
+    client.startClient4("teleop-bench")
+    deadline = time.monotonic() + 5.0
+    while not client.isConnected() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    publisher = AxesPublisher(client)
+    time.sleep(0.2)
+
+    period = 1.0 / rate
+    next_t = time.perf_counter()
+    for i in range(int(rate * duration)):
+        next_t += period
+        time.sleep(max(0.0, next_t - time.perf_counter()))
+        publisher.send(math.sin(i * period), 0.3 * math.cos(i * period))
+    moving = motor.last != (0.0, 0.0)
+    time.sleep(teleop.timeout + 0.1)                # stop publishing: the deadman must fire
+    stopped = motor.last == (0.0, 0.0)
+
+    publisher.close()
+    axes.close()
+    teleop.close()
+    client.stopClient()
+    server.stopServer()
+    NetworkTableInstance.destroy(client)
+    NetworkTableInstance.destroy(server)
+    print(f"{'✓' if moving and stopped else '✗'} deadman: "
+          f"{'stopped' if stopped else 'still driving'} {teleop.timeout:.1f} s after the last input")
+    return teleop
+
+
+# command line --------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drive a robot from the keyboard over NetworkTables")
+    parser.add_argument("--host", default="127.0.0.1", help="robot running the NT server")
+    parser.add_argument("--port", type=int, default=5810)
+    parser.add_argument("--name", default=None, help="fleet robot name (topics under /<name>/robot)")
+    parser.add_argument("--bench", action="store_true", help="loopback latency benchmark instead")
+    parser.add_argument("--rate", type=int, default=200, help="bench: input rate (Hz)")
+    parser.add_argument("--motor-delay", type=float, default=0.0,
+                        help="bench: simulated set() time (s), e.g. 0.0002 for pigpiod")
+    args = parser.parse_args()
+
+    if args.bench:
+        result = run_bench(args.rate, motor_delay=args.motor_delay)
+        print(result.report())
+        p99 = result.latency.percentile(99) / 1e6
+        print(f"{'✓' if p99 < 10.0 else '✗'} p99 input→PWM {p99:.2f} ms (target < 10 ms)")
+    else:
+        from ntcore import NetworkTableInstance
+
+        inst = NetworkTableInstance.create()
+        inst.setServer(args.host, args.port)
+        inst.startClient4("teleop")
+        publisher = AxesPublisher(inst, f"/{args.name}/robot" if args.name else "/robot")
+        try:
+            KeyboardAxes(lambda throttle, steer, age: publisher.send(throttle, steer)).run()
+        finally:
+            publisher.close()
+            inst.stopClient()
@@ -0,0 +1,97 @@
+"""Shared fakes: a motor and a pose source good enough to build a Runtime without hardware"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calibration import Calibration  # noqa: E402
+from controlstate import fill_pose  # noqa: E402
+
+
+class FakeMotor:
+    """Records the last command instead of driving pins"""
+
+    def __init__(self):
+        self.left = self.right = 0.0
+        self.compensated = False
+        self.commands = 0
+
+    def set(self, left, right):
+        self.left, self.right = left, right
+        self.commands += 1
+
+    def stop(self):
+        self.set(0.0, 0.0)
+
+    def close(self):
+        pass
+
+    def set_compensation(self, table):
+        self.compensated = table is not None
+
+
+class FakeLocalization:
+    """A fixed, tracked pose (tests move it by assigning position / euler angles)"""
+
+    def __init__(self):
+        self.calibration = Calibration()
+        self.calibrated_position = [0.0, 0.0, 0.0]
+        self.calibrated_euler_angles = [0.0, 0.0, 0.0]
+        self.latest_is_tracking = True
+
+    def read_pose(self, snap):
+        return fill_pose(snap, self.calibrated_position, self.calibrated_euler_angles,
+                         self.latest_is_tracking)
+
+    def wait_for_pose(self, timeout):
+        return True
+
+    def get_latest_data(self):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def _in_tmp_path(tmp_path, monkeypatch):
+    """Run every test in its own directory: no robot_state.json / latency.json leaks in or out"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def runtime(tmp_path):
+    from controlloop import Robot
+    from statefile import StateStore
+    rt = Robot(FakeMotor(), FakeLocalization(), StateStore(str(tmp_path / "state.json")))
+    yield rt
+    rt.close()
+
+
+def _free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def nt_pair():
+    """(server, client) NetworkTableInstances connected over loopback, as in bench_ingest"""
+    import time
+    ntcore = pytest.importorskip("ntcore")
+    server = ntcore.NetworkTableInstance.create()
+    client = ntcore.NetworkTableInstance.create()
+    port = _free_port()
+    server.startServer(persist_filename="", port3=0, port4=port)
+    client.setServer("127.0.0.1", port)
+    client.startClient4("tests")
+    deadline = time.monotonic() + 5.0
+    while not client.isConnected():
+        assert time.monotonic() < deadline, "NT loopback did not connect"
+        time.sleep(0.01)
+    yield server, client
+    client.stopClient()
+    server.stopServer()
+    ntcore.NetworkTableInstance.destroy(client)
+    ntcore.NetworkTableInstance.destroy(server)
@@ -0,0 +1,49 @@
+import pytest
+
+from calibration import Calibration
+from statefile import StateStore
+
+# robot calibrated at (2, 3) facing world +x, headset 10 cm ahead of the axle and turned 5°
+RAW_POSITION, RAW_EULER = [2.1, 0.4, 3.0], [1.0, 95.0, -2.0]
+
+
+def _calibration():
+    return Calibration(mount_z=0.1, mount_yaw=5.0).rebased(RAW_POSITION, RAW_EULER)
+
+
+def test_calibration_pose_is_the_origin():
+    position, euler = _calibration().apply(RAW_POSITION, RAW_EULER)
+    assert position == pytest.approx([0.0, 0.4, 0.0], abs=1e-9)
+    assert euler == pytest.approx([1.0, 0.0, -2.0], abs=1e-9)
+
+
+def test_robot_frame_axes():
+    cal = Calibration().rebased([2.0, 0.0, 3.0], [0.0, 90.0, 0.0])
+    ahead, _ = cal.apply([3.0, 0.0, 3.0], [0.0, 90.0, 0.0])     # world +x is forward
+    right, _ = cal.apply([2.0, 0.0, 2.0], [0.0, 90.0, 0.0])     # world -z is to the right
+    assert (ahead[0], ahead[2]) == pytest.approx((0.0, 1.0), abs=1e-9)
+    assert (right[0], right[2]) == pytest.approx((1.0, 0.0), abs=1e-9)
+
+
+def test_round_trip_through_the_state_file(tmp_path):
+    cal = _calibration()
+    path = str(tmp_path / "state.json")
+    StateStore(path).update(calibration=cal.to_dict())
+    loaded = Calibration.from_dict(StateStore(path).get("calibration"))
+    assert loaded.to_dict() == cal.to_dict()
+    for position, euler in (([2.5, 0.1, 4.0], [0.0, 30.0, 0.0]), ([-1.0, 0.0, 0.2], [3.0, -150.0, 1.0])):
+        expected = cal.apply(position, euler)
+        actual = loaded.apply(position, euler)
+        assert actual[0] == pytest.approx(expected[0])
+        assert actual[1] == pytest.approx(expected[1])
+
+
+def test_rebase_keeps_the_mount():
+    cal = _calibration()
+    again = cal.rebased([0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
+    assert (again.mount_x, again.mount_z, again.mount_yaw) == (cal.mount_x, cal.mount_z, cal.mount_yaw)
+
+
+def test_mount_is_removed_from_the_base_pose():
+    x, z, yaw = Calibration(mount_z=0.1, mount_yaw=5.0).base_pose(*RAW_POSITION[::2], RAW_EULER[1])
+    assert (x, z, yaw) == pytest.approx((2.0, 3.0, 90.0))
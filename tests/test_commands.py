@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+
+import pytest
+
+from commands import CommandChannel, CommandClient
+
+
+@pytest.fixture
+def channel(runtime, nt_pair):
+    server, client_inst = nt_pair
+    runtime.commands = CommandChannel(runtime, server)
+    client = CommandClient(instance=client_inst)
+    time.sleep(0.2)                         # let the topics announce
+    yield runtime.commands, client
+    client.close()
+    runtime.commands.close()
+
+
+def _raw(client, text):
+    client._request.set(text)
+    client.inst.flush()
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_status_is_answered_at_once(channel):
+    _, client = channel
+    ack = client.request("status", timeout=3.0)
+    assert ack["status"] == "done" and ack["cmd"] == "status"
+    assert ack["result"]["busy"] is False and ack["result"]["x"] == 0.0
+
+
+def test_move_is_accepted_then_done(channel):
+    _, client = channel
+    seq = client.send("move_to", 0.0, 0.0)
+    assert client.wait(seq, timeout=3.0, final=False)["status"] in ("accepted", "done")
+    ack = client.wait(seq, timeout=5.0)
+    assert ack["status"] == "done" and ack["result"]["ok"] is True
+
+
+def test_stale_sequence_is_rejected(channel):
+    _, client = channel
+    seq = client.send("status")
+    assert client.wait(seq, timeout=3.0)["status"] == "done"
+    _raw(client, json.dumps({"seq": seq, "cmd": "status"}))
+    _wait_for(lambda: client.acks[seq]["status"] == "rejected")
+    assert "stale" in client.acks[seq]["error"]
+
+
+@pytest.mark.parametrize("text", ["{not json", json.dumps({"cmd": "status"}), json.dumps([1, 2])])
+def test_malformed_request_is_rejected(channel, text):
+    _, client = channel
+    _raw(client, text)
+    _wait_for(lambda: None in client.acks)
+    assert client.acks[None]["status"] == "rejected"
+    assert client.request("status", timeout=3.0)["status"] == "done"     # still serving
+
+
+@pytest.mark.parametrize("cmd, args", [("dance", []), ("move_to", ["a", 1]), ("follow_path", [])])
+def test_bad_command_is_rejected(channel, cmd, args):
+    _, client = channel
+    ack = client.request(cmd, *args, timeout=3.0)
+    assert ack["status"] == "rejected" and ack["error"]
+
+
+def test_newer_move_preempts_the_running_one(channel):
+    commands, client = channel
+    far = client.send("move_to", 5.0, 5.0)          # the fake pose never moves: runs until cancelled
+    _wait_for(lambda: commands._active == far)
+    near = client.send("move_to", 0.0, 0.0)
+    assert client.wait(far, timeout=5.0)["status"] == "preempted"
+    assert client.wait(near, timeout=5.0)["status"] == "done"
+
+
+def test_remote_move_preempts_a_repl_move(channel, runtime):
+    _, client = channel
+    started, results = threading.Event(), []
+
+    def hold():
+        started.set()
+        while True:
+            runtime.drive_motors(runtime.motor.set, 0.0, 0.0)
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=lambda: results.append(runtime.run_control(hold)))
+    thread.start()
+    assert started.wait(2.0)
+    ack = client.request("move_to", 0.0, 0.0, timeout=5.0)
+    thread.join(2.0)
+    assert ack["status"] == "done"
+    assert results == [False]                       # the REPL move was cancelled, not raced
+
+
+def test_stop_cancels_a_repl_move(channel, runtime):
+    _, client = channel
+    started, results = threading.Event(), []
+
+    def hold():
+        started.set()
+        while True:
+            runtime.drive_motors(runtime.motor.set, 0.2, 0.2)
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=lambda: results.append(runtime.run_control(hold)))
+    thread.start()
+    assert started.wait(2.0)
+    assert client.request("stop", timeout=3.0)["status"] == "done"
+    thread.join(2.0)
+    assert results == [False] and not runtime.busy
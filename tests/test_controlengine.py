@@ -0,0 +1,52 @@
+import pytest
+
+from controlengine import Strategy, TurnThenDrive
+from controlstate import DriveParams, TurnParams
+from runtime import Runtime
+
+
+class _Steps(Strategy):
+    """Drives straight for a few cycles, then arrives"""
+    hz = 100
+
+    def __init__(self, cycles):
+        super().__init__()
+        self.cycles = cycles
+
+    def step(self, state, dt):
+        self.cycles -= 1
+        state.left = state.right = 0.1
+        return self.cycles < 0
+
+
+def test_strategy_and_runtime_are_abstract():
+    with pytest.raises(TypeError):
+        Strategy()
+    with pytest.raises(TypeError):
+        Runtime(None, None)
+
+
+def test_engine_drives_until_arrival(runtime):
+    assert runtime.engine.run(_Steps(3), verbose=False) is True
+    assert runtime.motor.commands >= 3
+    assert (runtime.motor.left, runtime.motor.right) == (0.0, 0.0)     # stopped on arrival
+
+
+def test_quiet_moves_print_nothing(runtime, capsys):
+    move = TurnThenDrive(0.0, 0.05, TurnParams(), DriveParams(dist_tol=0.1), pause=0.0)
+    assert runtime.engine.run(move, verbose=False) is True
+    assert capsys.readouterr().out == ""
+
+
+def test_verbose_moves_report_phases(runtime, capsys):
+    move = TurnThenDrive(0.0, 0.05, TurnParams(), DriveParams(dist_tol=0.1), pause=0.0)
+    assert runtime.engine.run(move, verbose=True) is True
+    out = capsys.readouterr().out
+    assert "Phase 1" in out and move.arrived in out
+
+
+def test_engine_sends_the_strategy_wheel_commands_unchanged(runtime, monkeypatch):
+    sent = []
+    monkeypatch.setattr(runtime.motor, "set", lambda left, right: sent.append((left, right)))
+    runtime.engine.run(_Steps(1), verbose=False)
+    assert sent[0] == (0.1, 0.1)
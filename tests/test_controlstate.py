@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+from controlengine import PoseStabilizer, Reversible, TurnThenDrive
+from controlstate import (DEG, ControlState, DriveParams, PoseParams, PoseSnapshot,
+                          ReversibleParams, TurnParams, count_step_allocations, drive_step, fill_pose,
+                          peak_step_allocation, pose_step, reversible_step, turn_step)
+from gainschedule import GainSchedule, default_profile
+
+
+def _creeping_pose():
+    """A pose that moves a little on every read, as the NT arrays do"""
+    position, euler = [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]
+    snap = PoseSnapshot()
+
+    def advance():
+        position[0] += 1e-5
+        position[2] += 2e-5
+        euler[1] = (euler[1] + 0.5) % 360.0
+        fill_pose(snap, position, euler, True)
+
+    return snap, advance
+
+
+def _scheduled():
+    p = ReversibleParams()
+    p.schedule = GainSchedule(default_profile())
+    return p
+
+
+@pytest.mark.parametrize("step, params", [
+    (turn_step, TurnParams),
+    (drive_step, DriveParams),
+    (reversible_step, ReversibleParams),
+    (reversible_step, _scheduled),
+    (pose_step, PoseParams),
+])
+def test_step_functions_do_not_allocate(step, params):
+    snap, advance = _creeping_pose()
+    state, p = ControlState(), params()
+    state.reset(1.0, 2.0)
+
+    def one_step():
+        advance()
+        step(state, snap, p, 0.005)
+
+    assert count_step_allocations(one_step) == 0
+    assert peak_step_allocation(one_step) == 0
+
+
+@pytest.mark.parametrize("make", [
+    lambda: TurnThenDrive(0.0, 0.0, TurnParams(), DriveParams(), pause=0.0),
+    lambda: Reversible(0.0, 0.0, ReversibleParams()),
+    lambda: PoseStabilizer(0.0, 0.0, 90.0 * DEG, PoseParams()),
+])
+def test_strategy_steps_do_not_allocate(make):
+    strategy, state, pose = make(), ControlState(), PoseSnapshot()
+    pose.x, pose.z, pose.yaw = 3.0, 3.0, 0.0
+    pose.valid = pose.is_tracking = True
+    strategy.verbose = False
+    strategy.begin(state, pose, 0.5, 0.30)
+    strategy.step(state, 0.1)           # first call of TurnThenDrive computes the bearing
+    assert count_step_allocations(lambda: strategy.step(state, 0.1)) == 0
+
+
+def test_allocation_counter_sees_growth_in_helpers():
+    kept = []
+    assert count_step_allocations(lambda: kept.append(object()), steps=100) >= 100
+    assert peak_step_allocation(lambda: [0.0] * 100) > 0
+
+
+def test_reversible_backs_up_to_a_target_behind():
+    state, pose, p = ControlState(), PoseSnapshot(), ReversibleParams()
+    pose.valid = pose.is_tracking = True
+    state.reset(0.0, -1.0)              # straight behind a robot facing +z
+    assert not reversible_step(state, pose, p, 0.1)
+    assert state.reversing
+    assert state.left < 0.0 and state.right < 0.0
+    assert math.isclose(state.left, state.right)
@@ -0,0 +1,99 @@
+import time
+
+from controlstate import PoseSnapshot
+from deadreckoning import DeadReckoner
+
+from conftest import FakeLocalization
+
+
+def _reckoner(**kwargs):
+    localization = FakeLocalization()
+    return localization, DeadReckoner(localization, stall_timeout=0.05, **kwargs)
+
+
+def _read_after(reckoner, seconds):
+    snap = PoseSnapshot()
+    deadline = time.perf_counter() + seconds
+    while True:
+        assert reckoner.read_pose(snap)
+        if time.perf_counter() >= deadline:
+            return snap
+        time.sleep(0.005)
+
+
+def test_standing_still_is_not_a_dropout():
+    _, reckoner = _reckoner()
+    reckoner.command(0.0, 0.0)
+    snap = _read_after(reckoner, 0.2)          # the same pose, four stall timeouts long
+    assert snap.is_tracking
+    assert reckoner.mode == "tracking" and reckoner.dropouts == 0
+
+
+def test_frozen_pose_while_driving_is_a_dropout():
+    localization, reckoner = _reckoner()
+    _read_after(reckoner, 0.1)
+    reckoner.command(0.5, 0.5)
+    snap = _read_after(reckoner, 0.2)
+    assert not snap.is_tracking
+    assert reckoner.mode == "dead_reckoning" and reckoner.dropouts == 1
+    assert snap.z > 0.0                         # propagated from the commands
+
+    localization.calibrated_position = [0.0, 0.0, 0.1]     # the stream moves again
+    snap = _read_after(reckoner, 0.0)
+    assert snap.is_tracking and reckoner.mode == "tracking"
+
+
+def test_starting_to_drive_gets_the_full_stall_timeout():
+    _, reckoner = _reckoner()
+    _read_after(reckoner, 0.2)
+    reckoner.command(0.5, 0.5)
+    snap = _read_after(reckoner, 0.0)
+    assert snap.is_tracking
+
+
+def test_tracking_messages_are_rate_limited(capsys):
+    localization, reckoner = _reckoner(report_interval=10.0)
+    snap = PoseSnapshot()
+    reckoner.read_pose(snap)
+    for i in range(20):                         # a flickering headset
+        localization.latest_is_tracking = i % 2 == 1
+        localization.calibrated_position = [0.0, 0.0, 0.01 * i]
+        reckoner.read_pose(snap)
+    assert reckoner.dropouts == 10
+    assert capsys.readouterr().out.count("\n") == 1
+
+
+def test_quiet_reckoner_prints_nothing(capsys):
+    localization, reckoner = _reckoner(verbose=False)
+    snap = PoseSnapshot()
+    reckoner.read_pose(snap)
+    localization.latest_is_tracking = False
+    reckoner.read_pose(snap)
+    localization.latest_is_tracking = True
+    reckoner.read_pose(snap)
+    assert reckoner.dropouts == 1
+    assert capsys.readouterr().out == ""
+
+
+def test_peek_follows_the_mode_without_advancing():
+    localization, reckoner = _reckoner()
+    snap = PoseSnapshot()
+    localization.calibrated_position = []
+    assert not reckoner.peek_pose(snap)         # no pose yet
+    localization.calibrated_position = [0.1, 0.0, 0.2]
+    assert reckoner.peek_pose(snap) and (snap.x, snap.z) == (0.1, 0.2)     # no loop: the tracked pose
+    _read_after(reckoner, 0.05)
+    localization.calibrated_position = [0.3, 0.0, 0.4]
+    assert reckoner.peek_pose(snap) and (snap.x, snap.z) == (0.3, 0.4) and snap.is_tracking
+
+    reckoner.command(0.5, 0.5)
+    localization.latest_is_tracking = False
+    _read_after(reckoner, 0.1)                  # dead reckoning
+    t = reckoner._t
+    assert reckoner.peek_pose(snap) and not snap.is_tracking
+    assert (snap.x, snap.z) == (reckoner.x, reckoner.z)
+    assert reckoner._t == t
+
+    while reckoner.read_pose(snap):
+        time.sleep(0.01)
+    assert reckoner.mode == "lost" and not reckoner.peek_pose(snap)
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from conftest import FakeLocalization, FakeMotor
+from controlloop import Robot
+from fleet import Fleet
+from runtime import MoveRejected
+from statefile import StateStore
+
+
+class _Server:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    robots = {name: Robot(FakeMotor(), FakeLocalization(), StateStore(str(tmp_path / f"{name}.json")))
+              for name in ("alpha", "bravo")}
+    fleet = Fleet(_Server(), robots).start_workers(priority=None)
+    yield fleet
+    fleet.close()
+
+
+def test_fleet_and_channel_moves_share_one_executor(fleet):
+    rt = fleet.robots["alpha"]
+    started, release = threading.Event(), threading.Event()
+    ran_on = []
+
+    def hold():
+        ran_on.append(threading.current_thread().name)
+        started.set()
+        release.wait(2.0)
+        return True
+
+    assert fleet.submit("alpha", hold)
+    assert started.wait(2.0)
+    assert ran_on == ["control-alpha"]
+    # what the robot's CommandChannel worker would do meanwhile
+    with pytest.raises(MoveRejected):
+        rt.run_control(lambda: True)
+    assert not fleet.submit("alpha", hold)          # busy
+    assert fleet.submit("bravo", lambda: True)      # other robots are independent
+    release.set()
+    fleet.wait("alpha", timeout=2.0)
+    assert not rt.busy
+    # a channel move now also runs on the robot's worker
+    assert rt.run_control(lambda: threading.current_thread().name) == "control-alpha"
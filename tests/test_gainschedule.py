@@ -0,0 +1,88 @@
+import math
+import os
+
+import pytest
+
+from controlstate import ReversibleParams
+from gainschedule import GainSchedule, default_profile, save_profile
+
+# dist_kp = 1 + distance + 10·heading° on a 3 x 2 grid: trilinear lookup reproduces it exactly
+PROFILE = {
+    "axes": {"distance": [0.0, 2.0, 3], "heading": [0.0, 90.0, 2]},
+    "params": {"dist_kp": [[1.0 + d + 10.0 * h for h in (0.0, 90.0)] for d in (0.0, 1.0, 2.0)],
+               "accel_fwd": 1.5},
+}
+
+
+def _dist_kp(schedule, speed=0.0, distance=0.0, heading_deg=0.0):
+    params = ReversibleParams()
+    schedule.apply(params, speed, distance, math.radians(heading_deg))
+    return params.dist_kp
+
+
+@pytest.mark.parametrize("distance, heading", [(0.0, 0.0), (2.0, 0.0), (0.0, 90.0), (2.0, 90.0),
+                                               (1.0, 0.0), (0.5, 45.0), (1.7, 12.0)])
+def test_interpolation_is_exact_for_a_linear_table(distance, heading):
+    schedule = GainSchedule(PROFILE)
+    assert _dist_kp(schedule, distance=distance, heading_deg=heading) == \
+        pytest.approx(1.0 + distance + 10.0 * heading)
+
+
+def test_lookups_clamp_to_the_table_edges():
+    schedule = GainSchedule(PROFILE)
+    assert _dist_kp(schedule, distance=-1.0, heading_deg=-30.0) == pytest.approx(1.0)
+    assert _dist_kp(schedule, distance=5.0, heading_deg=180.0) == pytest.approx(903.0)
+
+
+def test_constants_and_unscheduled_fields():
+    params = ReversibleParams()
+    steer = params.steer_kp_fwd
+    GainSchedule(PROFILE).apply(params, 0.5, 1.0, 0.0)
+    assert params.accel_fwd == 1.5
+    assert params.steer_kp_fwd == steer
+
+
+def test_steering_gain_is_converted_to_radians():
+    schedule = GainSchedule({"params": {"steer_kp_fwd": 0.01}})
+    params = ReversibleParams()
+    schedule.apply(params, 0.0, 0.0, 0.0)
+    assert params.steer_kp_fwd == pytest.approx(math.degrees(0.01))
+
+
+def test_default_profile_is_three_dimensional():
+    schedule = GainSchedule(default_profile())
+    assert set(schedule.axes) == {"speed", "distance", "heading"}
+    slow = _dist_kp(schedule, 0.3, 1.5, 0.0)
+    near = _dist_kp(schedule, 0.3, 0.0, 0.0)
+    assert near < slow
+
+
+@pytest.mark.parametrize("profile, message", [
+    ({"axes": {"yaw": [0, 1, 2]}, "params": {"dist_kp": 1.0}}, "unknown axes"),
+    ({"axes": {"distance": [1.0, 1.0, 3]}, "params": {"dist_kp": 1.0}}, "min < max"),
+    ({"params": {"pid": 1.0}}, "cannot be scheduled"),
+    ({"axes": {"distance": [0.0, 2.0, 3]}, "params": {"dist_kp": [1.0, 2.0]}}, "does not fit"),
+    ({"axes": {"distance": [0.0, 2.0, 3]}, "params": {}}, "no parameters"),
+])
+def test_invalid_profiles(profile, message):
+    with pytest.raises(ValueError, match=message):
+        GainSchedule(profile)
+
+
+def test_refresh_reloads_a_changed_file(tmp_path):
+    path = str(tmp_path / "gains.json")
+    save_profile(PROFILE, path)
+    schedule = GainSchedule.load(path)
+    assert schedule.refresh() is schedule
+
+    changed = {"axes": PROFILE["axes"], "params": {"dist_kp": 2.0}}
+    save_profile(changed, path)
+    os.utime(path, (0, schedule._mtime + 1))    # mtime granularity may hide the rewrite
+    reloaded = schedule.refresh()
+    assert reloaded is not schedule
+    assert _dist_kp(reloaded, distance=1.0) == 2.0
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    os.utime(path, (0, schedule._mtime + 2))
+    assert reloaded.refresh() is reloaded       # a broken file keeps the loaded schedule
@@ -0,0 +1,115 @@
+import pytest
+
+from controlstate import DEG
+from geofence import Geofence, GeofencedMotor
+
+from conftest import FakeMotor
+
+TABLE = [(-1.5, -1.0), (1.5, -1.0), (1.5, 1.0), (-1.5, 1.0)]
+BOX = [(0.3, 0.3), (0.7, 0.3), (0.7, 0.7), (0.3, 0.7)]
+
+
+class _Pose:
+    """Pose source with read_pose(snapshot), moved by assignment"""
+
+    def __init__(self, x=0.0, z=0.0, yaw=0.0):
+        self.x, self.z, self.yaw = x, z, yaw
+        self.lost = False
+
+    def read_pose(self, snap):
+        if self.lost:
+            snap.valid = False
+            return False
+        snap.x, snap.z, snap.yaw = self.x, self.z, self.yaw
+        snap.valid = snap.is_tracking = True
+        return True
+
+
+@pytest.fixture(scope="module")
+def fence():
+    return Geofence(keep_in=[TABLE], keep_out=[BOX])
+
+
+def _guarded(fence, **pose):
+    motor, source = FakeMotor(), _Pose(**pose)
+    return motor, source, GeofencedMotor(motor, fence, source.read_pose)
+
+
+def test_lookups(fence):
+    assert fence.allowed(0.0, 0.0)
+    assert not fence.allowed(0.5, 0.5)          # keep-out
+    assert not fence.allowed(2.0, 0.0)          # outside the keep-in
+    assert fence.clearance(-1.0, 0.0) == pytest.approx(0.5, abs=fence.resolution)
+    assert fence.signed_distance(2.0, 0.0) < 0.0
+    assert Geofence.from_dict(fence.to_dict()).to_dict() == fence.to_dict()
+
+
+def test_command_with_room_passes(fence):
+    motor, _, guarded = _guarded(fence, x=-1.0, z=-0.5)
+    guarded.set(0.3, 0.3)
+    assert (motor.left, motor.right) == (0.3, 0.3)
+    assert guarded.clamped == guarded.stopped == 0
+
+
+def test_command_towards_the_edge_is_clipped(fence):
+    motor, _, guarded = _guarded(fence, x=-1.0, z=0.95)
+    guarded.set(0.6, 0.6)
+    assert 0.0 <= motor.left < 0.6
+    assert motor.left == pytest.approx(motor.right)
+    assert guarded.clamped == 1
+
+
+def test_clipping_keeps_the_turn(fence):
+    motor, _, guarded = _guarded(fence, x=-1.0, z=0.95)
+    guarded.set(0.7, 0.5)
+    assert motor.left - motor.right == pytest.approx(0.2)
+    assert 0.5 * (motor.left + motor.right) < 0.6
+
+
+def test_reversing_away_from_the_edge_passes(fence):
+    motor, _, guarded = _guarded(fence, x=-1.0, z=0.95)
+    guarded.set(-0.4, -0.4)
+    assert (motor.left, motor.right) == (-0.4, -0.4)
+
+
+def test_outside_only_motion_back_in_passes(fence):
+    motor, source, guarded = _guarded(fence, x=0.0, z=1.1)
+    guarded.set(0.5, 0.5)                       # facing +z: deeper out
+    assert motor.left == motor.right == 0.0
+    assert not guarded.inside and guarded.stopped == 1
+    source.yaw = 180.0 * DEG                    # facing back in
+    guarded.set(0.5, 0.5)
+    assert (motor.left, motor.right) == (0.5, 0.5)
+
+
+def test_runtime_fence_reads_the_control_pose(runtime, fence):
+    runtime.set_geofence(fence, save=False)
+    assert runtime.motor.pose_source == runtime.dead_reckoner.peek_pose
+    runtime.localization.calibrated_position = [-1.0, 0.0, 0.95]
+    runtime.motor.set(0.6, 0.6)
+    assert runtime.driver.left < 0.6            # clipped at the edge through the dead reckoner's pose
+
+
+def test_lost_pose_fails_closed(fence):
+    motor, source, guarded = _guarded(fence, x=-1.0, z=0.95)
+    source.lost = True
+    guarded.set(0.5, 0.5)                       # before any pose: nothing to check against
+    assert (motor.left, motor.right) == (0.5, 0.5)
+
+    source.lost = False
+    guarded.set(-0.2, -0.2)                     # a pose was seen ...
+    source.lost = True
+    guarded.set(0.8, 0.4)                       # ... then lost, driving out of the fence
+    assert motor.left + motor.right == pytest.approx(0.0)      # no linear part
+    assert motor.left - motor.right == pytest.approx(0.4)      # turning in place still allowed
+    assert guarded.blind == 1
+
+
+def test_guarded_commands_do_not_advance_the_reckoner(runtime, fence):
+    runtime.set_geofence(fence, save=False)
+    reckoner = runtime.dead_reckoner
+    reckoner.read_pose(runtime.pose_snapshot)   # the control loop's read
+    t, commands = reckoner._t, len(reckoner._commands)
+    for _ in range(5):
+        runtime.motor.set(0.3, 0.3)
+    assert reckoner._t == t and len(reckoner._commands) == commands
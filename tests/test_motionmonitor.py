@@ -0,0 +1,155 @@
+import math
+import time
+
+import pytest
+
+from controlstate import PoseSnapshot
+from motionmonitor import MotionMonitor, SLIP, STALL
+from runtime import MotionFault
+
+DT, V = 0.05, 0.3
+
+
+def _drive(monitor, efficiency, cycles, pose=None, t=0.0, v=V, w=0.0):
+    """Feed cycles of commanded (v, w) while the pose moves efficiency of it; returns (events, pose, t)"""
+    if pose is None:
+        pose = PoseSnapshot()
+        pose.valid = pose.is_tracking = True
+    events = []
+    for _ in range(cycles):
+        t += DT
+        pose.yaw += w * efficiency * DT
+        pose.x += v * efficiency * DT * math.sin(pose.yaw)
+        pose.z += v * efficiency * DT * math.cos(pose.yaw)
+        event = monitor.update(t, pose, v, w)
+        if event is not None:
+            events.append((round(t, 6), event))
+    return events, pose, t
+
+
+@pytest.mark.parametrize("efficiency, expected", [(1.0, None), (0.45, SLIP), (0.0, STALL)])
+def test_stall_and_slip_are_told_apart(efficiency, expected):
+    events, _, _ = _drive(MotionMonitor(), efficiency, 60)
+    assert [e for _, e in events] == ([] if expected is None else [expected])
+
+
+def test_pivot_turning_fine_is_not_a_stall():
+    events, _, _ = _drive(MotionMonitor(), 1.0, 60, v=0.0, w=1.0)
+    assert events == []
+
+
+def test_event_waits_for_hold_and_is_reported_once():
+    monitor = MotionMonitor(window=0.6, hold=0.3)
+    events, _, _ = _drive(monitor, 0.0, 60)
+    # judged from half a window in, then held: not before 0.3 + 0.3 s
+    assert len(events) == 1 and events[0][0] >= 0.6 - 1e-9
+    assert monitor.state == STALL and monitor.events == 1
+
+
+def test_event_clears_once_motion_matches_again():
+    monitor = MotionMonitor()
+    _, pose, t = _drive(monitor, 0.0, 40)
+    assert monitor.state == STALL
+    _drive(monitor, 1.0, 40, pose, t)
+    assert monitor.state is None
+    events, _, _ = _drive(monitor, 0.0, 40, pose, t + 2.0)
+    assert [e for _, e in events] == [STALL]            # a new event, reported again
+
+
+def test_short_blip_under_hold_is_not_reported():
+    monitor = MotionMonitor(hold=0.3)
+    _, pose, t = _drive(monitor, 1.0, 20)
+    events, pose, t = _drive(monitor, 0.0, 4, pose, t)  # 0.2 s
+    events += _drive(monitor, 1.0, 40, pose, t)[0]
+    assert events == []
+
+
+def test_dropout_is_not_observed_as_motion():
+    monitor = MotionMonitor()
+    _, pose, t = _drive(monitor, 1.0, 20)
+    pose.valid = False
+    for _ in range(3):
+        t += DT
+        assert monitor.update(t, pose, V, 0.0) is None
+    pose.valid = True
+    pose.z += 2.0                                       # relocalized while the pose was out
+    events, _, _ = _drive(monitor, 1.0, 20, pose, t)
+    assert events == []
+    assert monitor.linear_ratio == pytest.approx(1.0, abs=0.05)
+
+
+def test_reset_forgets_the_window():
+    monitor = MotionMonitor()
+    _drive(monitor, 0.0, 40)
+    monitor.reset()
+    assert monitor.sum_dt == 0.0 and monitor.state is None and math.isnan(monitor.linear_ratio)
+
+
+def test_ring_wraps_and_resums_to_the_buffer():
+    monitor = MotionMonitor(window=10.0, capacity=8)
+    pose = PoseSnapshot()
+    pose.valid = pose.is_tracking = True
+    t = 0.0
+    for i in range(8 * 5 + 3):
+        t += DT
+        pose.z += V * DT * (0.5 + 0.5 * math.sin(i))
+        monitor.update(t, pose, V, 0.0)
+    assert monitor._laps >= 4 and monitor._count == 8    # full ring, oldest overwritten
+    for name in ("dt", "exp_d", "obs_d", "exp_a", "obs_a", "lat_d"):
+        assert getattr(monitor, f"sum_{name}") == pytest.approx(sum(getattr(monitor, f"_{name}")))
+    assert monitor.sum_dt == pytest.approx(8 * DT)
+
+
+def test_resum_removes_accumulated_drift():
+    monitor = MotionMonitor(window=10.0, capacity=8)
+    _, pose, t = _drive(monitor, 1.0, 5)                # the first cycle only anchors: 4 samples
+    monitor.sum_exp_d += 1e-3                           # rounding drift
+    _drive(monitor, 1.0, 4, pose, t)                    # completes the lap
+    assert monitor._head == 0
+    assert monitor.sum_exp_d == pytest.approx(sum(monitor._exp_d), abs=1e-15)
+
+
+# the runtime's reaction --------------------------------------------------
+def _push_against_a_wall(runtime, cycles=100):
+    """A move loop whose commands never move the (tracked) pose"""
+    position = runtime.localization.calibrated_position
+    for i in range(cycles):
+        position[2] = 1e-4 * (i % 2)                    # tracking noise, not a frozen pose
+        runtime.dead_reckoner.read_pose(runtime.pose_snapshot)
+        runtime.drive_motors(runtime.motor.set, 0.5, 0.5)
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def recorded(runtime, monkeypatch):
+    """Every command the runtime's motor gets"""
+    sent = []
+    monkeypatch.setattr(runtime.motor, "set", lambda left, right: sent.append((left, right)))
+    runtime.back_off_time = 0.05
+    return sent
+
+
+@pytest.mark.parametrize("action", ["abort", "back_off", "replan"])
+def test_stall_raises_motion_fault(runtime, recorded, action):
+    runtime.set_motion_policy("stall", action)
+    with pytest.raises(MotionFault) as fault:
+        _push_against_a_wall(runtime)
+    assert fault.value.kind == "stall" and fault.value.action == action
+    ox, oz = fault.value.obstacle
+    assert ox == pytest.approx(0.0, abs=1e-3) and oz == pytest.approx(0.3, abs=1e-3)   # ahead
+    backed_off = any(left < 0.0 and right < 0.0 for left, right in recorded)
+    assert backed_off == (action != "abort")
+    assert runtime.motor.left == runtime.motor.right == 0.0              # stopped
+
+
+def test_stall_only_warns_under_warn(runtime, recorded, capsys):
+    runtime.set_motion_policy("stall", "warn")
+    _push_against_a_wall(runtime)
+    assert "Stall detected" in capsys.readouterr().out
+    assert all(left > 0.0 for left, _ in recorded)
+
+
+def test_stall_ends_the_move_in_run_control(runtime, recorded):
+    runtime.set_motion_policy("stall", "abort")
+    assert runtime.run_control(_push_against_a_wall, runtime) is False
+    assert not runtime.busy
@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from controlstate import ControlState, PoseSnapshot, count_step_allocations
+from path import PathParams, PathPoint, SplinePath, path_step
+
+WAYPOINTS = [(0.0, 0.0), (0.0, 1.0), (1.0, 2.0), (2.0, 1.5), (2.0, 0.0)]
+
+
+def _quarter_circle(n=9, radius=1.0):
+    """Waypoints on a quarter circle from (0, 0) heading +z, turning right onto +x"""
+    return [(radius - radius * math.cos(a), radius * math.sin(a))
+            for a in (0.5 * math.pi * k / (n - 1) for k in range(n))]
+
+
+@pytest.mark.parametrize("kind", SplinePath.KINDS)
+def test_straight_line_length_is_exact(kind):
+    path = SplinePath([(0.0, 0.0), (0.3, 0.4), (0.6, 0.8)], kind=kind)
+    assert path.length == pytest.approx(1.0, abs=1e-9)
+    assert path.curvature == pytest.approx(0.0, abs=1e-6)
+
+
+def test_quarter_circle_length_and_curvature():
+    path = SplinePath(_quarter_circle(), start_heading=0.0, end_heading=0.5 * math.pi)
+    assert path.length == pytest.approx(0.5 * math.pi, rel=1e-3)
+    # a right turn of radius 1: κ = +1 /m along the middle of the arc
+    middle = path.curvature[len(path.curvature) // 4: 3 * len(path.curvature) // 4]
+    assert middle == pytest.approx(1.0, abs=0.02)
+    assert path.heading[-1] == pytest.approx(0.5 * math.pi, abs=1e-6)
+
+
+@pytest.mark.parametrize("kind", SplinePath.KINDS)
+def test_lookup_is_monotonic_and_clamped(kind):
+    path = SplinePath(WAYPOINTS, kind=kind)
+    ref = PathPoint()
+    last = None
+    for k in range(501):
+        s = path.length * k / 500
+        path.lookup(s, ref)
+        assert ref.s == pytest.approx(s)
+        if last is not None:
+            # consecutive samples advance along the curve by (about) the arc length between them
+            step = math.hypot(ref.x - last[0], ref.z - last[1])
+            assert 0.0 < step <= 1.01 * path.length / 500      # trapezoid-rule table
+            ahead = (ref.x - last[0]) * math.sin(ref.heading) + (ref.z - last[1]) * math.cos(ref.heading)
+            assert ahead > 0.0
+        last = ref.x, ref.z
+    assert path.lookup(-1.0, ref).s == 0.0 and (ref.x, ref.z) == (0.0, 0.0)
+    assert path.lookup(path.length + 1.0, ref).s == path.length
+    assert (ref.x, ref.z) == pytest.approx((2.0, 0.0))
+
+
+def test_waypoints_lie_on_the_path():
+    path = SplinePath(WAYPOINTS)
+    ref = PathPoint()
+    s = 0.0
+    for x, z in WAYPOINTS:
+        s = path.project(x, z, s, ref, iterations=6)
+        assert (ref.x, ref.z) == pytest.approx((x, z), abs=1e-3)
+
+
+def test_project_finds_the_closest_point_from_nearby():
+    path = SplinePath(_quarter_circle(), start_heading=0.0, end_heading=0.5 * math.pi)
+    ref = PathPoint()
+    a = 0.6                                            # 0.05 m outside the arc at angle a
+    x, z = 1.0 - 1.05 * math.cos(a), 1.05 * math.sin(a)
+    assert path.project(x, z, a - 0.05, ref) == pytest.approx(a, abs=2e-3)
+
+
+def test_speed_profile_respects_its_limits():
+    path = SplinePath(WAYPOINTS, max_speed=0.3, max_accel=0.3, max_lateral=0.3)
+    assert path.speed.max() <= 0.3 + 1e-12
+    assert path.speed[-1] == 0.0
+    assert (path.speed ** 2 * abs(path.curvature)).max() <= 0.3 + 1e-9
+    dv2 = abs(path.speed[1:] ** 2 - path.speed[:-1] ** 2)
+    assert (dv2 <= 2.0 * 0.3 * (path.s[1:] - path.s[:-1]) + 1e-9).all()
+
+
+def test_bad_paths_are_rejected():
+    with pytest.raises(ValueError):
+        SplinePath([(0.0, 0.0), (0.0, 0.0)])
+    with pytest.raises(ValueError):
+        SplinePath(WAYPOINTS, kind="bezier")
+
+
+def test_path_step_follows_to_the_end_without_allocating():
+    path = SplinePath(WAYPOINTS)
+    k, track, dt = 0.5, 0.30, 0.05
+    params = PathParams(speed_scale=k, track_width=track, min_speed=0.0)
+    state, pose = ControlState(), PoseSnapshot()
+    state.reset(0.0, 0.0)
+    progress, t = [], 0.0
+    while not path_step(state, pose, path, params, dt):
+        progress.append(state.progress)
+        v = k * 0.5 * (state.left + state.right)
+        w = k * (state.left - state.right) / track
+        pose.yaw += w * dt
+        pose.x += v * math.sin(pose.yaw) * dt
+        pose.z += v * math.cos(pose.yaw) * dt
+        t += dt
+        assert t < 60.0, "never arrived"
+    assert progress == sorted(progress)                # never backwards
+    assert (pose.x, pose.z) == pytest.approx((2.0, 0.0), abs=params.dist_tol + 1e-9)
+
+    state.reset(0.0, 0.0)
+    assert count_step_allocations(lambda: path_step(state, pose, path, params, dt)) == 0
@@ -0,0 +1,64 @@
+import math
+
+import pytest
+
+from occupancy import OccupancyGrid
+from planner import GridPlanner
+
+
+def _length(start, waypoints):
+    points = [start] + waypoints
+    return sum(math.dist(a, b) for a, b in zip(points, points[1:]))
+
+
+def _walled_grid():
+    grid = OccupancyGrid.empty(6.0, 6.0, resolution=0.1)
+    grid.set_rect(-2.0, 0.9, 1.5, 1.1)          # wall with a gap on the right
+    return grid
+
+
+def _assert_same_plan(incremental, grid, start, goal):
+    fresh = GridPlanner(grid)
+    expected = fresh.plan(*start, *goal)
+    assert incremental is not None and expected is not None
+    assert incremental[-1] == expected[-1] == goal
+    assert _length(start, incremental) == pytest.approx(_length(start, expected), rel=1e-6)
+    return fresh
+
+
+def test_plan_goes_around_the_wall():
+    grid = _walled_grid()
+    path = GridPlanner(grid).plan(0.0, 0.0, 0.0, 2.0)
+    assert path[-1] == (0.0, 2.0)
+    assert any(x > 1.5 for x, _ in path)        # through the gap
+    assert _length((0.0, 0.0), path) > 2.0
+
+
+def test_replan_after_moving_matches_a_fresh_plan():
+    grid = _walled_grid()
+    planner = GridPlanner(grid)
+    planner.plan(0.0, 0.0, 0.0, 2.0)
+    first = planner.expanded
+    path = planner.plan(0.3, 0.2, 0.0, 2.0)
+    _assert_same_plan(path, grid, (0.3, 0.2), (0.0, 2.0))
+    assert planner.expanded < first
+
+
+def test_replan_after_a_map_change_matches_a_fresh_plan():
+    grid = _walled_grid()
+    planner = GridPlanner(grid)
+    planner.plan(0.0, 0.0, 0.0, 2.0)
+    grid.set_rect(1.5, 0.9, 3.0, 1.1)                   # gap closed on the right ...
+    grid.set_rect(-3.0, 0.9, -2.0, 1.1, value=0)        # ... opened on the left
+    path = planner.plan(0.3, 0.2, 0.0, 2.0)
+    fresh = _assert_same_plan(path, grid, (0.3, 0.2), (0.0, 2.0))
+    assert any(x < -2.0 for x, _ in path)
+    assert planner.expanded < fresh.expanded
+
+
+def test_unreachable_goal():
+    grid = _walled_grid()
+    planner = GridPlanner(grid)
+    planner.plan(0.0, 0.0, 0.0, 2.0)
+    grid.set_rect(-3.0, 0.9, 3.0, 1.1)                  # wall across the whole map
+    assert planner.plan(0.0, 0.0, 0.0, 2.0) is None
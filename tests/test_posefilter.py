@@ -0,0 +1,93 @@
+import pytest
+
+from posefilter import PoseFilter
+
+FRAME = 1 / 60
+
+
+def _feed(f, zs, t=0.0):
+    """Filtered z of each raw z, one frame apart; returns (outputs, last t)"""
+    out = []
+    for z in zs:
+        t += FRAME
+        out.append(f.filter_position(t, [0.0, 0.0, z])[2])
+    return out, t
+
+
+def test_single_frame_spike_is_held_out():
+    f = PoseFilter()
+    out, _ = _feed(f, [0.0] * 10 + [0.4] + [0.0] * 10)
+    assert max(out) == 0.0
+    assert f.position.jumps == 1 and f.relocalizations == 0
+    assert not f.flagged
+
+
+def test_smooth_motion_passes_through():
+    f = PoseFilter()
+    raw = [0.3 * k * FRAME for k in range(60)]
+    out, _ = _feed(f, raw)
+    assert out == pytest.approx(raw)
+    assert f.jumps == 0
+
+
+def test_relocalization_is_accepted_after_confirm_frames():
+    f = PoseFilter(confirm_frames=5)
+    _, t = _feed(f, [0.0] * 10)
+    out, t = _feed(f, [0.25] * 4, t)
+    assert out == [0.0] * 4                     # held while unconfirmed
+    assert f.relocalizations == 0 and f.flagged
+    _feed(f, [0.25], t)
+    assert f.relocalizations == 1
+
+
+def test_accepted_jump_slews_at_catchup_speed():
+    f = PoseFilter(confirm_frames=5, catchup_speed=0.5, position_noise=0.02)
+    _, t = _feed(f, [0.0] * 10)
+    out, t = _feed(f, [0.25] * 5, t)
+    step = 0.5 * FRAME + 0.02                   # catch-up per frame, plus the noise band
+    assert out[-1] == pytest.approx(step)
+    out, _ = _feed(f, [0.25] * 60, t)
+    deltas = [b - a for a, b in zip(out, out[1:])]
+    assert max(deltas) <= step + 1e-12
+    assert out[-1] == 0.25 and not f.flagged
+
+
+def test_inconsistent_jumps_never_relocalize():
+    f = PoseFilter(confirm_frames=3)
+    _, t = _feed(f, [0.0] * 10)
+    out, _ = _feed(f, [0.3, 0.6, 0.3, 0.6, 0.3, 0.6], t)
+    assert out == [0.0] * 6 and f.relocalizations == 0
+
+
+@pytest.mark.parametrize("start", [179.0, -179.0])
+def test_yaw_turning_across_the_wrap_is_not_a_jump(start):
+    f = PoseFilter()
+    sign = 1.0 if start > 0 else -1.0
+    t, yaw, outs = 0.0, start, []
+    for _ in range(20):
+        t += FRAME
+        yaw = (yaw + sign * 0.5 + 180.0) % 360.0 - 180.0     # 30 deg/s through ±180
+        outs.append(f.filter_euler(t, [0.0, yaw, 0.0])[1])
+    assert f.yaw.jumps == 0
+    assert outs[-1] == pytest.approx(yaw)
+    assert all(-180.0 <= y < 180.0 for y in outs)
+
+
+def test_yaw_spike_across_the_wrap_is_held_and_catch_up_takes_the_short_way():
+    f = PoseFilter(confirm_frames=3, catchup_yaw_rate=90.0)
+    t = 0.0
+    for _ in range(5):
+        t += FRAME
+        f.filter_euler(t, [0.0, 178.0, 0.0])
+    t += FRAME
+    assert f.filter_euler(t, [0.0, 0.0, 0.0])[1] == 178.0       # spike held
+    outs = []
+    for _ in range(6):
+        t += FRAME
+        outs.append(f.filter_euler(t, [0.0, -100.0, 0.0])[1])  # 82° away across the wrap
+    assert f.yaw.relocalizations == 1
+    assert outs[:2] == [178.0, 178.0]
+    # slews 178 -> 180 -> -178 ..., up through the wrap, never back through 0
+    step = 90.0 * FRAME + 2.0
+    assert outs[2] == pytest.approx(178.0 + step - 360.0)
+    assert [(b - a) % 360.0 for a, b in zip(outs[2:], outs[3:])] == pytest.approx([step] * 3)
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from runtime import MoveCancelled, MoveRejected
+
+
+def _hold(rt, started, release):
+    """A move that keeps commanding the motors until released (or cancelled)"""
+    started.set()
+    while not release.is_set():
+        rt.drive_motors(rt.motor.set, 0.0, 0.0)
+        time.sleep(0.01)
+    return True
+
+
+def _start_hold(rt):
+    started, release = threading.Event(), threading.Event()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(rt.run_control(_hold, rt, started, release)))
+    thread.start()
+    assert started.wait(2.0)
+    return thread, release, results
+
+
+def test_concurrent_move_is_rejected(runtime):
+    thread, release, results = _start_hold(runtime)
+    assert runtime.busy
+    with pytest.raises(MoveRejected):
+        runtime.run_control(lambda: True)
+    release.set()
+    thread.join(2.0)
+    assert results == [True]
+    assert not runtime.busy
+    assert runtime.run_control(lambda: True) is True
+
+
+def test_preempt_cancels_the_running_move(runtime):
+    thread, release, results = _start_hold(runtime)
+    assert runtime.run_control(lambda: "second", preempt=True) == "second"
+    thread.join(2.0)
+    assert results == [False]           # the first move was cancelled, not left running
+    release.set()
+
+
+def test_cancel_before_the_next_move_is_not_lost(runtime):
+    thread, release, results = _start_hold(runtime)
+    runtime.cancel_move()
+    thread.join(2.0)
+    assert results == [False]
+    # the flag was consumed by the cancelled move; a new move starts clean
+    assert runtime.run_control(lambda: runtime.drive_motors(runtime.motor.set, 0.1, 0.1) or True)
+
+
+def test_cancelled_move_raises_inside_the_loop(runtime):
+    runtime._cancel.set()
+    with pytest.raises(MoveCancelled):
+        runtime.drive_motors(runtime.motor.set, 0.1, 0.1)
+
+
+def test_drive_motors_commands_on_the_calling_thread(runtime):
+    threads = threading.active_count()
+    runtime.drive_motors(runtime.motor.set, 0.2, 0.1)
+    assert (runtime.motor.left, runtime.motor.right) == (0.2, 0.1)     # sent, not scheduled
+    assert threading.active_count() == threads
+
+
+@pytest.fixture
+def fake_measurement(monkeypatch):
+    """latency.measure_latency replaced by a recorder; returns its calls"""
+    import latency
+    calls = []
+
+    def measure(motor, localization, trials=6, mode="turn", **kwargs):
+        calls.append((trials, mode))
+        return {"mode": mode, "delay": 0.08, "delay_ci95": 0.01, "tau": 0.1, "tau_ci95": 0.01,
+                "gain": 1.0, "gain_ci95": 0.1, "trials": trials, "amplitude": 0.35}
+
+    monkeypatch.setattr(latency, "measure_latency", measure)
+    return calls
+
+
+@pytest.mark.parametrize("args", [["x"], ["0"], ["4", "sideways"]])
+def test_measure_latency_usage(runtime, fake_measurement, capsys, args):
+    runtime.handle_command("measure_latency", ["measure_latency", *args])
+    assert "Usage: measure_latency" in capsys.readouterr().out
+    assert fake_measurement == []
+
+
+def test_measure_latency_runs_as_a_move(runtime, fake_measurement, monkeypatch):
+    import latency
+    held = []
+    measure = latency.measure_latency
+    monkeypatch.setattr(latency, "measure_latency",
+                        lambda *a, **k: held.append(runtime.busy) or measure(*a, **k))
+    runtime.handle_command("measure_latency", ["measure_latency", "4", "drive"])
+    assert fake_measurement == [(4, "drive")] and held == [True]
+    assert runtime.latency_model["drive"]["delay"] == 0.08
+    assert not runtime.busy
+
+
+def test_measure_latency_waits_its_turn(runtime, fake_measurement):
+    runtime._move_lock.acquire()
+    try:
+        with pytest.raises(MoveRejected):
+            runtime.handle_command("measure_latency", ["measure_latency"])
+    finally:
+        runtime._move_lock.release()
+    assert fake_measurement == []
+
+
+def test_measurement_errors_are_not_reported_as_usage(runtime, monkeypatch, capsys):
+    import latency
+
+    def fail(*args, **kwargs):
+        raise ValueError("no tracked pose during the step")
+
+    monkeypatch.setattr(latency, "measure_latency", fail)
+    with pytest.raises(ValueError, match="no tracked pose"):
+        runtime.handle_command("measure_latency", ["measure_latency"])
+    assert "Usage" not in capsys.readouterr().out
+    assert not runtime.busy
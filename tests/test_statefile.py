@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from statefile import StateStore
+
+
+def test_update_writes_and_reloads(tmp_path):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path)
+    store.update(calibration={"origin_x": 1.0}, latency={"turn": 0.08})
+    store.update(last_pose={"x": 0.5, "z": -0.2, "yaw": 10.0, "t": 1.0})
+    loaded = StateStore(path)
+    assert loaded.data == store.data
+    assert loaded.get("latency") == {"turn": 0.08}
+    assert loaded.get("motor_model", "none") == "none"
+
+
+def test_remove(tmp_path):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path)
+    store.update(a=1, b=2)
+    store.remove("a", "missing")
+    assert StateStore(path).data == {"b": 2}
+
+
+def test_write_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "state.json")
+    StateStore(path).update(a=1)
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_unserializable_value_keeps_the_old_state(tmp_path):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path)
+    store.update(a=1)
+    with pytest.raises(TypeError):
+        store.update(b=object())            # not JSON: fails halfway through the dump
+    assert store.data == {"a": 1}
+    assert os.listdir(tmp_path) == ["state.json"]
+    with open(path) as f:
+        assert json.load(f) == {"a": 1}
+    store.update(c=3)                       # later updates are not poisoned
+    assert StateStore(path).data == {"a": 1, "c": 3}
+
+
+def test_failed_write_keeps_data_and_leaves_no_temp_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path)
+    store.update(a=1)
+
+    def full_disk(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "fsync", full_disk)
+    with pytest.raises(OSError):
+        store.update(b=2)
+    with pytest.raises(OSError):
+        store.remove("a")
+    assert store.data == {"a": 1}
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+@pytest.mark.parametrize("content", ["", "{truncated", "[1, 2"])
+def test_unreadable_file_starts_empty(tmp_path, content):
+    path = tmp_path / "state.json"
+    path.write_text(content)
+    assert StateStore(str(path)).data == {}
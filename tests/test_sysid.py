@@ -0,0 +1,101 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from geofence import Geofence
+from sysid import LOG_HEADER, compensation_table, fit_wheel
+
+DT = 0.02
+WHEEL = {"gain_fwd": 0.8, "gain_rev": 0.6, "deadband_fwd": 0.1, "deadband_rev": 0.15, "tau": 0.12}
+
+
+def _simulate(u, m=WHEEL):
+    """Wheel speed of the first-order deadband model under commands u"""
+    a = math.exp(-DT / m["tau"])
+    w = np.zeros(len(u))
+    for k in range(len(u) - 1):
+        c = u[k]
+        f = m["gain_fwd"] * (c - m["deadband_fwd"]) if c > m["deadband_fwd"] else \
+            m["gain_rev"] * (c + m["deadband_rev"]) if c < -m["deadband_rev"] else 0.0
+        w[k + 1] = a * w[k] + (1.0 - a) * f
+    return w
+
+
+def _steps(levels, hold=40):
+    return np.repeat(levels, hold).astype(float)
+
+
+def test_fit_recovers_the_wheel_model():
+    u = _steps([0.0, 0.3, 0.6, 1.0, 0.05, -0.3, -0.6, -1.0, -0.1, 0.5, -0.5, 0.0])
+    m = fit_wheel(u, _simulate(u), DT)
+    for key in ("gain_fwd", "gain_rev", "deadband_fwd", "deadband_rev", "tau"):
+        assert m[key] == pytest.approx(WHEEL[key], rel=0.05), key
+    assert m["rms"] < 1e-3
+
+
+def test_fit_rejects_a_log_driven_one_way():
+    u = _steps([0.0, 0.3, 0.6, 1.0, 0.5, 0.0])
+    with pytest.raises(ValueError, match="reverse"):
+        fit_wheel(u, _simulate(u), DT)
+
+
+def test_fit_rejects_a_wheel_that_does_not_respond():
+    u = _steps([0.0, 0.5, -0.5, 1.0, -1.0, 0.0])
+    with pytest.raises(ValueError):
+        fit_wheel(u, np.zeros(len(u)), DT)
+
+
+def _models(**right):
+    return {"left": dict(WHEEL), "right": dict(WHEEL, **right)}
+
+
+@pytest.mark.parametrize("bad", [{"gain_fwd": 0.0}, {"gain_rev": -0.4}])
+def test_compensation_table_rejects_non_positive_gains(bad):
+    with pytest.raises(ValueError, match="right"):
+        compensation_table(_models(**bad))
+
+
+def test_compensation_table_matches_both_wheels():
+    models = _models(gain_fwd=1.0, deadband_fwd=0.05)
+    table, v_max = compensation_table(models)
+    assert v_max == pytest.approx(0.6 * (1.0 - 0.15))      # the slowest wheel / direction
+    for wheel, m in models.items():
+        command, duty = np.array(table[wheel]["command"]), np.array(table[wheel]["duty"])
+        assert (np.diff(command) > 0).all() and (np.diff(duty) >= 0).all()
+        assert duty[command == 0.0] == [0.0]
+        # every duty above the deadband produces command · v_max on this wheel
+        fwd = command > 1e-3
+        produced = m["gain_fwd"] * (duty[fwd] - m["deadband_fwd"])
+        assert produced == pytest.approx(command[fwd] * v_max, abs=1e-5)
+
+
+def test_logger_records_the_driver_behind_the_geofence(runtime, tmp_path):
+    runtime.set_geofence(Geofence(keep_in=[[(-1.5, -1.0), (1.5, -1.0), (1.5, 1.0), (-1.5, 1.0)]]),
+                         save=False)
+    path = str(tmp_path / "log.csv")
+    runtime.start_log(path)
+    assert runtime.command_logger._motor is runtime.driver
+    runtime.motor.set(0.4, 0.2)                             # through the fence
+    assert (runtime.command_logger.left, runtime.command_logger.right) == (0.4, 0.2)
+    runtime.set_geofence(None, save=False)                  # the wrapper goes away
+    runtime.motor.set(0.1, 0.1)
+    assert runtime.command_logger.left == 0.1
+    runtime.stop_log()
+    assert "set" not in vars(runtime.driver)                # the driver's own set() is back
+    with open(path) as f:
+        assert f.readline().strip() == LOG_HEADER
+    assert os.path.getsize(path) > len(LOG_HEADER)
+
+
+def test_sysid_reports_an_unusable_log(runtime, tmp_path, capsys):
+    path = tmp_path / "forward_only.csv"
+    t = np.arange(0.0, 4.0, DT)
+    u = np.where(t > 0.5, 0.6, 0.0)
+    z = np.cumsum(_simulate(u)) * DT
+    rows = np.c_[t, u, u, np.zeros_like(t), z, np.zeros_like(t)]
+    np.savetxt(path, rows, delimiter=",", header=LOG_HEADER, comments="")
+    runtime.run_sysid(str(path))
+    assert "✗ bad wheel gain" in capsys.readouterr().out
+    assert runtime.motor_model is None and not runtime.driver.compensated
@@ -0,0 +1,122 @@
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+from teach import RouteLibrary, douglas_peucker
+
+
+def _deviation(points, keep):
+    """Largest distance of any point from the polyline through the kept ones"""
+    pts = np.asarray(points, dtype=float)
+    worst = 0.0
+    for a, b in zip(keep, keep[1:]):
+        p0, p1 = pts[a], pts[b]
+        seg = p1 - p0
+        length2 = float(seg @ seg)
+        for p in pts[a + 1:b]:
+            f = 0.0 if length2 == 0.0 else min(max(float((p - p0) @ seg) / length2, 0.0), 1.0)
+            worst = max(worst, math.hypot(*(p - (p0 + f * seg))))
+    return worst
+
+
+def _s_curve(n=300):
+    z = np.linspace(0.0, 6.0, n)
+    rng = np.random.default_rng(1)
+    return np.c_[np.sin(z) + rng.normal(0.0, 0.005, n), z]
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 0.03, 0.1])
+def test_douglas_peucker_keeps_endpoints_within_tolerance(tolerance):
+    points = _s_curve()
+    keep = douglas_peucker(points, tolerance)
+    assert keep[0] == 0 and keep[-1] == len(points) - 1
+    assert keep == sorted(keep) and len(keep) < len(points)
+    assert _deviation(points, keep) <= tolerance
+
+
+def test_douglas_peucker_tighter_tolerance_keeps_more():
+    points = _s_curve()
+    assert len(douglas_peucker(points, 0.01)) > len(douglas_peucker(points, 0.1))
+
+
+def test_douglas_peucker_straight_line_and_short_input():
+    line = [(0.0, 0.1 * k) for k in range(20)]
+    assert douglas_peucker(line, 0.01) == [0, 19]
+    assert douglas_peucker(line[:2], 0.01) == [0, 1]
+    assert douglas_peucker(line[:1], 0.01) == [0]
+
+
+def test_douglas_peucker_closed_loop():
+    a = np.linspace(0.0, 2.0 * math.pi, 73)
+    loop = np.c_[np.cos(a), np.sin(a)]          # starts and ends at the same point
+    keep = douglas_peucker(loop, 0.02)
+    assert keep[0] == 0 and keep[-1] == len(loop) - 1
+    assert len(keep) > 4                        # the loop isn't collapsed onto its start
+    assert _deviation(loop, keep) <= 0.02
+
+
+def _recording(idle=2.0, speed=0.25, n=51):
+    """Samples as RouteRecorder keeps them: one at rest, then every 2 cm while driving"""
+    samples = [(0.0, 0.0, 0.0, 0.0)]
+    for k in range(1, n):
+        samples.append((idle + 0.02 * k / speed, 0.0, 0.02 * k, 0.0))
+    return samples
+
+
+def test_route_library_round_trip(tmp_path):
+    library = RouteLibrary(str(tmp_path / "routes"))
+    entry = library.save("hall", _recording(), tolerance=0.03)
+    assert entry["points"] == 2 and entry["samples"] == 51
+    assert entry["length"] == pytest.approx(1.0)
+    assert entry["speed"] == pytest.approx(0.25)            # the idle start doesn't count
+
+    reopened = RouteLibrary(str(tmp_path / "routes"))
+    assert reopened.names() == ["hall"]
+    route = reopened.load("hall")
+    assert route["waypoints"] == [[0.0, 0.0], [0.0, 1.0]]
+    assert route["name"] == "hall" and route["speed"] == entry["speed"]
+
+    reopened.delete("hall")
+    assert reopened.names() == [] and not os.path.exists(tmp_path / "routes" / "hall.json")
+    with pytest.raises(KeyError):
+        reopened.load("hall")
+    reopened.delete("hall")                                 # already gone: no error
+
+
+def test_taught_speed_ignores_a_pause_at_the_end(tmp_path):
+    samples = _recording() + [(30.0, 0.0, 1.0, 0.0)]        # parked, then stopped recording
+    entry = RouteLibrary(str(tmp_path)).save("hall", samples)
+    assert entry["speed"] == pytest.approx(0.25)
+
+
+def test_taught_speed_unknown_without_motion(tmp_path):
+    entry = RouteLibrary(str(tmp_path)).save("still", [(0.0, 1.0, 1.0, 0.0), (5.0, 1.0, 1.0, 0.0)])
+    assert entry["speed"] is None
+
+
+def test_index_lists_routes_without_opening_them(tmp_path):
+    library = RouteLibrary(str(tmp_path))
+    library.save("b", _recording())
+    library.save("a", _recording())
+    with open(tmp_path / "index.json") as f:
+        assert sorted(json.load(f)) == ["a", "b"]
+    assert library.names() == ["a", "b"]
+
+
+@pytest.mark.parametrize("name", ["", ".hidden", "../escape", "sub/route", "index"])
+def test_bad_route_names_are_rejected(tmp_path, name):
+    library = RouteLibrary(str(tmp_path))
+    with pytest.raises(ValueError):
+        library.save(name, _recording())
+    with pytest.raises(ValueError):
+        library.delete(name)
+    assert library.names() == []
+    assert sorted(os.listdir(tmp_path)) == []               # nothing written, index untouched
+
+
+def test_too_short_recording_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RouteLibrary(str(tmp_path)).save("short", _recording()[:1])
@@ -0,0 +1,104 @@
+import math
+import time
+
+import pytest
+
+import telemetry as telemetry_module
+from controlstate import ControlState
+from telemetry import FIELDS, Telemetry
+
+ntcore = pytest.importorskip("ntcore")
+
+
+class _Clock:
+    """perf_counter stand-in advanced by the test"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(telemetry_module.time, "perf_counter", c)
+    return c
+
+
+def _state():
+    state = ControlState()
+    state.reset(1.0, 2.0)
+    state.x, state.z, state.yaw = 0.5, 0.25, math.radians(30.0)
+    state.distance, state.angle_error = 1.8, math.radians(-12.0)
+    state.left, state.right = 0.4, 0.3
+    state.reversing = True
+    return state
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_packed_state_reaches_a_client_with_its_field_names(nt_pair):
+    server, client = nt_pair
+    telemetry = Telemetry(server, base="/bot/robot")
+    fields = client.getStringArrayTopic("/bot/robot/fields").subscribe([])
+    state_sub = client.getDoubleArrayTopic("/bot/robot/state").subscribe([])
+    try:
+        assert telemetry.publish(_state(), 0.012, force=True)
+        _wait_for(lambda: len(state_sub.get()) == len(FIELDS) and fields.get())
+        assert tuple(fields.get()) == FIELDS
+        received = dict(zip(fields.get(), state_sub.get()))
+        assert received == pytest.approx({
+            "target_x": 1.0, "target_z": 2.0, "x": 0.5, "z": 0.25, "yaw_deg": 30.0,
+            "distance": 1.8, "angle_error_deg": -12.0, "left": 0.4, "right": 0.3,
+            "loop_period_ms": 12.0, "reversing": 1.0})
+        # one topic carries the whole snapshot: no per-field topics
+        names = {info.name for info in client.getTopicInfo("/bot/robot/")}
+        assert names == {"/bot/robot/fields", "/bot/robot/state"}
+    finally:
+        fields.close()
+        state_sub.close()
+        telemetry.close()
+
+
+def test_client_sees_the_latest_snapshot(nt_pair):
+    server, client = nt_pair
+    telemetry = Telemetry(server)
+    sub = client.getDoubleArrayTopic("/robot/state").subscribe([])
+    state = _state()
+    try:
+        for i in range(5):
+            state.left = 0.1 * i
+            telemetry.publish(state, 0.01, force=True)
+        _wait_for(lambda: len(sub.get()) and sub.get()[FIELDS.index("left")] == pytest.approx(0.4))
+    finally:
+        sub.close()
+        telemetry.close()
+
+
+def test_publish_is_rate_limited(clock):
+    inst = ntcore.NetworkTableInstance.create()
+    try:
+        telemetry = Telemetry(inst, rate_hz=20.0)
+        sub = inst.getDoubleArrayTopic("/robot/state").subscribe(
+            [], ntcore.PubSubOptions(sendAll=True, keepDuplicates=True))
+        state, sent = _state(), []
+        for i in range(100):                    # 1 s of a 100 Hz control loop
+            state.left = 0.001 * i
+            sent.append(telemetry.publish(state, 0.01))
+            clock.now += 0.01
+        assert sum(sent) == telemetry.published == 20
+        assert sent[0] and sent[1:5] == [False] * 4 and sent[5]
+        assert len(sub.readQueue()) == 20       # skipped calls don't set the topic
+        assert telemetry.publish(state, 0.01, force=True)   # end of move: always
+        assert not telemetry.publish(state, 0.01)           # and it restarts the interval
+        sub.close()
+        telemetry.close()
+    finally:
+        ntcore.NetworkTableInstance.destroy(inst)
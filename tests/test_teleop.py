@@ -0,0 +1,172 @@
+import math
+import threading
+import time
+
+import pytest
+
+import teleop as teleop_module
+from conftest import FakeMotor
+from runtime import MoveRejected
+from teleop import Teleop
+
+
+class _Clock:
+    """Stands in for time.perf_counter so ramps are exact"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(teleop_module.time, "perf_counter", clock)
+    return clock
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_wheels_are_slew_limited(clock):
+    motor, seen = FakeMotor(), []
+    teleop = Teleop(motor, max_speed=0.6, accel=4.0, observer=lambda l, r: seen.append((l, r)))
+    clock.now += 0.05
+    teleop.command(1.0, 0.0)                    # target 0.6, at most 4.0 · 0.05 per wheel
+    assert (motor.left, motor.right) == pytest.approx((0.2, 0.2))
+    clock.now += 0.05
+    teleop.command(1.0, 0.0)
+    assert motor.left == pytest.approx(0.4)
+    clock.now += 1.0
+    teleop.command(1.0, 0.0)
+    assert motor.left == pytest.approx(0.6)     # reached, not overshot
+    assert seen[-1] == (motor.left, motor.right)
+
+
+def test_steer_mixes_into_the_wheels(clock):
+    motor = FakeMotor()
+    teleop = Teleop(motor, max_speed=0.6, max_turn=0.4)
+    clock.now += 10.0
+    teleop.command(0.5, 1.0)                    # + steer = right: left wheel faster
+    assert (motor.left, motor.right) == pytest.approx((0.7, -0.1))
+
+
+@pytest.mark.parametrize("throttle, steer", [(0.04, -0.04), (math.nan, 0.0), (0.0, math.nan)])
+def test_deadzone_and_nan_are_zero(clock, throttle, steer):
+    motor = FakeMotor()
+    teleop = Teleop(motor, deadzone=0.05)
+    clock.now += 10.0
+    teleop.command(throttle, steer)
+    assert (motor.left, motor.right) == (0.0, 0.0)
+
+
+def test_axes_are_clamped(clock):
+    motor = FakeMotor()
+    teleop = Teleop(motor, max_speed=0.6, max_turn=0.0)
+    clock.now += 10.0
+    teleop.command(5.0, 0.0)
+    assert motor.left == pytest.approx(0.6)
+
+
+def test_latest_input_wins(clock):
+    motor = FakeMotor()
+    teleop = Teleop(motor, max_speed=0.6, max_turn=0.0, accel=1.0)
+    clock.now += 0.1
+    teleop.command(1.0, 0.0)                    # ramping up ...
+    teleop.command(-1.0, 0.0)                   # ... replaced before it got anywhere
+    clock.now += 0.1
+    teleop.command(-1.0, 0.0)
+    assert motor.left < 0.1
+    clock.now += 10.0
+    teleop.command(-1.0, 0.0)
+    assert motor.left == pytest.approx(-0.6)
+
+
+def test_deadman_stops_without_input():
+    motor = FakeMotor()
+    teleop = Teleop(motor, accel=100.0, timeout=0.05).start(rate_hz=200)
+    try:
+        teleop.command(0.5, 0.0)
+        assert motor.left > 0.0
+        _wait_for(lambda: teleop.deadman_stops == 1)
+        assert (motor.left, motor.right) == (0.0, 0.0)
+        time.sleep(0.1)
+        assert teleop.deadman_stops == 1        # stopped once, not on every tick
+    finally:
+        teleop.close()
+
+
+def test_watchdog_finishes_the_ramp_between_inputs():
+    motor = FakeMotor()
+    teleop = Teleop(motor, max_speed=0.6, accel=6.0, timeout=1.0).start(rate_hz=200)
+    try:
+        teleop.command(1.0, 0.0)
+        _wait_for(lambda: motor.left == pytest.approx(0.6))
+    finally:
+        teleop.close()
+    assert (motor.left, motor.right) == (0.0, 0.0)
+
+
+def test_nt_axes_feed_the_newest_value():
+    ntcore = pytest.importorskip("ntcore")
+    from teleop import AxesPublisher, NTAxes
+
+    inst = ntcore.NetworkTableInstance.create()
+    motor = FakeMotor()
+    teleop = Teleop(motor, max_speed=0.6, max_turn=0.0, accel=100.0, timeout=5.0).start()
+    axes = NTAxes(teleop, inst)
+    publisher = AxesPublisher(inst)
+    try:
+        for throttle in (0.2, 0.4, 1.0):
+            publisher.send(throttle, 0.0)
+        _wait_for(lambda: motor.left == pytest.approx(0.6))
+        assert teleop.inputs <= 3
+    finally:
+        publisher.close()
+        axes.close()
+        teleop.close()
+        ntcore.NetworkTableInstance.destroy(inst)
+
+
+def test_teleop_session_holds_the_move_lock(runtime):
+    teleop = runtime.start_teleop()
+    try:
+        assert runtime.busy
+        with pytest.raises(MoveRejected):
+            runtime.run_control(lambda: True)
+    finally:
+        runtime.stop_teleop()
+    assert not runtime.busy and teleop.motor is runtime.motor
+
+
+def test_preempting_move_ends_nt_teleop(runtime):
+    ntcore = pytest.importorskip("ntcore")
+    runtime.localization.inst = ntcore.NetworkTableInstance.create()
+    try:
+        runtime.teleop_nt_start()
+        assert runtime.busy
+        result = []
+        thread = threading.Thread(target=lambda: result.append(
+            runtime.run_control(lambda: "moved", preempt=True)))
+        thread.start()
+        thread.join(2.0)
+        assert result == ["moved"]
+        assert runtime.teleop_nt is None and runtime.teleop is None
+    finally:
+        ntcore.NetworkTableInstance.destroy(runtime.localization.inst)
+
+
+def test_geofence_reaches_a_running_session(runtime):
+    from geofence import Geofence
+    teleop = runtime.start_teleop()
+    try:
+        runtime.set_geofence(Geofence(keep_in=[[(-1, -1), (1, -1), (1, 1), (-1, 1)]]), save=False)
+        assert teleop.motor is runtime.motor and runtime.motor is not runtime.driver
+    finally:
+        runtime.stop_teleop()